@@ -18,6 +18,23 @@ class SourceLink {
     );
   }
 
+  // Factory for one entry of a compact document's source_table:
+  // [link_title, location], where location is a bare domain or a full URL
+  factory SourceLink.fromTableEntry(List<dynamic> entry) {
+    final String location = entry.length > 1 ? (entry[1] as String? ?? '') : '';
+    return SourceLink(
+      linkTitle: entry.isNotEmpty ? (entry[0] as String? ?? 'No Title') : 'No Title',
+      url: location.contains('://') ? location : 'https://$location',
+    );
+  }
+
+  // Decodes a document's source_table once, so items can share the SourceLinks.
+  // Documents written before format_version 2 have no table and get an empty list.
+  static List<SourceLink> tableOf(Map<String, dynamic> docData) {
+    final List<dynamic> rawTable = docData['source_table'] ?? [];
+    return rawTable.whereType<List<dynamic>>().map((entry) => SourceLink.fromTableEntry(entry)).toList();
+  }
+
   // To convert the object into a JSON string for cookie storage
   Map<String, dynamic> toJson() => {
     'link_title': linkTitle,
@@ -42,13 +59,25 @@ class NewsItem {
     required this.sources,
   });
 
-  factory NewsItem.fromFirestore(Map<String, dynamic> data) {
-    // UPDATED: Map the list of source objects into a List<SourceLink>
-    List<dynamic> rawSources = data['sources'] ?? [];
-    List<SourceLink> sources = rawSources
-        .whereType<Map<String, dynamic>>()
-        .map((s) => SourceLink.fromMap(s))
-        .toList();
+  // sourceTable is the document's decoded source_table (see SourceLink.tableOf).
+  // Compact items (format_version 2) list indices into it under 'src'; older
+  // items carry their source objects inline under 'sources'.
+  factory NewsItem.fromFirestore(Map<String, dynamic> data, [List<SourceLink> sourceTable = const []]) {
+    final List<SourceLink> sources;
+    if (data['src'] is List) {
+      sources = (data['src'] as List<dynamic>)
+          .whereType<int>()
+          .where((index) => index >= 0 && index < sourceTable.length)
+          .map((index) => sourceTable[index])
+          .toList();
+    } else {
+      // UPDATED: Map the list of source objects into a List<SourceLink>
+      List<dynamic> rawSources = data['sources'] ?? [];
+      sources = rawSources
+          .whereType<Map<String, dynamic>>()
+          .map((s) => SourceLink.fromMap(s))
+          .toList();
+    }
 
     return NewsItem(
       title: data['title'] ?? 'No Title',
@@ -76,47 +105,158 @@ class FirestoreFunctions {
     print('Fetching news for $countryCode in $languageCode [$category] from Firestore...');
 
     try {
-      // 1. Query the 'news_summaries' collection
-      QuerySnapshot snapshot = await _firestore
-          .collection('news_summaries')
-      // 2. Filter by country and language
-          .where('country', isEqualTo: countryCode)
-          .where('language', isEqualTo: languageCode)
-      // 3. Get the most recent document
-          .orderBy('timestamp', descending: true)
-          .limit(1)
-          .get();
-
-      if (snapshot.docs.isEmpty) {
-        print('No news found for $countryCode in $languageCode.');
-        return [];
+      // 1. Fast path: single-document get of the materialized latest category
+      final List<NewsItem>? latestItems = await _fetchLatestCategory(countryCode, languageCode, category);
+      if (latestItems != null) {
+        if (kDebugMode) {
+          print('Successfully fetched ${latestItems.length} items for category "$category" from latest.');
+        }
+        return latestItems;
       }
 
-      // 4. Extract the data from the single result
-      final docData = snapshot.docs.first.data() as Map<String, dynamic>;
+      // 2. Fallback: query the most recent snapshot in 'news_summaries'
+      return await _fetchFromNewsSummaries(countryCode, languageCode, category);
+    } catch (e) {
+      print('Error fetching news from Firestore: $e');
+      rethrow;
+    }
+  }
+
+  // Reads latest/{country}_{language}/categories/{category}, maintained by the
+  // Python writer. Returns null if it has not been materialized yet.
+  Future<List<NewsItem>?> _fetchLatestCategory(String countryCode, String languageCode, String category) async {
+    final DocumentSnapshot snapshot = await _firestore
+        .collection('latest')
+        .doc('${countryCode}_$languageCode')
+        .collection('categories')
+        .doc(category)
+        .get();
 
-      // Get the 'news_data' object
-      final Map<String, dynamic> newsDataObject = docData['news_data'] ?? {};
+    if (!snapshot.exists) {
+      return null;
+    }
 
-      // UPDATED: Drill down into the specific category map (e.g., 'Headlines', 'Politics')
-      final Map<String, dynamic> categoryObject = newsDataObject[category] ?? {};
+    final docData = snapshot.data() as Map<String, dynamic>;
+    final List<dynamic> newsDataList = docData['news_items'] ?? [];
+    final List<SourceLink> sourceTable = SourceLink.tableOf(docData);
+
+    final List<NewsItem> newsItems = newsDataList
+        .whereType<Map<String, dynamic>>()
+        .map((itemData) => NewsItem.fromFirestore(itemData, sourceTable))
+        .toList();
+
+    // Stories deduplicated into another category are stored there once; pull them back in
+    final List<dynamic> crossReferences = docData['cross_references'] ?? [];
+    if (crossReferences.isNotEmpty) {
+      newsItems.addAll(await _resolveCrossReferences(countryCode, languageCode, crossReferences));
+    }
+    return newsItems;
+  }
 
-      // UPDATED: Get the 'news_items' list from inside that category object
-      final List<dynamic> newsDataList = categoryObject['news_items'] ?? [];
+  // Fetches the canonical copies named by a category's cross_references
+  // ({category, id}), one document get per referenced category.
+  Future<List<NewsItem>> _resolveCrossReferences(String countryCode, String languageCode, List<dynamic> crossReferences) async {
+    final Map<String, Set<String>> idsByCategory = {};
+    for (final ref in crossReferences.whereType<Map<String, dynamic>>()) {
+      idsByCategory.putIfAbsent(ref['category'] as String, () => <String>{}).add(ref['id'] as String);
+    }
 
-      // 5. Map the list of JSON objects to NewsItem objects
-      final List<NewsItem> newsItems = newsDataList
+    final List<NewsItem> resolved = [];
+    for (final entry in idsByCategory.entries) {
+      final DocumentSnapshot snapshot = await _firestore
+          .collection('latest')
+          .doc('${countryCode}_$languageCode')
+          .collection('categories')
+          .doc(entry.key)
+          .get();
+      final docData = (snapshot.data() as Map<String, dynamic>?) ?? {};
+      final List<dynamic> newsDataList = docData['news_items'] ?? [];
+      final List<SourceLink> sourceTable = SourceLink.tableOf(docData);
+      resolved.addAll(newsDataList
           .whereType<Map<String, dynamic>>()
-          .map((itemData) => NewsItem.fromFirestore(itemData))
-          .toList();
+          .where((itemData) => entry.value.contains(itemData['id']))
+          .map((itemData) => NewsItem.fromFirestore(itemData, sourceTable)));
+    }
+    return resolved;
+  }
+
+  Future<List<NewsItem>> _fetchFromNewsSummaries(String countryCode, String languageCode, String category) async {
+    // 1. Query the 'news_summaries' collection
+    QuerySnapshot snapshot = await _firestore
+        .collection('news_summaries')
+    // 2. Filter by country and language
+        .where('country', isEqualTo: countryCode)
+        .where('language', isEqualTo: languageCode)
+    // 3. Get the most recent document
+        .orderBy('timestamp', descending: true)
+        .limit(1)
+        .get();
+
+    if (snapshot.docs.isEmpty) {
+      print('No news found for $countryCode in $languageCode.');
+      return [];
+    }
+
+    // 4. Extract the data from the single result
+    final docData = snapshot.docs.first.data() as Map<String, dynamic>;
+
+    // Get the 'news_data' object
+    final Map<String, dynamic> newsDataObject = docData['news_data'] ?? {};
+
+    // UPDATED: Drill down into the specific category map (e.g., 'Headlines', 'Politics')
+    Map<String, dynamic> categoryObject = newsDataObject[category] ?? {};
 
-      if (kDebugMode) {
-        print('Successfully fetched ${newsItems.length} items for category "$category".');
+    // Unchanged categories are stored as a reference to the snapshot holding their content
+    final Map<String, Map<String, dynamic>> snapshots = {snapshot.docs.first.id: docData};
+    Future<Map<String, dynamic>> loadSnapshot(String id) async {
+      if (!snapshots.containsKey(id)) {
+        final DocumentSnapshot referenced = await _firestore.collection('news_summaries').doc(id).get();
+        snapshots[id] = (referenced.data() as Map<String, dynamic>?) ?? {};
       }
-      return newsItems;
-    } catch (e) {
-      print('Error fetching news from Firestore: $e');
-      rethrow;
+      return snapshots[id]!;
     }
+
+    Map<String, dynamic> contentData = docData;
+    if (categoryObject['ref'] is String) {
+      contentData = await loadSnapshot(categoryObject['ref']);
+      final Map<String, dynamic> referencedNewsData = contentData['news_data'] ?? {};
+      categoryObject = referencedNewsData[category] ?? {};
+    }
+    // Compact items index into the source_table of the snapshot they are stored in
+    final List<SourceLink> categorySourceTable = SourceLink.tableOf(contentData);
+
+    // UPDATED: Get the 'news_items' list from inside that category object
+    final List<dynamic> newsDataList = categoryObject['news_items'] ?? [];
+
+    // 5. Map the list of JSON objects to NewsItem objects
+    final List<NewsItem> newsItems = newsDataList
+        .whereType<Map<String, dynamic>>()
+        .map((itemData) => NewsItem.fromFirestore(itemData, categorySourceTable))
+        .toList();
+
+    // Deduplicated stories live in another category of the snapshot this category's
+    // content came from; that category may itself be a reference to an older snapshot
+    final Map<String, dynamic> contentNewsData = contentData['news_data'] ?? {};
+    final List<dynamic> crossReferences = categoryObject['cross_references'] ?? [];
+    for (final ref in crossReferences.whereType<Map<String, dynamic>>()) {
+      Map<String, dynamic> referencedCategory = contentNewsData[ref['category']] ?? {};
+      Map<String, dynamic> referencedData = contentData;
+      if (referencedCategory['ref'] is String) {
+        referencedData = await loadSnapshot(referencedCategory['ref']);
+        final Map<String, dynamic> referencedNewsData = referencedData['news_data'] ?? {};
+        referencedCategory = referencedNewsData[ref['category']] ?? {};
+      }
+      final List<SourceLink> referencedSourceTable = SourceLink.tableOf(referencedData);
+      final List<dynamic> referencedItems = referencedCategory['news_items'] ?? [];
+      newsItems.addAll(referencedItems
+          .whereType<Map<String, dynamic>>()
+          .where((itemData) => itemData['id'] == ref['id'])
+          .map((itemData) => NewsItem.fromFirestore(itemData, referencedSourceTable)));
+    }
+
+    if (kDebugMode) {
+      print('Successfully fetched ${newsItems.length} items for category "$category".');
+    }
+    return newsItems;
   }
-}
\ No newline at end of file
+}
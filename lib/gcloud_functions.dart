@@ -9,10 +9,14 @@ import 'languages_dropdown.dart';
 //
 //   final url = 'YOUR_CLOUD_FUNCTION_URL';
 //
-//   // 2. Construct the payload using the mapped code
+//   // 2. Construct the payload using the mapped code. snapshot_id and category
+//   // (the news_summaries document and category the items came from) let the
+//   // function answer from its pre-translated copy for popular languages.
 //   final payload = {
 //     'news_items': newsItems,
 //     'target_language': targetCode, // This is the required ISO code
+//     'snapshot_id': snapshotId,
+//     'category': category,
 //   };
 //
 //   // ... (rest of your HTTP POST request logic) ...
@@ -0,0 +1,323 @@
+# batch_sweep.py
+#
+# Batch-job mode for the daily sweep. The daily refresh is not latency
+# sensitive, so instead of one interactive generate_content call per
+# (country, language, category) this serializes every prompt and its system
+# instruction into a JSONL batch input file, submits the whole sweep as a
+# single Gemini batch job and polls it until it finishes. The result file is
+# then streamed line by line through the same post-processing as the
+# interactive path (safe_json_load, then get_base_url on every source), and
+# each (country, language) is written to Firestore as soon as all of its
+# categories are in, exactly as sweep.py would write it.
+#
+# Batch requests are billed at a discount and do not count against the
+# interactive RPM/TPM quota. Requests that fail inside the job are re-run
+# interactively through the sweep's worker pool unless --no-fallback is given.
+# The submitted job name is checkpointed, so --resume polls that job again
+# instead of submitting and paying for a new one.
+#
+# Usage: python batch_sweep.py --translate-from English
+#        python batch_sweep.py --resume
+#        python batch_sweep.py --job batches/abc123
+
+import argparse
+import io
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import gemini_journalist_with_categories as journalist
+import metrics
+import sweep
+from checkpoints import DEFAULT_CHECKPOINT_FILE, CheckpointStore, new_run_id
+from retry_policy import deadline_in
+
+# --- BATCH CONFIGURATION ---
+# Kept apart from requests.jsonl at the repo root, which is not a batch input
+BATCH_INPUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gemini_batch_input.jsonl")
+BATCH_MODEL = "gemini-2.5-flash"
+POLL_INTERVAL = 60            # seconds between job status checks
+BATCH_TIMEOUT_HOURS = 24      # batch jobs expire after 24 hours on the Gemini side
+KEY_SEPARATOR = "|"
+
+SUCCEEDED = "JOB_STATE_SUCCEEDED"
+TERMINAL_STATES = {SUCCEEDED, "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+USAGE_FIELDS = {"promptTokenCount": "prompt_token_count", "candidatesTokenCount": "candidates_token_count",
+                "thoughtsTokenCount": "thoughts_token_count", "toolUsePromptTokenCount": "tool_use_prompt_token_count",
+                "cachedContentTokenCount": "cached_content_token_count", "totalTokenCount": "total_token_count"}
+
+
+# --- BATCH INPUT ---
+
+def request_key(unit: sweep.WorkUnit):
+    return KEY_SEPARATOR.join((unit.country, unit.language, unit.category))
+
+
+def build_batch_request(unit: sweep.WorkUnit):
+    """One batch input line: the same prompt, system instruction and search tool as the interactive call."""
+    return {
+        "key": request_key(unit),
+        "request": {
+            "contents": [{"role": "user", "parts": [{"text": unit.query}]}],
+            "system_instruction": {"parts": [{"text": journalist.system_instruction_for(unit.category, unit.language)}]},
+            "tools": [{"google_search": {}}],
+        },
+    }
+
+
+def write_batch_input(units: list, path: str = BATCH_INPUT_FILE):
+    """Writes one JSONL request per work unit and returns the number written."""
+    with open(path, "w", encoding="utf-8") as f:
+        for unit in units:
+            f.write(json.dumps(build_batch_request(unit), ensure_ascii=False) + "\n")
+    return len(units)
+
+
+# --- JOB SUBMISSION AND POLLING ---
+
+def _state_name(job):
+    return getattr(job.state, "name", str(job.state))
+
+
+def submit_batch_job(path: str, display_name: str):
+    """Uploads the input file, creates the batch job and returns its name."""
+    client = journalist.get_gemini_client()
+    uploaded = client.files.upload(file=path, config={"display_name": display_name, "mime_type": "jsonl"})
+    job = client.batches.create(model=BATCH_MODEL, src=uploaded.name, config={"display_name": display_name})
+    metrics.inc("batch_jobs_submitted_total")
+    print(f"📦 Submitted batch job {job.name} ({uploaded.name})")
+    return job.name
+
+
+def wait_for_batch_job(job_name: str, poll_interval: float = POLL_INTERVAL, timeout_hours: float = BATCH_TIMEOUT_HOURS):
+    """Polls until the job reaches a terminal state or the timeout passes, and returns the last job seen."""
+    client = journalist.get_gemini_client()
+    deadline = deadline_in(timeout_hours * 3600)
+    start = time.monotonic()
+    while True:
+        job = client.batches.get(name=job_name)
+        state = _state_name(job)
+        if state in TERMINAL_STATES or time.monotonic() >= deadline:
+            metrics.observe("batch_job_wait_seconds", time.monotonic() - start, state=state)
+            return job
+        print(f"⏳ [{round(time.monotonic() - start)}s] Batch job {job_name} is {state}")
+        time.sleep(poll_interval)
+
+
+def iter_batch_results(job):
+    """Yields the result file's lines as dicts, one per request, without splitting the whole file up front."""
+    dest = getattr(job, "dest", None)
+    if not dest or not getattr(dest, "file_name", None):
+        raise ValueError(f"Batch job {job.name} has no result file.")
+    content = journalist.get_gemini_client().files.download(file=dest.file_name)
+    for line in io.BytesIO(content):
+        if line.strip():
+            yield json.loads(line)
+
+
+# --- RESULT PROCESSING ---
+
+def response_text(response: dict):
+    """The text of the first candidate, joined across parts (thought parts skipped), as response.text does."""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    text = "".join(part.get("text", "") for part in parts if not part.get("thought"))
+    return text or None
+
+
+def parse_result_line(line: dict, labels: dict):
+    """
+    Runs one result line through the interactive path's post-processing.
+    Returns (news_items, None) or (None, error message).
+    """
+    if line.get("error") or line.get("status"):
+        error = line.get("error") or line.get("status")
+        metrics.inc("batch_results_total", outcome="error", **labels)
+        if isinstance(error, dict):
+            return None, f"{error.get('code')} {error.get('status', 'ERROR')}. {error.get('message')}"
+        return None, str(error)
+
+    response = line.get("response") or {}
+    usage = response.get("usageMetadata") or {}
+    metrics.record_usage(SimpleNamespace(usage_metadata=SimpleNamespace(**{USAGE_FIELDS[k]: v for k, v in usage.items() if k in USAGE_FIELDS})), **labels)
+
+    text = response_text(response)
+    if not text:
+        metrics.inc("batch_results_total", outcome="empty", **labels)
+        return None, "Model returned no text."
+    metrics.observe("gemini_response_bytes", len(text.encode("utf-8")), **labels)
+
+    try:
+        with metrics.timer("json_parse_seconds", **labels):
+            news_items = journalist.safe_json_load(text)
+        if not news_items:
+            metrics.inc("batch_results_total", outcome="empty", **labels)
+            return None, "Parsed JSON structure was empty."
+        journalist._strip_source_urls(news_items)
+        metrics.inc("batch_results_total", outcome="success", **labels)
+        return news_items, None
+    except Exception as e:
+        metrics.inc("json_parse_errors_total", **labels)
+        metrics.inc("batch_results_total", outcome="parse_error", **labels)
+        return None, f"JSON parsing/processing error: {str(e)}"
+
+
+def _store_result(unit: sweep.WorkUnit, group, news_items, results: dict, checkpoint: CheckpointStore, run_id: str):
+    if checkpoint:
+        checkpoint.record_category(run_id, unit.country, unit.language, unit.category, news_items)
+    with group.lock:
+        group.results[unit.category] = news_items
+        done = len(group.results) == len(group.categories)
+    if done:
+        sweep._finish_group(group, results, checkpoint, run_id)
+
+
+def _fail_unit(unit: sweep.WorkUnit, group, results: dict, error_msg: str):
+    with group.lock:
+        first_failure = not group.failed
+        group.failed = True
+    if first_failure:
+        sweep._report_failure(unit, group, results, error_msg)
+
+
+def run_fallback(units: list, groups: dict, results: dict, max_workers: int, deadline_minutes: float,
+                 limiter: sweep.QuotaLimiter = None, checkpoint: CheckpointStore = None, run_id: str = None):
+    """Re-runs units the batch job could not answer as interactive requests through the sweep's worker pool."""
+    print(f"🔁 Re-running {len(units)} failed batch requests interactively with {max_workers} workers...")
+    limiter = limiter or sweep.QuotaLimiter()
+    stats = sweep.SweepStats(len(units))
+    run_deadline = deadline_in(deadline_minutes * 60)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-fallback") as executor:
+        sweep._run_units(executor, units, groups, limiter, stats, results, run_deadline, checkpoint, run_id)
+    return stats.snapshot()
+
+
+def run_batch_sweep(countries: list, translate_from: str = None, checkpoint: CheckpointStore = None, run_id: str = None,
+                    job_name: str = None, input_path: str = BATCH_INPUT_FILE, poll_interval: float = POLL_INTERVAL,
+                    timeout_hours: float = BATCH_TIMEOUT_HOURS, fallback: bool = True,
+                    max_workers: int = sweep.DEFAULT_MAX_WORKERS, deadline_minutes: float = sweep.RUN_DEADLINE_MINUTES,
+                    limiter: sweep.QuotaLimiter = None):
+    """
+    Runs the sweep as one Gemini batch job and writes every (country, language) it completes.
+    job_name polls an already submitted job instead of submitting a new one; with a
+    checkpoint store the job submitted under run_id is reused the same way, and units
+    already fetched under run_id are left out of the batch.
+    Returns a {"Country [Language]": result} mapping plus a summary of the job.
+    """
+    units = sweep.expand_work_units(countries, translate_from)
+    results = {}
+    groups = sweep._build_groups(units, countries, translate_from)
+
+    if checkpoint:
+        job_name = job_name or checkpoint.batch_job(run_id)
+        units = sweep._apply_checkpoint(units, groups, results, checkpoint, run_id)
+
+    summary = {"run_id": run_id, "units": len(units), "job": job_name, "state": None,
+               "batch_succeeded": 0, "batch_failed": 0, "missing": 0, "fallback": None}
+
+    if units:
+        if not job_name:
+            write_batch_input(units, input_path)
+            print(f"Serialized {len(units)} requests for {len(countries)} countries to {input_path}")
+            job_name = submit_batch_job(input_path, f"news-sweep-{run_id or new_run_id()}")
+            summary["job"] = job_name
+            if checkpoint:
+                checkpoint.record_batch_job(run_id, job_name)
+
+        job = wait_for_batch_job(job_name, poll_interval, timeout_hours)
+        summary["state"] = _state_name(job)
+        if summary["state"] not in TERMINAL_STATES:
+            # The job may still finish; resuming polls it again rather than paying for the work twice
+            print(f"⚠️ Batch job {job_name} is still {summary['state']} after {timeout_hours}h. Re-run with --resume to collect it.")
+            return results, summary
+
+        pending = {request_key(unit): unit for unit in units}
+        failed = []
+        if summary["state"] == SUCCEEDED:
+            for line in iter_batch_results(job):
+                unit = pending.pop(line.get("key"), None)
+                if unit is None:
+                    continue
+                labels = {"country": unit.country, "language": unit.language, "category": unit.category}
+                news_items, error_msg = parse_result_line(line, labels)
+                if error_msg:
+                    summary["batch_failed"] += 1
+                    failed.append((unit, error_msg))
+                else:
+                    summary["batch_succeeded"] += 1
+                    _store_result(unit, groups[(unit.country, unit.language)], news_items, results, checkpoint, run_id)
+        else:
+            print(f"❌ Batch job {job_name} ended in {summary['state']}.")
+
+        summary["missing"] = len(pending)
+        failed += [(unit, f"No result from batch job ({summary['state']}).") for unit in pending.values()]
+
+        if failed and fallback:
+            summary["fallback"] = run_fallback([unit for unit, _ in failed], groups, results, max_workers,
+                                               deadline_minutes, limiter, checkpoint, run_id)
+        else:
+            for unit, error_msg in failed:
+                _fail_unit(unit, groups[(unit.country, unit.language)], results, error_msg)
+
+    # Documents and error logs are committed in the background; wait for them
+    journalist.firestore_writer.flush()
+    journalist.firestore_writer.mark_failed_writes(results)
+    summary["firestore"] = journalist.firestore_writer.stats()
+    return results, summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the daily sweep as a single Gemini batch job.")
+    parser.add_argument("--countries-file", default=sweep.COUNTRIES_FILE)
+    parser.add_argument("--only", nargs="*", help="Restrict the sweep to these country names.")
+    parser.add_argument("--translate-from", help="Fetch once in this language (e.g. English) and machine-translate the rest.")
+    parser.add_argument("--input-file", default=BATCH_INPUT_FILE, help="Where to write the JSONL batch input.")
+    parser.add_argument("--job", help="Poll and collect this already submitted batch job instead of submitting one.")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    parser.add_argument("--timeout-hours", type=float, default=BATCH_TIMEOUT_HOURS)
+    parser.add_argument("--no-fallback", action="store_true", help="Do not re-run failed batch requests interactively.")
+    parser.add_argument("--max-workers", type=int, default=sweep.DEFAULT_MAX_WORKERS, help="Workers for the interactive fallback.")
+    parser.add_argument("--rpm", type=int, default=sweep.GEMINI_RPM, help="Gemini requests-per-minute quota for the fallback.")
+    parser.add_argument("--tpm", type=int, default=sweep.GEMINI_TPM, help="Gemini tokens-per-minute quota for the fallback.")
+    parser.add_argument("--deadline-minutes", type=float, default=sweep.RUN_DEADLINE_MINUTES, help="Retry budget for the fallback.")
+    parser.add_argument("--resume", action="store_true", help="Continue a previous run, polling its batch job if one was submitted.")
+    parser.add_argument("--run-id", help="Run to resume (defaults to the last run in the checkpoint file).")
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE)
+    parser.add_argument("--metrics-out", help="Write metrics here: Prometheus text for .prom/.txt, a JSON report otherwise.")
+    args = parser.parse_args()
+
+    checkpoint = CheckpointStore(args.checkpoint_file)
+    run_id = (args.run_id or checkpoint.last_run_id()) if args.resume else new_run_id()
+    if not run_id:
+        run_id = new_run_id()
+
+    countries = sweep.load_countries(args.countries_file)
+    if args.only:
+        countries = [entry for entry in countries if entry[0] in args.only]
+
+    batch_results, batch_summary = run_batch_sweep(
+        countries,
+        translate_from=args.translate_from,
+        checkpoint=checkpoint,
+        run_id=run_id,
+        job_name=args.job,
+        input_path=args.input_file,
+        poll_interval=args.poll_interval,
+        timeout_hours=args.timeout_hours,
+        fallback=not args.no_fallback,
+        max_workers=args.max_workers,
+        deadline_minutes=args.deadline_minutes,
+        limiter=sweep.QuotaLimiter(args.rpm, args.tpm),
+    )
+
+    if args.metrics_out:
+        metrics.write_report(args.metrics_out)
+
+    print("\n\nBATCH SUMMARY:")
+    print(json.dumps(batch_summary, indent=2))
+    print(json.dumps(batch_results, indent=2, ensure_ascii=False))
@@ -0,0 +1,104 @@
+# bench_batch.py
+#
+# Runs the same sweep twice against the offline fakes in fakes.py: once through
+# the interactive worker pool (sweep.run_sweep) and once as a single batch job
+# (batch_sweep.run_batch_sweep, with FakeGeminiClient standing in for the
+# batch endpoint). Reports per mode and scenario:
+#
+#   documents written and failed (Country [Language] entries)
+#   interactive generate_content calls and batch requests made
+#   relative request cost, counting a batch request at BATCH_PRICE_RATIO
+#   wall time (batch mode includes the simulated job turnaround)
+#
+# Latencies, backoff and the batch turnaround are multiplied by --time-scale,
+# and the interactive RPM/TPM quota is divided by it, so the interactive run
+# stays quota-bound in the same proportion as a real sweep.
+# The exit status is non-zero if batch mode leaves any document unwritten in
+# the clean scenario.
+#
+# Usage: python bench_batch.py --countries 20 --scenarios clean flaky
+#        python bench_batch.py --quick
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+
+import batch_sweep
+import gemini_journalist_with_categories as journalist
+import metrics
+import sweep
+from bench_harness import SCENARIOS, _scaled_retry_policy
+from fakes import FakeFirestore, FakeGeminiClient
+from retry_policy import RetryPolicy
+
+BATCH_PRICE_RATIO = 0.5  # batch requests are billed at half the interactive price
+
+
+def install_fakes(args, scenario: dict):
+    gemini = FakeGeminiClient(latency=args.gemini_latency * args.time_scale, jitter=0.5, latency_distribution="lognormal",
+                              seed=args.seed, batch_turnaround=args.batch_turnaround * args.time_scale, **scenario)
+    db = FakeFirestore(seed=args.seed)
+    journalist.gemini_client = gemini
+    journalist.db = db
+    journalist.retry_policy = _scaled_retry_policy(journalist, args.time_scale, args.seed)
+    journalist.firestore_writer.retry_policy = RetryPolicy(max_attempts=5, base_delay=1.0 * args.time_scale,
+                                                           max_delay=30.0 * args.time_scale, seed=args.seed)
+    return gemini, db
+
+
+def run_mode(mode: str, scenario_name: str, countries: list, args):
+    gemini, db = install_fakes(args, SCENARIOS[scenario_name])
+    metrics.registry.reset()
+    output = sys.stdout if args.verbose else io.StringIO()
+    limiter = sweep.QuotaLimiter(sweep.GEMINI_RPM / args.time_scale, sweep.GEMINI_TPM / args.time_scale)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        if mode == "interactive":
+            results, _ = sweep.run_sweep(countries, max_workers=args.max_workers, limiter=limiter, progress_interval=3600)
+        else:
+            results, _ = batch_sweep.run_batch_sweep(countries, poll_interval=args.batch_turnaround * args.time_scale / 10,
+                                                     max_workers=args.max_workers, limiter=limiter)
+    wall_time = time.perf_counter() - start
+
+    expected = sum(len(languages) for _, languages in countries)
+    written = sum(1 for result in results.values() if result.get("status") == "success")
+    return {
+        "documents_expected": expected,
+        "documents_written": written,
+        "documents_failed": expected - written,
+        "interactive_calls": gemini.calls,
+        "batch_requests": gemini.batch_requests,
+        "relative_cost": round(gemini.calls + gemini.batch_requests * BATCH_PRICE_RATIO, 1),
+        "wall_time_s": round(wall_time, 3),
+        "firestore_commits": db.commits,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the interactive sweep with batch-job mode on offline fakes.")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["clean", "flaky"])
+    parser.add_argument("--countries", type=int, default=20, help="Number of countries (from countries.txt).")
+    parser.add_argument("--max-workers", type=int, default=16)
+    parser.add_argument("--gemini-latency", type=float, default=8.0, help="Median interactive latency in real seconds, before scaling.")
+    parser.add_argument("--batch-turnaround", type=float, default=600.0, help="Batch job turnaround in real seconds, before scaling.")
+    parser.add_argument("--time-scale", type=float, default=0.001, help="Multiplier applied to every latency, backoff and turnaround.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quick", action="store_true", help="Small run for CI: 3 countries.")
+    parser.add_argument("--verbose", action="store_true", help="Show the scripts' own output.")
+    args = parser.parse_args()
+    if args.quick:
+        args.countries = 3
+
+    countries = sweep.load_countries()[:args.countries]
+    report = {scenario: {mode: run_mode(mode, scenario, countries, args) for mode in ("interactive", "batch")}
+              for scenario in args.scenarios}
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+
+    if "clean" in report and report["clean"]["batch"]["documents_failed"]:
+        print(f"❌ Batch mode failed {report['clean']['batch']['documents_failed']} documents in the clean scenario")
+        sys.exit(1)
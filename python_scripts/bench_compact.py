@@ -0,0 +1,154 @@
+# bench_compact.py
+#
+# Size and decode benchmark for the compact document format (compact_format.py)
+# over a synthetic full world sweep: one snapshot per (country, language) in
+# countries.txt, 10 Headlines and 5 items in each other category, each item
+# citing 1-3 outlets drawn from a skewed per-country pool, as real answers do.
+# For both formats it reports:
+#
+#   total bytes of the news_summaries snapshots and latest category documents,
+#   as JSON on the wire and as Firestore bills storage (see firestore_size)
+#   time for a reader to parse every category document and build its items,
+#   the way NewsItem.fromFirestore does (source objects per item for
+#   version 1, one decoded source_table per document for version 2)
+#
+# and checks that every version 2 document decodes back to its version 1 form.
+#
+# Usage: python bench_compact.py
+#        python bench_compact.py --countries 20
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from compact_format import FORMAT_VERSION, decode_items, decode_news_data, encode_category_document, encode_news_data
+from sweep import load_countries
+
+CATEGORIES = {"Headlines": 10, "Business and Markets": 5, "Politics": 5, "Art and Culture": 5, "Sports": 5, "Science and Technology": 5}
+
+OUTLETS = [
+    ("AP News", "apnews.com"), ("Reuters", "reuters.com"), ("BBC News", "bbc.com"), ("Al Jazeera", "aljazeera.com"),
+    ("The Guardian", "theguardian.com"), ("France 24", "france24.com"), ("DW", "dw.com"), ("CNN", "cnn.com"),
+    ("The New York Times", "nytimes.com"), ("Bloomberg", "bloomberg.com"), ("Financial Times", "ft.com"),
+    ("NPR", "npr.org"), ("ESPN", "espn.com"), ("Nature", "nature.com"), ("Euronews", "euronews.com"),
+    ("The Washington Post", "washingtonpost.com"), ("Le Monde", "lemonde.fr"), ("El País", "elpais.com"),
+    ("Times of India", "timesofindia.indiatimes.com"), ("South China Morning Post", "scmp.com"),
+]
+
+WORDS = ("government minister election market growth inflation team season final record court ruling protest "
+         "agreement summit talks policy budget energy climate festival museum exhibition research study launch "
+         "company shares rally storm flood vote parliament coalition league championship artist film award").split()
+
+
+def synthetic_news_data(rng: random.Random, country: str):
+    """One consolidated news_data payload with realistic text and source reuse."""
+    # Each country leans on a few outlets of its own plus the wire services
+    local = rng.sample(OUTLETS[4:], 6)
+    pool = OUTLETS[:4] + local + [(f"{country} Herald", f"{country.lower().replace(' ', '')}herald.com")]
+    weights = [1.0 / (rank + 1) for rank in range(len(pool))]
+    news_data = {}
+    for category, count in CATEGORIES.items():
+        items = []
+        for _ in range(count):
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 13))).capitalize()
+            summary = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 70))).capitalize() + "."
+            outlets = {rng.choices(pool, weights)[0] for _ in range(rng.randint(1, 3))}
+            items.append({"title": title, "summary": summary,
+                          "sources": [{"link_title": name, "url": f"https://{domain}"} for name, domain in outlets]})
+        news_data[category] = {"news_items": items}
+    return news_data
+
+
+def firestore_size(value):
+    """Storage size in bytes by Firestore's documented rules (strings: UTF-8 + 1, numbers: 8, maps: keys + values)."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, dict):
+        return sum(firestore_size(key) + firestore_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(firestore_size(item) for item in value)
+    return 8
+
+
+def read_v1(payload: str):
+    """Parse one category document and build its items with a source object per citation."""
+    document = json.loads(payload)
+    return [(item["title"], item["summary"], [(s["link_title"], s["url"]) for s in item["sources"]])
+            for item in document["news_items"]]
+
+
+def read_v2(payload: str):
+    """Parse one compact category document, decode its source_table once and index into it."""
+    document = json.loads(payload)
+    table = [(title, location if "://" in location else f"https://{location}") for title, location in document["source_table"]]
+    return [(item["title"], item["summary"], [table[i] for i in item["src"]]) for item in document["news_items"]]
+
+
+def timed_reads(reader, payloads: list, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            reader(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure document size and decode time of the compact news document format.")
+    parser.add_argument("--countries", type=int, default=None, help="Limit to the first N countries (default: the whole world).")
+    parser.add_argument("--repeat", type=int, default=5, help="Decode passes; the fastest is reported.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    countries = load_countries()[:args.countries] if args.countries else load_countries()
+    totals = {"v1": {"snapshot_json": 0, "snapshot_firestore": 0, "category_json": 0, "category_firestore": 0},
+              "v2": {"snapshot_json": 0, "snapshot_firestore": 0, "category_json": 0, "category_firestore": 0}}
+    payloads = {"v1": [], "v2": []}
+    mismatches = 0
+    documents = 0
+
+    for country, languages in countries:
+        for language in languages:
+            documents += 1
+            news_data = synthetic_news_data(rng, country)
+            v1 = {"country": country, "language": language, "news_data": news_data}
+            encoded, source_table = encode_news_data(news_data)
+            v2 = {"country": country, "language": language, "news_data": encoded, "source_table": source_table,
+                  "format_version": FORMAT_VERSION}
+            mismatches += decode_news_data(v2) != news_data
+            for version, snapshot in (("v1", v1), ("v2", v2)):
+                totals[version]["snapshot_json"] += len(json.dumps(snapshot, ensure_ascii=False).encode("utf-8"))
+                totals[version]["snapshot_firestore"] += firestore_size(snapshot)
+
+            for category, category_data in news_data.items():
+                items, table = encode_category_document(category_data)
+                mismatches += decode_items(items, table) != category_data["news_items"]
+                for version, document in (("v1", {"category": category, "news_items": category_data["news_items"]}),
+                                          ("v2", {"category": category, "news_items": items, "source_table": table,
+                                                  "format_version": FORMAT_VERSION})):
+                    payload = json.dumps(document, ensure_ascii=False)
+                    payloads[version].append(payload)
+                    totals[version]["category_json"] += len(payload.encode("utf-8"))
+                    totals[version]["category_firestore"] += firestore_size(document)
+
+    report = {"documents": documents, "category_documents": len(payloads["v1"])}
+    for version in ("v1", "v2"):
+        report[version] = {**totals[version], "category_decode_s": round(timed_reads(read_v1 if version == "v1" else read_v2,
+                                                                                     payloads[version], args.repeat), 4)}
+    report["reduction"] = {key: round(1 - report["v2"][key] / report["v1"][key], 3) for key in report["v1"]}
+    report["decode_mismatches"] = mismatches
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+
+    if mismatches:
+        print(f"❌ {mismatches} documents did not decode back to their original form")
+        sys.exit(1)
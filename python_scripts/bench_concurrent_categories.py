@@ -0,0 +1,50 @@
+# bench_concurrent_categories.py
+#
+# Compares sequential and concurrent category fetching in
+# gemini_journalist_with_categories.fetch_and_store_news against the offline
+# fake Gemini client, so the fan-out speedup can be measured without network access.
+#
+# Usage: python bench_concurrent_categories.py --latency 0.5 --jitter 0.5 --max-workers 6
+
+import argparse
+import json
+import time
+
+import gemini_journalist_with_categories as journalist
+from fakes import FakeFirestore, FakeGeminiClient
+
+
+def run_once(concurrent: bool, latency: float, jitter: float, max_workers: int, country: str):
+    journalist.gemini_client = FakeGeminiClient(latency=latency, jitter=jitter, seed=42)
+    journalist.db = FakeFirestore()
+
+    start = time.perf_counter()
+    results = journalist.fetch_and_store_news(country, ["English"], concurrent=concurrent, max_workers=max_workers)
+    journalist.firestore_writer.flush()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": "concurrent" if concurrent else "sequential",
+        "wall_time_s": round(elapsed, 3),
+        "gemini_calls": journalist.gemini_client.calls,
+        "status": results["English"]["status"],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark category fan-out against a fake Gemini client.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Base latency per fake Gemini call, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Extra uniform latency per call, in seconds.")
+    parser.add_argument("--max-workers", type=int, default=journalist.MAX_CONCURRENT_CATEGORIES)
+    parser.add_argument("--country", default="US")
+    args = parser.parse_args()
+
+    sequential = run_once(False, args.latency, args.jitter, args.max_workers, args.country)
+    concurrent = run_once(True, args.latency, args.jitter, args.max_workers, args.country)
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps({
+        "sequential": sequential,
+        "concurrent": concurrent,
+        "speedup": round(sequential["wall_time_s"] / concurrent["wall_time_s"], 2),
+    }, indent=2))
@@ -0,0 +1,126 @@
+# bench_context_cache.py
+#
+# Measures context caching of the shared system instructions (CONTEXT_CACHING
+# in gemini_journalist_with_categories, see context_cache.py) against
+# FakeGeminiClient, whose prompt tokens include the system instruction and
+# whose latency grows with uncached prompt tokens (prefill_latency). Runs every
+# category fetch for --countries countries with caching off and on, for two
+# prompt prefixes:
+#
+#   current     the instructions as shipped
+#   long        the instructions padded to --long-prefix-tokens, as a prompt
+#               with few-shot examples or a style guide would be
+#
+# and reports input tokens split into cached and uncached, their cost in
+# uncached-token units (cached tokens at --cached-price), p50/p99 call latency
+# and the cache lifecycle (created, refreshed, recreated after expiry).
+#
+# The caches and the fake API share a clock that runs --clock-speed times
+# faster than real time, so a 1-hour TTL runs out, and is refreshed, during
+# the benchmark.
+#
+# Usage: python bench_context_cache.py --countries 20
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gemini_journalist_with_categories as journalist
+import metrics
+from bench_harness import percentile
+from context_cache import ContextCache
+from fakes import FakeGeminiClient
+from sweep import expand_work_units, load_countries
+
+PADDING = ("Prefer reporting that names its sources, and never merge two separate events into one story. ")
+
+
+class FastClock:
+    """time.time() sped up `speed` times, shared by the fake API and the cache manager."""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+        self.start = time.time()
+
+    def __call__(self):
+        return self.start + (time.time() - self.start) * self.speed
+
+
+def run_mode(units: list, caching: bool, prefix_tokens: int, args):
+    clock = FastClock(args.clock_speed)
+    gemini = FakeGeminiClient(latency=args.latency * args.time_scale, jitter=0.3, latency_distribution="lognormal",
+                              seed=args.seed, prefill_latency=args.prefill_latency * args.time_scale, clock=clock)
+    journalist.gemini_client = gemini
+    journalist.CONTEXT_CACHING = caching
+    journalist.context_cache = ContextCache(journalist.get_gemini_client, ttl_seconds=args.ttl_seconds, clock=clock)
+    metrics.registry.reset()
+
+    original = journalist.SYSTEM_INSTRUCTION_HEADLINES, journalist.SYSTEM_INSTRUCTION_CATEGORIES
+    if prefix_tokens:
+        padding = PADDING * (prefix_tokens * 4 // len(PADDING))
+        journalist.SYSTEM_INSTRUCTION_HEADLINES = original[0] + " " + padding
+        journalist.SYSTEM_INSTRUCTION_CATEGORIES = original[1] + " " + padding
+    timings = []
+
+    def fetch(unit):
+        start = time.perf_counter()
+        news_items, _ = journalist._fetch_category_data(
+            unit.category, unit.query, journalist.system_instruction_for(unit.category, unit.language),
+            unit.country, unit.language)
+        timings.append(time.perf_counter() - start)
+        return news_items is not None
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                succeeded = sum(executor.map(fetch, units))
+            journalist.context_cache.close()
+    finally:
+        journalist.SYSTEM_INSTRUCTION_HEADLINES, journalist.SYSTEM_INSTRUCTION_CATEGORIES = original
+
+    counters = metrics.registry.counter_totals()
+    cached = sum(value for (name, labels), value in metrics.registry._counters.items()
+                 if name == "gemini_input_tokens_total" and ("cache", "cached") in labels)
+    uncached = counters.get("gemini_input_tokens_total", 0) - cached
+    events = {dict(labels)["event"]: int(value) for (name, labels), value in metrics.registry._counters.items()
+              if name == "context_cache_events_total"}
+    return {
+        "units": len(units),
+        "succeeded": succeeded,
+        "input_tokens_cached": int(cached),
+        "input_tokens_uncached": int(uncached),
+        "input_cost_units": round(uncached + cached * args.cached_price),
+        "p50_fetch_s": round(percentile(timings, 50), 4),
+        "p99_fetch_s": round(percentile(timings, 99), 4),
+        "backend_calls": gemini.calls,
+        "cache_events": events,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure context caching of the shared system instructions on offline fakes.")
+    parser.add_argument("--countries", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=8.0, help="Median generation time in real seconds, before scaling.")
+    parser.add_argument("--prefill-latency", type=float, default=0.5, help="Real seconds per 1K uncached prompt tokens, before scaling.")
+    parser.add_argument("--long-prefix-tokens", type=int, default=2048)
+    parser.add_argument("--cached-price", type=float, default=0.25, help="Price of a cached input token relative to an uncached one.")
+    parser.add_argument("--ttl-seconds", type=float, default=3600)
+    parser.add_argument("--clock-speed", type=float, default=5000.0, help="How much faster the cache clock runs than real time.")
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    units = expand_work_units(load_countries()[:args.countries])
+    report = {}
+    for prompt, prefix_tokens in (("current", 0), ("long", args.long_prefix_tokens)):
+        report[prompt] = {"uncached": run_mode(units, False, prefix_tokens, args),
+                          "cached": run_mode(units, True, prefix_tokens, args)}
+        uncached, cached = report[prompt]["uncached"], report[prompt]["cached"]
+        report[prompt]["input_cost_saving"] = round(1 - cached["input_cost_units"] / uncached["input_cost_units"], 3)
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,102 @@
+# bench_dedup.py
+#
+# Measures dedup.dedupe_news_data on synthetic consolidated payloads the size
+# of a full world sweep (one payload per country in countries.txt). A share of
+# the Headlines stories is copied into a topical category with light rewording,
+# so the benchmark can report recall and false merges alongside throughput.
+#
+# Usage: python bench_dedup.py --items-per-category 8 --duplicate-rate 0.3
+
+import argparse
+import json
+import random
+import time
+
+from dedup import dedupe_news_data
+from sweep import load_countries
+
+CATEGORIES = ["Headlines", "Politics", "Business and Markets", "Technology", "Health", "Sports"]
+
+
+def _make_vocabulary(rng: random.Random, size: int = 3000):
+    """Pseudo-words of news-like length, so unrelated stories share few shingles."""
+    letters = "etaoinshrdlcumwfgypbvk"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+VOCABULARY = _make_vocabulary(random.Random(0))
+
+
+def _sentence(rng: random.Random, words: int):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def _reword(rng: random.Random, text: str):
+    """Light paraphrase: swap a few words and drop one, as two generations of a story differ."""
+    words = text.rstrip(".").split()
+    for _ in range(max(1, len(words) // 10)):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    if len(words) > 6:
+        del words[rng.randrange(len(words))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_payload(rng: random.Random, country: str, items_per_category: int, duplicate_rate: float):
+    """Returns (news_data, number of injected cross-category duplicates)."""
+    news_data = {}
+    for category in CATEGORIES:
+        news_data[category] = {"news_items": [
+            {
+                "title": _sentence(rng, 8),
+                "summary": _sentence(rng, 40),
+                "sources": [{"link_title": "Source", "url": f"https://{rng.choice(['apnews.com', 'reuters.com', 'bbc.com'])}/{country}/{rng.random()}"}],
+            }
+            for _ in range(items_per_category)
+        ]}
+
+    injected = 0
+    for item in news_data["Headlines"]["news_items"]:
+        if rng.random() < duplicate_rate:
+            target = rng.choice(CATEGORIES[1:])
+            news_data[target]["news_items"][rng.randrange(items_per_category)] = {
+                "title": _reword(rng, item["title"]),
+                "summary": _reword(rng, item["summary"]),
+                "sources": list(item["sources"]),
+            }
+            injected += 1
+    return news_data, injected
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark cross-category dedup on world-sized synthetic payloads.")
+    parser.add_argument("--items-per-category", type=int, default=8)
+    parser.add_argument("--duplicate-rate", type=float, default=0.3, help="Share of Headlines stories copied into a topical category.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    countries = load_countries()
+    payloads = [make_payload(rng, country, args.items_per_category, args.duplicate_rate) for country in countries]
+
+    items, injected, removed, clusters = 0, 0, 0, 0
+    start = time.perf_counter()
+    for news_data, injected_here in payloads:
+        _, stats = dedupe_news_data(news_data)
+        items += stats["items"]
+        removed += stats["removed"]
+        clusters += stats["clusters"]
+        injected += injected_here
+    elapsed = time.perf_counter() - start
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps({
+        "payloads": len(payloads),
+        "items": items,
+        "wall_time_s": round(elapsed, 3),
+        "items_per_s": round(items / elapsed),
+        "injected_duplicates": injected,
+        "removed_duplicates": removed,
+        "clusters": clusters,
+        "recall": round(min(removed, injected) / injected, 3) if injected else None,
+        "extra_merges": max(0, removed - injected),
+    }, indent=2))
@@ -0,0 +1,114 @@
+# bench_grounding.py
+#
+# Compares model-written sources with sources taken from search grounding
+# metadata (GROUNDED_SOURCES in gemini_journalist_with_categories, see
+# grounding.py) against FakeGeminiClient, whose generation time grows with
+# output tokens (output_latency). Runs every category fetch for --countries
+# countries in both modes and reports:
+#
+#   output (candidates) tokens in total and per call
+#   p50/p99 fetch latency
+#   items stored with at least one source
+#   time spent on source post-processing (get_base_url vs grounding resolution)
+#
+# The fake writes one short source per item, so the output-token saving here
+# is a lower bound: real answers often cite two or three full article URLs.
+#
+# With --stream the fetches go through STREAM_RESPONSES, where the grounding
+# metadata only arrives with the last chunk; the run fails if any grounded
+# item ends up without sources.
+#
+# Usage: python bench_grounding.py --countries 20
+#        python bench_grounding.py --countries 5 --stream --stream-chunk-chars 27
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gemini_journalist_with_categories as journalist
+import metrics
+from bench_harness import percentile
+from fakes import FakeGeminiClient
+from sweep import expand_work_units, load_countries
+
+
+def run_mode(countries: list, grounded: bool, args):
+    gemini = FakeGeminiClient(latency=args.latency * args.time_scale, jitter=0.3, latency_distribution="lognormal",
+                              seed=args.seed, output_latency=args.output_latency * args.time_scale,
+                              stream_chunk_chars=args.stream_chunk_chars)
+    journalist.gemini_client = gemini
+    journalist.GROUNDED_SOURCES = grounded
+    journalist.STREAM_RESPONSES = args.stream
+    metrics.registry.reset()
+    # Queries are built per mode: the grounded prompt does not ask for sources
+    units = expand_work_units(countries)
+    timings, sourced = [], []
+    postprocess = [0.0]
+    strip = journalist._strip_source_urls
+
+    def timed_strip(news_items):
+        start = time.perf_counter()
+        strip(news_items)
+        postprocess[0] += time.perf_counter() - start
+
+    def fetch(unit):
+        start = time.perf_counter()
+        news_items, _ = journalist._fetch_category_data(
+            unit.category, unit.query, journalist.system_instruction_for(unit.category, unit.language),
+            unit.country, unit.language)
+        timings.append(time.perf_counter() - start)
+        for item in (news_items or {}).get("news_items", []):
+            sourced.append(bool(item.get("sources")))
+
+    journalist._strip_source_urls = timed_strip
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(fetch, units))
+    finally:
+        journalist._strip_source_urls = strip
+
+    output_tokens = sum(value for (name, labels), value in metrics.registry._counters.items()
+                        if name == "gemini_tokens_total" and ("kind", "candidates") in labels)
+    grounding_seconds = sum(histogram.sum for (name, _), histogram in metrics.registry._histograms.items()
+                            if name == "grounding_seconds")
+    return {
+        "units": len(units),
+        "output_tokens": int(output_tokens),
+        "output_tokens_per_call": round(output_tokens / gemini.calls, 1),
+        "p50_fetch_s": round(percentile(timings, 50), 4),
+        "p99_fetch_s": round(percentile(timings, 99), 4),
+        "items": len(sourced),
+        "items_with_sources": sum(sourced),
+        "source_postprocess_ms": round((postprocess[0] + grounding_seconds) * 1000, 2),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare model-written and grounding-derived sources on offline fakes.")
+    parser.add_argument("--countries", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=3.0, help="Fixed part of a call in real seconds, before scaling.")
+    parser.add_argument("--output-latency", type=float, default=15.0, help="Real seconds per 1K output tokens, before scaling.")
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--stream", action="store_true", help="Fetch through streamed responses.")
+    parser.add_argument("--stream-chunk-chars", type=int, default=64, help="Characters per fake stream chunk.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    countries = load_countries()[:args.countries]
+    report = {"model_sources": run_mode(countries, False, args), "grounded_sources": run_mode(countries, True, args)}
+    report["output_token_saving"] = round(1 - report["grounded_sources"]["output_tokens"] / report["model_sources"]["output_tokens"], 3) \
+        if report["model_sources"]["output_tokens"] else None
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+
+    grounded = report["grounded_sources"]
+    if grounded["items_with_sources"] < grounded["items"]:
+        print(f"❌ {grounded['items'] - grounded['items_with_sources']} grounded items were stored without sources")
+        sys.exit(1)
@@ -0,0 +1,212 @@
+# bench_harness.py
+#
+# Offline benchmark harness for the fetch and translate paths. Drives
+# gemini_journalist.fetch_and_store_news, gemini_journalist_with_categories.
+# fetch_and_store_news and the gcloud_translate.translate_news_items Cloud
+# Function against the fault-injecting fakes in fakes.py, under a clean
+# scenario and a set of failure scenarios, and reports per target:
+#
+#   p50/p99 latency of one operation (a country, or a translate request)
+#   throughput in operations per second
+#   backend call counts and injected faults
+#   retry amplification: backend calls relative to the clean scenario
+#   totals of every counter in the metrics registry (errors, backoff, ...)
+#
+# Backoff delays, deadlines and fake latencies are all multiplied by
+# --time-scale, so a run takes seconds and needs no network access or
+# credentials. The exit status is non-zero if the clean scenario has any
+# failed operation, so the harness can gate CI.
+#
+# Usage: python bench_harness.py --countries 10 --scenarios clean flaky degraded
+#        python bench_harness.py --quick --output bench_report.json
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import gcloud_translate
+import gemini_journalist
+import gemini_journalist_with_categories
+import metrics
+from fakes import FakeFirestore, FakeGeminiClient, FakeTranslateClient, make_news_items
+from retry_policy import CircuitBreaker, RetryPolicy
+from sweep import load_countries
+from translation_cache import LRUCache, TranslationCache
+
+SCENARIOS = {
+    "clean": {},
+    "flaky": {"error_rates": {503: 0.05, 500: 0.02, 429: 0.03}, "empty_rate": 0.02, "malformed_rate": 0.02},
+    "degraded": {"error_rates": {503: 0.15, 500: 0.05, 429: 0.10}, "empty_rate": 0.05, "malformed_rate": 0.05},
+    # Gemini calls that never answer; only the per-attempt HTTP timeout gets the worker back
+    "hung": {"hang_rate": 0.05},
+}
+
+TRANSLATE_TARGETS = ["es", "fr", "de", "ar", "zh"]
+
+
+def percentile(values: list, pct: float):
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _scaled_retry_policy(module, time_scale: float, seed: int):
+    """The module's retry configuration with every delay and deadline scaled down."""
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=15 * time_scale, max_reset_timeout=300 * time_scale)
+    return RetryPolicy(
+        max_attempts=module.MAX_RETRIES,
+        base_delay=module.INITIAL_WAIT_TIME * time_scale,
+        max_delay=module.MAX_WAIT_TIME * time_scale,
+        call_timeout=module.CALL_DEADLINE * time_scale,
+        attempt_timeout=module.ATTEMPT_TIMEOUT * time_scale,
+        breaker=breaker,
+        seed=seed,
+    )
+
+
+def install_fakes(args, scenario: dict):
+    """Points every module at fresh fakes for one run and returns them."""
+    latency = args.gemini_latency * args.time_scale
+    gemini = FakeGeminiClient(latency=latency, jitter=args.jitter if args.distribution == "lognormal" else latency * args.jitter,
+                              latency_distribution=args.distribution, seed=args.seed, **scenario)
+    db = FakeFirestore(commit_latency=args.commit_latency * args.time_scale, error_rates=scenario.get("error_rates"), seed=args.seed)
+    translate_latency = args.translate_latency * args.time_scale
+    translate = FakeTranslateClient(latency=translate_latency, jitter=translate_latency * args.jitter,
+                                    error_rates=scenario.get("error_rates"), seed=args.seed)
+
+    for module in (gemini_journalist, gemini_journalist_with_categories):
+        module.gemini_client = gemini
+        module.db = db
+        module.retry_policy = _scaled_retry_policy(module, args.time_scale, args.seed)
+        module.firestore_writer.retry_policy = RetryPolicy(max_attempts=5, base_delay=1.0 * args.time_scale,
+                                                           max_delay=30.0 * args.time_scale,
+                                                           call_timeout=120.0 * args.time_scale, seed=args.seed)
+    gcloud_translate.translate_client = translate
+    gcloud_translate.translation_cache = TranslationCache(LRUCache(), store=None)
+    return SimpleNamespace(gemini=gemini, db=db, translate=translate)
+
+
+def _fetch_operation(module, languages: list):
+    def operation(country: str):
+        results = module.fetch_and_store_news(country, languages)
+        return len(results) == len(languages) and all(r.get("status") == "success" for r in results.values())
+    return operation
+
+
+def _translate_operation(items_per_request: int):
+    def operation(country: str):
+        request_json = {"news_items": make_news_items(items_per_request, prefix=country)["news_items"],
+                        "target_language": TRANSLATE_TARGETS[len(country) % len(TRANSLATE_TARGETS)]}
+        request = SimpleNamespace(method="POST", get_json=lambda silent=False: request_json)
+        _, status, _ = gcloud_translate.translate_news_items(request)
+        return status == 200
+    return operation
+
+
+TARGETS = {
+    "gemini_journalist": lambda args: _fetch_operation(gemini_journalist, args.languages),
+    "gemini_journalist_with_categories": lambda args: _fetch_operation(gemini_journalist_with_categories, args.languages),
+    "translate_news_items": lambda args: _translate_operation(args.items_per_request),
+}
+
+
+def run_target(target: str, scenario_name: str, countries: list, args):
+    """Runs one target over every country under one scenario and returns its measurements."""
+    fakes = install_fakes(args, SCENARIOS[scenario_name])
+    metrics.registry.reset()
+    operation = TARGETS[target](args)
+    latencies = []
+
+    def timed(country):
+        start = time.perf_counter()
+        try:
+            ok = operation(country)
+        except Exception:
+            ok = False
+        latencies.append(time.perf_counter() - start)
+        return ok
+
+    output = sys.stdout if args.verbose else io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            outcomes = list(executor.map(timed, countries))
+        for module in (gemini_journalist, gemini_journalist_with_categories):
+            module.firestore_writer.flush()
+    wall_time = time.perf_counter() - start
+
+    backend = fakes.translate if target == "translate_news_items" else fakes.gemini
+    return {
+        "operations": len(outcomes),
+        "succeeded": sum(outcomes),
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "throughput_ops_s": round(len(outcomes) / wall_time, 2),
+        "wall_time_s": round(wall_time, 3),
+        "backend_calls": backend.calls,
+        "faults_injected": backend.faults.injected(),
+        "fault_counts": {str(outcome): count for outcome, count in backend.faults.counts.items()},
+        "firestore_commits": fakes.db.commits,
+        "firestore_faults": fakes.db.faults.injected(),
+        "counters": {name: round(value, 3) for name, value in metrics.registry.counter_totals().items()},
+    }
+
+
+def run_harness(args):
+    countries = [country for country, _ in load_countries()][:args.countries]
+    report = {}
+    for target in args.targets:
+        report[target] = {}
+        for scenario_name in args.scenarios:
+            report[target][scenario_name] = run_target(target, scenario_name, countries, args)
+
+        # Retry amplification: backend calls per call the clean run needed for the same work
+        clean = report[target].get("clean") or run_target(target, "clean", countries, args)
+        for result in report[target].values():
+            result["retry_amplification"] = round(result["backend_calls"] / clean["backend_calls"], 3) if clean["backend_calls"] else None
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmark of the fetch and translate paths under injected faults.")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--countries", type=int, default=10, help="Number of countries (from countries.txt) per run.")
+    parser.add_argument("--languages", nargs="+", default=["English"])
+    parser.add_argument("--concurrency", type=int, default=4, help="Operations in flight at once.")
+    parser.add_argument("--items-per-request", type=int, default=10, help="News items per translate request.")
+    parser.add_argument("--gemini-latency", type=float, default=8.0, help="Median Gemini latency in real seconds, before scaling.")
+    parser.add_argument("--translate-latency", type=float, default=0.3, help="Translate latency in real seconds, before scaling.")
+    parser.add_argument("--commit-latency", type=float, default=0.1, help="Firestore commit latency in real seconds, before scaling.")
+    parser.add_argument("--distribution", choices=["uniform", "exponential", "lognormal"], default="lognormal")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Lognormal shape, or jitter as a fraction of latency.")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Multiplier applied to every latency, backoff and deadline.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quick", action="store_true", help="Small run for CI: 3 countries.")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the scripts' own output.")
+    args = parser.parse_args()
+    if args.quick:
+        args.countries = 3
+
+    report = run_harness(args)
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    clean_failures = [target for target, results in report.items()
+                      if "clean" in results and results["clean"]["succeeded"] < results["clean"]["operations"]]
+    if clean_failures:
+        print(f"❌ Clean scenario had failures for: {clean_failures}")
+        sys.exit(1)
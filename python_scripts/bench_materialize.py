@@ -0,0 +1,201 @@
+# bench_materialize.py
+#
+# Benchmark for pre-materialized translations (materialized_translations.py).
+#
+# Fills a FakeFirestore with the current English news of every countries.txt
+# country that has English (one snapshot per country, with one category held
+# as a {"ref": ...} placeholder to an older snapshot) and with request counts
+# drawn from a Zipf distribution over the languages.txt languages, recorded
+# through RequestCounter as several function instances would. Then:
+#
+#   stage         run_stage picks the top --top-k languages and materializes them
+#   live          --requests translate_news_items calls without snapshot_id, so
+#                 every one is translated live (the behaviour before)
+#   materialized  the same requests with snapshot_id and category
+#
+# Both request runs start from an empty translation cache, as a fresh function
+# instance after a sweep would. Reports request latency (p50/p95) for the
+# top-K languages and the long tail, Translate API calls on the request path
+# and the share of requests answered from storage, and checks that every
+# response is identical in both runs and that the stage picked the top-K of
+# the recorded counts.
+#
+# Usage: python bench_materialize.py --requests 300 --top-k 5
+#        python bench_materialize.py --quick
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+import gcloud_translate
+import materialized_translations as mt
+import sweep
+from compact_format import FORMAT_VERSION, encode_news_data
+from country_codes import country_code, language_code
+from fakes import FakeFirestore, FakeTranslateClient, make_news_items
+from translation_cache import LRUCache, TranslationCache
+
+CATEGORIES = ["Headlines", "Business and Markets", "Politics", "Art and Culture", "Sports", "Science and Technology"]
+LANGUAGES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "languages.txt")
+
+
+class FakeRequest:
+    method = "POST"
+    headers = {}
+
+    def __init__(self, body: dict):
+        self._body = body
+
+    def get_json(self, silent=False):
+        return self._body
+
+
+def request_languages():
+    """Translate codes of the languages.txt entries that have one, English excluded."""
+    with open(LANGUAGES_FILE, encoding="utf-8") as f:
+        names = [line.split(" (")[0].strip() for line in f if line.strip()]
+    codes = dict.fromkeys(language_code(name) for name in names if language_code(name) != name)
+    return [code for code in codes if code != mt.SOURCE_LANGUAGE]
+
+
+def build_news(db, countries: list, items: int, compact: bool):
+    """One current snapshot per country, its Sports category a ref to an older one. Returns the request targets."""
+    targets = []
+    for country in countries:
+        old_id, new_id = f"{country}_old", f"{country}_new"
+        old_news = {"Sports": {"news_items": make_news_items(items, prefix=f"{country} Sports old")["news_items"]}}
+        new_news = {category: {"news_items": make_news_items(items, prefix=f"{country} {category}")["news_items"]}
+                    for category in CATEGORIES if category != "Sports"}
+        new_news["Sports"] = {"ref": old_id, "fingerprint": "f"}
+        for doc_id, news_data, timestamp in ((old_id, old_news, "2025-06-29T05:00:00+00:00"),
+                                             (new_id, new_news, "2025-06-30T05:00:00+00:00")):
+            document = {"country": country, "language": "en", "timestamp": timestamp, "news_data": news_data}
+            if compact:
+                document["news_data"], document["source_table"] = encode_news_data(news_data)
+                document["format_version"] = FORMAT_VERSION
+            db.collection(mt.SNAPSHOTS).document(doc_id).set(document)
+        db.collection(mt.LATEST).document(f"{country}_en").set({
+            "country": country, "language": "en", "snapshot_id": new_id,
+            "category_snapshots": {category: old_id if category == "Sports" else new_id for category in CATEGORIES},
+        })
+        for category in CATEGORIES:
+            english = old_news["Sports"] if category == "Sports" else new_news[category]
+            targets.append((new_id, category, english["news_items"]))
+    return targets
+
+
+def record_counts(db, languages: list, requests: int, instances: int, rng: random.Random):
+    """Zipf-distributed request counts, flushed by several RequestCounters. Returns the expected ranking."""
+    weights = [1 / (rank + 1) for rank in range(len(languages))]
+    counters = [mt.RequestCounter(lambda: db, flush_seconds=float("inf"), instance_id=f"instance-{i}") for i in range(instances)]
+    for language in rng.choices(languages, weights=weights, k=requests):
+        rng.choice(counters).record(language)
+    for counter in counters:
+        counter.flush()
+    return weights
+
+
+def reset_function(db, args):
+    gcloud_translate.translate_client = FakeTranslateClient(latency=args.translate_latency, per_segment_latency=args.per_segment_latency,
+                                                            seed=args.seed)
+    gcloud_translate.translation_cache = TranslationCache(LRUCache(), store=None)
+    gcloud_translate.request_counter = mt.RequestCounter(lambda: db, flush_seconds=float("inf"))
+    gcloud_translate.materialized = mt.MaterializedTranslations(lambda: db)
+
+
+def run_requests(db, requests: list, top_languages: set, with_snapshot: bool, args):
+    reset_function(db, args)
+    latencies = {"top_k": [], "long_tail": []}
+    responses = []
+    for snapshot_id, category, items, language in requests:
+        body = {"news_items": items, "target_language": language}
+        if with_snapshot:
+            body.update(snapshot_id=snapshot_id, category=category)
+        start = time.perf_counter()
+        response, status, _ = gcloud_translate.translate_news_items(FakeRequest(body))
+        latencies["top_k" if language in top_languages else "long_tail"].append(time.perf_counter() - start)
+        responses.append(json.loads(response) if status == 200 else None)
+
+    def summary(values):
+        if not values:
+            return {"requests": 0}
+        ordered = sorted(values)
+        return {"requests": len(values), "p50_ms": round(statistics.median(ordered) * 1000, 2),
+                "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 2)}
+
+    return responses, {
+        "top_k": summary(latencies["top_k"]),
+        "long_tail": summary(latencies["long_tail"]),
+        "translate_calls": gcloud_translate.translate_client.calls,
+        "translate_segments": gcloud_translate.translate_client.segments,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark pre-materialized translations against live translation.")
+    parser.add_argument("--countries", type=int, help="Limit the number of English-speaking countries (default: all).")
+    parser.add_argument("--items", type=int, default=8, help="News items per category.")
+    parser.add_argument("--top-k", type=int, default=mt.DEFAULT_TOP_K)
+    parser.add_argument("--requests", type=int, default=300, help="Translate requests replayed in each mode.")
+    parser.add_argument("--counted-requests", type=int, default=20000, help="Historical requests behind the top-K choice.")
+    parser.add_argument("--instances", type=int, default=4, help="Function instances the counts come from.")
+    parser.add_argument("--translate-latency", type=float, default=0.15, help="Seconds per fake Translate call.")
+    parser.add_argument("--per-segment-latency", type=float, default=0.002)
+    parser.add_argument("--read-latency", type=float, default=0.01, help="Seconds per fake Firestore document read.")
+    parser.add_argument("--plain-documents", action="store_true", help="Store snapshots and translations uncompacted.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quick", action="store_true", help="Small run for CI: 5 countries, 60 requests.")
+    args = parser.parse_args()
+    if args.quick:
+        args.countries, args.requests, args.counted_requests = 5, 60, 2000
+
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(args.seed)
+    countries = [country_code(country) for country, languages in sweep.load_countries() if "English" in languages][:args.countries]
+    db = FakeFirestore()
+    targets = build_news(db, countries, args.items, compact=not args.plain_documents)
+    languages = request_languages()
+    rng.shuffle(languages) # popularity does not follow the alphabet
+    weights = record_counts(db, languages, args.counted_requests, args.instances, rng)
+
+    reset_function(db, args)
+    start = time.perf_counter()
+    stage = mt.run_stage(db, top_k=args.top_k, compact=not args.plain_documents)
+    stage["wall_time_s"] = round(time.perf_counter() - start, 3)
+    stage["translate_calls"] = gcloud_translate.translate_client.calls
+    stage.pop("request_totals", None)
+
+    # Requests follow the same popularity as the counts they were chosen from
+    requests = [(*rng.choice(targets), language) for language in rng.choices(languages, weights=weights, k=args.requests)]
+    db.read_latency = args.read_latency
+    top = set(stage["languages"])
+    live_responses, live = run_requests(db, requests, top, with_snapshot=False, args=args)
+    materialized_responses, materialized = run_requests(db, requests, top, with_snapshot=True, args=args)
+
+    expected_top = mt.top_languages(db, args.top_k, exclude={mt.SOURCE_LANGUAGE})[0]
+    mismatches = sum(1 for a, b in zip(live_responses, materialized_responses) if a != b or a is None)
+    top_share = sum(1 for *_, language in requests if language in top) / max(1, len(requests))
+    report = {
+        "countries": len(countries),
+        "snapshots": len(db.collection(mt.SNAPSHOTS).docs),
+        "stage": stage,
+        "requests": len(requests),
+        "top_k_share_of_requests": round(top_share, 3),
+        "live": live,
+        "materialized": materialized,
+        "top_k_p50_speedup": round(live["top_k"]["p50_ms"] / materialized["top_k"]["p50_ms"], 1)
+        if materialized["top_k"].get("p50_ms") else None,
+        "request_path_translate_calls_saved": live["translate_calls"] - materialized["translate_calls"],
+        "response_mismatches": mismatches,
+    }
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+
+    if mismatches or stage["languages"] != expected_top:
+        print(f"❌ {mismatches} responses differ between live and materialized translation, or the wrong languages were materialized")
+        sys.exit(1)
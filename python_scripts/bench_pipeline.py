@@ -0,0 +1,64 @@
+# bench_pipeline.py
+#
+# Compares the per-language mode (one grounded Gemini query per language) with
+# the fetch-once, translate-many pipeline mode, for both journalist scripts,
+# using the offline fakes. Reports wall time and Gemini/Translate call counts.
+#
+# Usage: python bench_pipeline.py --languages English Spanish French --gemini-latency 1.0
+
+import argparse
+import json
+import time
+
+import gcloud_translate
+import gemini_journalist
+import gemini_journalist_with_categories
+from fakes import FakeFirestore, FakeGeminiClient, FakeTranslateClient
+from translation_cache import LRUCache, TranslationCache
+
+
+def run_mode(module, run, gemini_latency: float, translate_latency: float):
+    module.gemini_client = FakeGeminiClient(latency=gemini_latency, seed=7)
+    module.db = FakeFirestore()
+    gcloud_translate.translate_client = FakeTranslateClient(latency=translate_latency)
+    # Start every mode with a cold, memory-only translation cache
+    gcloud_translate.translation_cache = TranslationCache(LRUCache(), store=None)
+
+    start = time.perf_counter()
+    results = run()
+    module.firestore_writer.flush()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "wall_time_s": round(elapsed, 3),
+        "gemini_calls": module.gemini_client.calls,
+        "translate_calls": gcloud_translate.translate_client.calls,
+        "documents_written": module.db.writes,
+        "succeeded": sum(1 for r in results.values() if r.get("status") == "success"),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark per-language fetching against fetch-once, translate-many.")
+    parser.add_argument("--country", default="US")
+    parser.add_argument("--languages", nargs="+", default=["English", "Spanish", "French"])
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="Seconds per fake Gemini call.")
+    parser.add_argument("--translate-latency", type=float, default=0.1, help="Seconds per fake Translate call.")
+    args = parser.parse_args()
+
+    c, langs, gl, tl = args.country, args.languages, args.gemini_latency, args.translate_latency
+    categories = gemini_journalist_with_categories
+
+    summary = {
+        "gemini_journalist": {
+            "per_language": run_mode(gemini_journalist, lambda: gemini_journalist.fetch_and_store_news(c, langs), gl, tl),
+            "pipeline": run_mode(gemini_journalist, lambda: gemini_journalist.fetch_and_translate_news(c, langs), gl, tl),
+        },
+        "gemini_journalist_with_categories": {
+            "per_language": run_mode(categories, lambda: categories.fetch_and_store_news(c, langs), gl, tl),
+            "pipeline": run_mode(categories, lambda: categories.fetch_and_store_news(c, langs, translate_from="English"), gl, tl),
+        },
+    }
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(summary, indent=2))
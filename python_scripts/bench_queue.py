@@ -0,0 +1,123 @@
+# bench_queue.py
+#
+# Scale-out benchmark for work_queue.py. Enqueues a run into a SQLite lease
+# store and drains it with 1, 2, 4, ... worker processes, each talking to its
+# own offline fakes (FakeGeminiClient with a fixed per-call latency,
+# FakeFirestore). Reports per worker count:
+#
+#   wall time and units per second
+#   speedup and efficiency relative to one worker
+#   documents written, units failed and units that needed more than one lease
+#
+# A crash scenario also starts a worker that claims units and exits without
+# completing them; the rest of the fleet must pick them up once the leases
+# expire, with every document still written exactly once.
+#
+# Usage: python bench_queue.py --countries 10 --workers 1 2 4 8
+#        python bench_queue.py --quick
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import sweep
+import work_queue
+
+
+def _worker(db_path: str, run_id: str, countries: list, latency: float, lease_seconds: float, seed: int, results):
+    import gemini_journalist_with_categories as journalist
+    from fakes import FakeFirestore, FakeGeminiClient
+    journalist.gemini_client = FakeGeminiClient(latency=latency, seed=seed)
+    journalist.db = FakeFirestore()
+    queue = work_queue.WorkQueue(work_queue.SQLiteLeaseStore(db_path), run_id, countries, lease_seconds=lease_seconds)
+    with contextlib.redirect_stdout(io.StringIO()):
+        produced = queue.work(limiter=sweep.QuotaLimiter(1_000_000, 1_000_000_000), idle_poll=lease_seconds / 10)
+    results.put(produced)
+
+
+def _crashing_worker(db_path: str, run_id: str, countries: list, lease_seconds: float, units: int):
+    queue = work_queue.WorkQueue(work_queue.SQLiteLeaseStore(db_path), run_id, countries, lease_seconds=lease_seconds)
+    queue.claim("crashed-worker", units)
+    os._exit(1)
+
+
+def run_fleet(workers: int, countries: list, args, crash_units: int = 0):
+    db_path = os.path.join(tempfile.mkdtemp(), "queue.sqlite3")
+    run_id = f"bench-{workers}"
+    queue = work_queue.WorkQueue(work_queue.SQLiteLeaseStore(db_path), run_id, countries, lease_seconds=args.lease_seconds)
+    with contextlib.redirect_stdout(io.StringIO()):
+        queue.enqueue()
+
+    if crash_units:
+        crasher = multiprocessing.Process(target=_crashing_worker, args=(db_path, run_id, countries, args.lease_seconds, crash_units))
+        crasher.start()
+        crasher.join()
+
+    results = multiprocessing.Queue()
+    start = time.perf_counter()
+    processes = [multiprocessing.Process(target=_worker, args=(db_path, run_id, countries, args.latency, args.lease_seconds,
+                                                               args.seed + i, results))
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    produced = {}
+    for _ in processes:
+        produced.update(results.get())
+    for process in processes:
+        process.join()
+    wall_time = time.perf_counter() - start
+
+    counts = queue.status()
+    with sqlite3.connect(db_path) as conn:
+        releases = conn.execute("SELECT COUNT(*) FROM leases WHERE run_id = ? AND attempts > 1", (run_id,)).fetchone()[0]
+    return {
+        "workers": workers,
+        "units": len(queue.units),
+        "wall_time_s": round(wall_time, 3),
+        "units_per_s": round(len(queue.units) / wall_time, 2),
+        "documents_written": sum(1 for result in produced.values() if result.get("status") == "success"),
+        "documents_expected": len(queue.groups) if not queue.translate_from else sum(len(g.targets) for g in queue.groups.values()),
+        "failed_units": counts[work_queue.FAILED],
+        "units_leased_more_than_once": releases,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark scale-out of the lease-based work queue across processes.")
+    parser.add_argument("--countries", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per fake Gemini call.")
+    parser.add_argument("--lease-seconds", type=float, default=2.0)
+    parser.add_argument("--crash-units", type=int, default=5, help="Units claimed by the worker that crashes (0 to skip).")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quick", action="store_true", help="Small run for CI: 3 countries, 1 and 2 workers.")
+    args = parser.parse_args()
+    if args.quick:
+        args.countries, args.workers = 3, [1, 2]
+
+    countries = sweep.load_countries()[:args.countries]
+    scale_out = [run_fleet(workers, countries, args) for workers in args.workers]
+    baseline = scale_out[0]
+    for result in scale_out:
+        speedup = result["units_per_s"] / baseline["units_per_s"]
+        result["speedup"] = round(speedup, 2)
+        result["efficiency"] = round(speedup * baseline["workers"] / result["workers"], 2)
+
+    report = {"scale_out": scale_out}
+    if args.crash_units:
+        report["crash_recovery"] = run_fleet(max(args.workers), countries, args, crash_units=args.crash_units)
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+
+    incomplete = [r for r in scale_out + [report.get("crash_recovery")] if r and r["documents_written"] < r["documents_expected"]]
+    if incomplete:
+        print(f"❌ {len(incomplete)} runs left documents unwritten")
+        sys.exit(1)
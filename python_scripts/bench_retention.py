@@ -0,0 +1,221 @@
+# bench_retention.py
+#
+# Benchmark and consistency check for retention.py against a FakeFirestore
+# filled with synthetic history: every (country, language) of countries.txt
+# with --days days of --runs-per-day snapshots, written the way
+# store_consolidated_news writes them with change detection on (unchanged
+# categories become {"ref": ...} placeholders), a matching latest document
+# per group, and --errors-per-day gemini_query_errors records.
+#
+# Runs, in order:
+#
+#   dry_run    plan only; must delete nothing and predict the real deletions
+#   partial    stopped by --max-batches, as a crash would stop it
+#   resumed    --resume of the partial run, to completion
+#   repeat     a second full run, which must find nothing left to delete
+#
+# and then checks that every group kept its newest --keep snapshots and the
+# newest of each of the last --keep-daily days, that every ref placeholder in
+# those and every latest.category_snapshots entry still reaches content,
+# that no error record older than the cutoff is left, and that the rollups
+# count exactly the error records that were deleted. Reports documents
+# deleted per second and Firestore reads per deleted document.
+#
+# Usage: python bench_retention.py --days 30 --runs-per-day 4
+#        python bench_retention.py --quick
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import retention
+import sweep
+from country_codes import country_code, language_code
+from fakes import FakeFirestore
+
+CATEGORIES = ["Headlines", "Politics", "Business", "Technology", "Sports"]
+STATUSES = ["persistent_failure", "quota_exhausted", "malformed_response"]
+NOW = datetime(2025, 6, 30, 12, 0, tzinfo=timezone.utc)
+
+
+def build_history(db, groups: list, days: int, runs_per_day: int, unchanged_rate: float, errors_per_day: int, seed: int):
+    """Fills db directly (no write accounting) and returns the expected error counts per day."""
+    rng = random.Random(seed)
+    snapshots = db.collection(retention.SNAPSHOTS).docs
+    latest = db.collection(retention.LATEST).docs
+    for country, language in groups:
+        category_snapshots = {}
+        for run in range(days * runs_per_day):
+            when = NOW - timedelta(days=days) + timedelta(hours=24 * run / runs_per_day) + timedelta(minutes=rng.randint(0, 59))
+            doc_id = f"{country}_{language}_{run:05d}"
+            news_data = {}
+            for category in CATEGORIES:
+                if category in category_snapshots and rng.random() < unchanged_rate:
+                    news_data[category] = {"ref": category_snapshots[category], "fingerprint": "f"}
+                else:
+                    news_data[category] = {"news_items": [{"title": f"{category} {run}", "summary": "s", "sources": []}]}
+                    category_snapshots[category] = doc_id
+            snapshots[doc_id] = {"country": country, "language": language, "timestamp": when.isoformat(),
+                                 "news_data": news_data, "fingerprints": {}}
+        latest[f"{country}_{language}"] = {"country": country, "language": language, "snapshot_id": doc_id,
+                                           "category_snapshots": dict(category_snapshots)}
+
+    errors = db.collection(retention.ERRORS).docs
+    expected = Counter()
+    for day in range(days):
+        for i in range(errors_per_day):
+            when = NOW - timedelta(days=days - day) + timedelta(seconds=rng.randint(0, 86399))
+            errors[f"err{day:04d}_{i:05d}"] = {"country": rng.choice(groups)[0], "language": "English",
+                                               "error_message": "x", "status": rng.choice(STATUSES),
+                                               "timestamp": when.isoformat()}
+            expected[when.date().isoformat()] += 1
+    return expected
+
+
+def retained_ids(db, keep: int, keep_daily: int):
+    """
+    Per group, the snapshots the retention policy keeps for their own sake (the
+    newest `keep` and the newest of each recent day), computed independently of retention.py.
+    """
+    by_group = {}
+    for doc_id, data in db.collection(retention.SNAPSHOTS).docs.items():
+        by_group.setdefault((data["country"], data["language"]), []).append((data["timestamp"], doc_id))
+    first_day = (NOW - timedelta(days=keep_daily)).date().isoformat()
+    retained = {}
+    for group, entries in by_group.items():
+        entries.sort(reverse=True)
+        newest = {doc_id for _, doc_id in entries[:keep]}
+        daily = {}
+        for timestamp, doc_id in entries:
+            if keep_daily and timestamp[:10] >= first_day:
+                daily.setdefault(timestamp[:10], doc_id)
+        retained[group] = newest | set(daily.values())
+    return retained
+
+
+def check(db, retained: dict, cutoff_day: str, expected_errors: Counter, errors_deleted: int):
+    problems = []
+    snapshots = db.collection(retention.SNAPSHOTS).docs
+    missing = sum(len(roots - set(snapshots)) for roots in retained.values())
+    if missing:
+        problems.append(f"{missing} of the newest or daily snapshots deleted")
+
+    def resolves(doc_id, category):
+        return "news_items" in snapshots.get(doc_id, {}).get("news_data", {}).get(category, {})
+
+    # Every reference a reader can follow, from a retained snapshot or a latest document, must reach content
+    dangling = sum(1 for roots in retained.values() for doc_id in roots & set(snapshots)
+                   for category, category_data in snapshots[doc_id]["news_data"].items()
+                   if "ref" in category_data and not resolves(category_data["ref"], category))
+    dangling += sum(1 for data in db.collection(retention.LATEST).docs.values()
+                    for category, doc_id in data["category_snapshots"].items() if not resolves(doc_id, category))
+    if dangling:
+        problems.append(f"{dangling} references to deleted snapshots")
+
+    stale = sum(1 for data in db.collection(retention.ERRORS).docs.values() if data["timestamp"][:10] < cutoff_day)
+    if stale:
+        problems.append(f"{stale} error records older than {cutoff_day} left")
+    rollups = db.collection(retention.ERROR_ROLLUPS).docs
+    rolled_up = sum(rollup["total"] for rollup in rollups.values())
+    if rolled_up != errors_deleted:
+        problems.append(f"rollups count {rolled_up} records, {errors_deleted} were deleted")
+    wrong_days = [day for day, rollup in rollups.items()
+                  if rollup["total"] != expected_errors[day] or sum(c["count"] for c in rollup["counts"]) != rollup["total"]]
+    if wrong_days:
+        problems.append(f"rollups wrong for {len(wrong_days)} days")
+    return problems
+
+
+def timed_run(db, state, args, **overrides):
+    options = dict(keep_latest=args.keep, keep_daily_days=args.keep_daily, error_retention_days=args.error_days,
+                   max_ops_per_second=args.max_ops_per_second)
+    options.update(overrides)
+    reads_before, deletes_before = db.reads, db.deletes
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = retention.run_retention(db, state, **options)
+    wall_time = time.perf_counter() - start
+    return {
+        "complete": report["complete"],
+        "wall_time_s": round(wall_time, 3),
+        "snapshots_deleted": report["snapshots"]["deleted"],
+        "error_records": report["errors"]["records"],
+        "groups_skipped": report["snapshots"]["groups_skipped"],
+        "delete_batches": report["delete_batches"],
+        "documents_deleted": db.deletes - deletes_before,
+        "deleted_per_s": round((db.deletes - deletes_before) / wall_time, 1),
+        "reads": db.reads - reads_before,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the retention job on synthetic Firestore history.")
+    parser.add_argument("--groups", type=int, help="Limit the number of (country, language) groups (default: all of countries.txt).")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--runs-per-day", type=int, default=4)
+    parser.add_argument("--unchanged-rate", type=float, default=0.5, help="Share of categories stored as ref placeholders.")
+    parser.add_argument("--errors-per-day", type=int, default=200)
+    parser.add_argument("--keep", type=int, default=retention.KEEP_LATEST)
+    parser.add_argument("--keep-daily", type=int, default=14)
+    parser.add_argument("--error-days", type=int, default=retention.ERROR_RETENTION_DAYS)
+    parser.add_argument("--max-ops-per-second", type=float, default=1_000_000, help="Delete pace (effectively unthrottled by default).")
+    parser.add_argument("--max-batches", type=int, default=20, help="Batches the partial run is allowed before it stops.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quick", action="store_true", help="Small run for CI: 20 groups, 20 days.")
+    args = parser.parse_args()
+    if args.quick:
+        args.groups, args.days, args.errors_per_day, args.max_batches = 20, 20, 50, 3
+
+    groups = sorted({(country_code(country), language_code(lang)) for country, languages in sweep.load_countries()
+                     for lang in languages})[:args.groups]
+    db = FakeFirestore()
+    expected_errors = build_history(db, groups, args.days, args.runs_per_day, args.unchanged_rate, args.errors_per_day, args.seed)
+    snapshots_before = len(db.collection(retention.SNAPSHOTS).docs)
+    errors_before = len(db.collection(retention.ERRORS).docs)
+    retained = retained_ids(db, args.keep, args.keep_daily)
+
+    state_path = os.path.join(tempfile.mkdtemp(), "retention_state.json")
+    dry_run = timed_run(db, retention.RetentionState(state_path, now=NOW), args, dry_run=True)
+    partial = timed_run(db, retention.RetentionState(state_path, now=NOW), args, max_batches=args.max_batches)
+    resumed = timed_run(db, retention.RetentionState(state_path, resume=True), args)
+    repeat = timed_run(db, retention.RetentionState(state_path, now=NOW), args)
+
+    snapshots_deleted = snapshots_before - len(db.collection(retention.SNAPSHOTS).docs)
+    errors_deleted = errors_before - len(db.collection(retention.ERRORS).docs)
+    cutoff_day = (NOW - timedelta(days=args.error_days)).date().isoformat()
+    problems = check(db, retained, cutoff_day, expected_errors, errors_deleted)
+    if dry_run["documents_deleted"]:
+        problems.append("the dry run deleted documents")
+    if partial["complete"] or not resumed["complete"]:
+        problems.append("the partial run did not stop at --max-batches or the resumed run did not finish")
+    if (dry_run["snapshots_deleted"], dry_run["error_records"]) != (snapshots_deleted, errors_deleted):
+        problems.append("the dry run did not predict the deletions")
+    if repeat["documents_deleted"]:
+        problems.append("a second run still found documents to delete")
+
+    report = {
+        "history": {"groups": len(groups), "snapshots": snapshots_before, "error_records": errors_before},
+        "runs": {"dry_run": dry_run, "partial": partial, "resumed": resumed, "repeat": repeat},
+        "result": {
+            "snapshots_deleted": snapshots_deleted,
+            "snapshots_left": len(db.collection(retention.SNAPSHOTS).docs),
+            "error_records_deleted": errors_deleted,
+            "error_rollup_days": len(db.collection(retention.ERROR_ROLLUPS).docs),
+            "reads_per_deleted_document": round((partial["reads"] + resumed["reads"]) / max(1, snapshots_deleted + errors_deleted), 3),
+        },
+        "problems": problems,
+    }
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+
+    if problems:
+        print(f"❌ {len(problems)} consistency problems")
+        sys.exit(1)
@@ -0,0 +1,120 @@
+# bench_startup.py
+#
+# Measures cold-start cost in fresh interpreter processes:
+#
+#   import time of each entry module (and of the helpers alone)
+#   first-request latency of the translate_news_items Cloud Function
+#   the slowest imports under each module, from python -X importtime
+#
+# With --backend fake (the default) the translate call goes to the offline
+# FakeTranslateClient, so the numbers cover import, client/cache construction
+# and request handling without network access. --backend real uses the actual
+# Translate client and needs credentials.
+#
+# Usage: python bench_startup.py --repeat 5
+#        python bench_startup.py --backend real --cache-backend firestore
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_TARGETS = {
+    "helpers_only": "from gemini_journalist_with_categories import safe_json_load, get_base_url",
+    "gcloud_translate": "import gcloud_translate",
+    "gemini_journalist": "import gemini_journalist",
+    "gemini_journalist_with_categories": "import gemini_journalist_with_categories",
+    "sweep": "import sweep",
+}
+
+FIRST_REQUEST_SNIPPET = """
+import json, time
+from types import SimpleNamespace
+start = time.perf_counter()
+import gcloud_translate
+imported = time.perf_counter()
+if {fake!r}:
+    from fakes import FakeTranslateClient
+    gcloud_translate.translate_client = FakeTranslateClient(latency={latency!r})
+body = {{"news_items": [{{"title": "Title", "summary": "Summary", "sources": [{{"link_title": "AP", "url": "https://apnews.com"}}]}}], "target_language": "es"}}
+request = SimpleNamespace(method="POST", get_json=lambda silent=False: body)
+first_start = time.perf_counter()
+_, status, _ = gcloud_translate.translate_news_items(request)
+first_done = time.perf_counter()
+gcloud_translate.translate_news_items(request)
+second_done = time.perf_counter()
+print(json.dumps({{"import_s": imported - start, "first_request_s": first_done - first_start,
+                  "second_request_s": second_done - first_done, "status": status}}))
+"""
+
+
+def _run_python(code: str, env: dict, importtime: bool = False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(command, cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True)
+
+
+def time_import(statement: str, env: dict):
+    code = f"import time\nstart = time.perf_counter()\n{statement}\nprint(time.perf_counter() - start)"
+    result = _run_python(code, env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(statement: str, env: dict, top: int):
+    """The `top` imports with the largest cumulative time (microseconds), from -X importtime."""
+    result = _run_python(statement, env, importtime=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        # 'import time:  self [us] | cumulative | imported package', one line per module
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            entries.append((int(parts[1]), parts[2].strip()))
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in sorted(entries, reverse=True)[:top]]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark import time and first-request latency in fresh processes.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh processes per measurement; the median is reported.")
+    parser.add_argument("--backend", choices=["fake", "real"], default="fake", help="Translate backend for the first request.")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="Seconds per fake Translate call.")
+    parser.add_argument("--cache-backend", default="memory", help="TRANSLATION_CACHE_BACKEND for the first request.")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports to list per module.")
+    args = parser.parse_args()
+
+    env = dict(os.environ, TRANSLATION_CACHE_BACKEND=args.cache_backend)
+
+    imports = {}
+    for name, statement in IMPORT_TARGETS.items():
+        try:
+            samples = [time_import(statement, env) for _ in range(args.repeat)]
+            imports[name] = {
+                "median_ms": round(statistics.median(samples) * 1000, 1),
+                "max_ms": round(max(samples) * 1000, 1),
+                "slowest_imports": slowest_imports(statement, env, args.top),
+            }
+        except RuntimeError as e:
+            imports[name] = {"error": str(e)}
+
+    snippet = FIRST_REQUEST_SNIPPET.format(fake=args.backend == "fake", latency=args.fake_latency)
+    runs = []
+    for _ in range(args.repeat):
+        result = _run_python(snippet, env)
+        if result.returncode != 0:
+            runs = None
+            first_request = {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+            break
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    if runs:
+        first_request = {
+            f"{key}_ms": round(statistics.median(run[f"{key}_s"] for run in runs) * 1000, 1)
+            for key in ("import", "first_request", "second_request")
+        }
+        first_request["status"] = runs[-1]["status"]
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps({"imports": imports, "translate_cold_start": first_request}, indent=2))
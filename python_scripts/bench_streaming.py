@@ -0,0 +1,86 @@
+# bench_streaming.py
+#
+# Compares buffered and streamed category fetches (STREAM_RESPONSES in
+# gemini_journalist_with_categories) against FakeGeminiClient with a share of
+# malformed generations: truncated JSON, prose instead of JSON, items with the
+# wrong fields. Reports per mode:
+#
+#   category fetches that succeeded, and accepted items that fail validation
+#   p50/p99 time until a category's items are available
+#   p50 time to the first item (streaming only; buffered has to wait for all)
+#   backend calls and seconds of generation read (time paid for)
+#
+# Latencies and backoff are multiplied by --time-scale.
+#
+# Usage: python bench_streaming.py --units 200 --malformed-rate 0.2
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gemini_journalist_with_categories as journalist
+import metrics
+from bench_harness import _scaled_retry_policy, percentile
+from fakes import FakeGeminiClient
+from stream_parser import validate_news_item
+from sweep import expand_work_units, load_countries
+
+
+def run_mode(stream: bool, units: list, args):
+    gemini = FakeGeminiClient(latency=args.latency * args.time_scale, jitter=0.5, latency_distribution="lognormal",
+                              seed=args.seed, malformed_rate=args.malformed_rate)
+    journalist.gemini_client = gemini
+    journalist.retry_policy = _scaled_retry_policy(journalist, args.time_scale, args.seed)
+    journalist.STREAM_RESPONSES = stream
+    metrics.registry.reset()
+    timings, outcomes = [], []
+
+    def fetch(unit):
+        start = time.perf_counter()
+        news_items, error_msg = journalist._fetch_category_data(
+            unit.category, unit.query, journalist.system_instruction_for(unit.category, unit.language),
+            unit.country, unit.language)
+        timings.append(time.perf_counter() - start)
+        return news_items, error_msg
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            outcomes = list(executor.map(fetch, units))
+
+    items = [item for news_items, _ in outcomes if news_items for item in news_items.get("news_items", [])]
+    first_items = []
+    # One histogram per country/category label set, i.e. per unit
+    for (name, labels), histogram in metrics.registry._histograms.items():
+        if name == "gemini_first_item_seconds":
+            first_items.append(histogram.sum / histogram.count)
+    return {
+        "units": len(units),
+        "succeeded": sum(1 for news_items, _ in outcomes if news_items),
+        "invalid_items_accepted": sum(1 for item in items if validate_news_item(item)),
+        "p50_fetch_s": round(percentile(timings, 50), 4),
+        "p99_fetch_s": round(percentile(timings, 99), 4),
+        "p50_first_item_s": round(percentile(first_items, 50), 4) if first_items else round(percentile(timings, 50), 4),
+        "backend_calls": gemini.calls,
+        "generation_seconds_read": round(sum(gemini.latencies), 3),
+        "stream_aborts": metrics.registry.counter_totals().get("gemini_stream_aborts_total", 0),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare buffered and streamed Gemini category fetches on offline fakes.")
+    parser.add_argument("--units", type=int, default=120, help="Category fetches per mode.")
+    parser.add_argument("--malformed-rate", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=8.0, help="Median generation time in real seconds, before scaling.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    units = expand_work_units(load_countries())[:args.units]
+    report = {"buffered": run_mode(False, units, args), "streamed": run_mode(True, units, args)}
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
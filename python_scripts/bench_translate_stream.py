@@ -0,0 +1,98 @@
+# bench_translate_stream.py
+#
+# Compares the response modes of the translate_news_items Cloud Function
+# against FakeTranslateClient, whose call latency grows with the number of
+# segments in the request (per_segment_latency). For each mode it sends
+# --requests requests of --items news items, one at a time, and reports:
+#
+#   p50/p99 time to the first translated item (what the app waits for before
+#   it can render a card) and to the whole response
+#   Translate API calls per request
+#
+# Modes:
+#   buffered_serial      one JSON response, batches sent one after another
+#   buffered_concurrent  one JSON response, batches sent in parallel
+#   streamed             NDJSON response, one line per item as it is ready
+#
+# Latencies are multiplied by --time-scale.
+#
+# Usage: python bench_translate_stream.py --items 60 --requests 20
+
+import argparse
+import json
+import logging
+import sys
+import time
+from types import SimpleNamespace
+
+import gcloud_translate
+from bench_harness import percentile
+from fakes import FakeTranslateClient, make_news_items
+from translation_cache import LRUCache, TranslationCache
+
+MODES = {
+    "buffered_serial": {"stream": False, "max_concurrent_batches": 1},
+    "buffered_concurrent": {"stream": False, "max_concurrent_batches": 4},
+    "streamed": {"stream": True, "max_concurrent_batches": 4},
+}
+
+
+def run_mode(mode: dict, args):
+    translate = FakeTranslateClient(latency=args.latency * args.time_scale, jitter=args.latency * args.time_scale * 0.2,
+                                    per_segment_latency=args.per_segment_latency * args.time_scale, seed=args.seed)
+    gcloud_translate.translate_client = translate
+    gcloud_translate.translation_cache = TranslationCache(LRUCache(), store=None)
+    gcloud_translate.MAX_CONCURRENT_BATCHES = mode["max_concurrent_batches"]
+    first_item, total, failures = [], [], 0
+
+    for r in range(args.requests):
+        # A fresh prefix per request so no request is served from the cache
+        request_json = {"news_items": make_news_items(args.items, prefix=f"Request {r} story")["news_items"],
+                        "target_language": "fr", "stream": mode["stream"]}
+        request = SimpleNamespace(method="POST", headers={}, get_json=lambda silent=False: request_json)
+
+        start = time.perf_counter()
+        body, status, _ = gcloud_translate.translate_news_items(request)
+        if mode["stream"]:
+            items = []
+            for line in body:
+                items.append(json.loads(line))
+                if len(items) == 1:
+                    first_item.append(time.perf_counter() - start)
+        else:
+            items = json.loads(body)
+            first_item.append(time.perf_counter() - start)
+        total.append(time.perf_counter() - start)
+        if status != 200 or len(items) != args.items or any("error" in item for item in items):
+            failures += 1
+
+    return {
+        "requests": args.requests,
+        "failed": failures,
+        "p50_first_item_s": round(percentile(first_item, 50), 4),
+        "p99_first_item_s": round(percentile(first_item, 99), 4),
+        "p50_total_s": round(percentile(total, 50), 4),
+        "p99_total_s": round(percentile(total, 99), 4),
+        "translate_calls_per_request": round(translate.calls / args.requests, 2),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare buffered and streamed translate_news_items responses on offline fakes.")
+    parser.add_argument("--items", type=int, default=60, help="News items per request (a full six-category document is ~60).")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixed Translate call latency in real seconds, before scaling.")
+    parser.add_argument("--per-segment-latency", type=float, default=0.01, help="Added per segment, in real seconds, before scaling.")
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {name: run_mode(mode, args) for name, mode in MODES.items()}
+
+    print("\n\nBENCHMARK SUMMARY:")
+    print(json.dumps(report, indent=2))
+
+    if any(result["failed"] for result in report.values()):
+        print("❌ Some requests did not return every item")
+        sys.exit(1)
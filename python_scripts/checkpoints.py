@@ -0,0 +1,100 @@
+# checkpoints.py
+#
+# Append-only JSONL checkpoint store for category fetches.
+#
+# Every successful _fetch_category_data result is recorded under
+# (run_id, country, language, category), and every written document under
+# (run_id, country, language). A run restarted with --resume and the same
+# run id only re-fetches the units that are missing, instead of paying for
+# every category of a language again because one of them failed. Batch-mode
+# runs (batch_sweep.py) also record the name of the job they submitted, so a
+# restarted run polls that job instead of submitting and paying for a new one.
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sweep_checkpoints.jsonl")
+
+
+def new_run_id():
+    """A fresh, sortable run id, e.g. '2025-01-31T05:00:00Z'."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class CheckpointStore:
+    """
+    Thread-safe checkpoint store backed by an append-only JSONL file.
+    The whole file is replayed into memory on open; later lines win.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_FILE):
+        self.path = path
+        self._categories = {}   # (run_id, country, lang) -> {category: news_items}
+        self._written = {}      # (run_id, country, lang) -> doc_id
+        self._batch_jobs = {}   # run_id -> batch job name
+        self._run_ids = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append leaves a truncated last line; skip it
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry: dict):
+        if entry["run_id"] not in self._run_ids:
+            self._run_ids.append(entry["run_id"])
+        if entry["type"] == "batch_job":
+            self._batch_jobs[entry["run_id"]] = entry["job_name"]
+            return
+        key = (entry["run_id"], entry["country"], entry["language"])
+        if entry["type"] == "category":
+            self._categories.setdefault(key, {})[entry["category"]] = entry["news_items"]
+        elif entry["type"] == "written":
+            self._written[key] = entry["doc_id"]
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+            self._apply(entry)
+
+    def record_category(self, run_id: str, country: str, lang: str, category: str, news_items):
+        self._append({"type": "category", "run_id": run_id, "country": country, "language": lang,
+                      "category": category, "news_items": news_items})
+
+    def record_written(self, run_id: str, country: str, lang: str, doc_id: str):
+        self._append({"type": "written", "run_id": run_id, "country": country, "language": lang, "doc_id": doc_id})
+
+    def record_batch_job(self, run_id: str, job_name: str):
+        self._append({"type": "batch_job", "run_id": run_id, "job_name": job_name})
+
+    def completed_categories(self, run_id: str, country: str, lang: str):
+        """Returns {category: news_items} already fetched for this run."""
+        with self._lock:
+            return dict(self._categories.get((run_id, country, lang), {}))
+
+    def written_doc_id(self, run_id: str, country: str, lang: str):
+        """Returns the document id if this (country, language) was already written in this run."""
+        with self._lock:
+            return self._written.get((run_id, country, lang))
+
+    def batch_job(self, run_id: str):
+        """Returns the name of the batch job submitted for this run, if any."""
+        with self._lock:
+            return self._batch_jobs.get(run_id)
+
+    def last_run_id(self):
+        with self._lock:
+            return self._run_ids[-1] if self._run_ids else None
@@ -0,0 +1,99 @@
+# clients.py
+#
+# Lazily constructed, cached Google SDK clients.
+#
+# Nothing in this module imports an SDK or touches credentials until one of
+# the accessors is first called, so the journalist scripts and the translate
+# Cloud Function can be imported (e.g. for safe_json_load or get_base_url)
+# without credentials, and a cold start only pays for the clients a request
+# actually uses. Each client is built once per process, under a lock, and
+# shared by every module that asks for it.
+
+import threading
+
+FIREBASE_CREDENTIALS_FILE = "gemini-journalist-8c449-firebase-adminsdk-fbsvc-7bbb8af864.json"
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _cached(name: str, build):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = build()
+    return client
+
+
+def genai_types():
+    """The google.genai.types module, imported on first use."""
+    from google.genai import types
+    return types
+
+
+def gemini_http_options(timeout: float):
+    """HttpOptions that abort one Gemini request after `timeout` seconds (google-genai takes milliseconds)."""
+    return genai_types().HttpOptions(timeout=max(1, int(timeout * 1000)))
+
+
+class GeminiClientMock:
+    """Offline stand-in with the same surface as genai.Client: client.models.generate_content(...)."""
+    MOCK_TEXT = '```json\n{"news_items": [{"title": "Mock News Title", "summary": "This is a mock summary.", "sources": [{"link_title": "Mock Source", "url": "http://mock.com"}]}]}\n```'
+
+    def __init__(self):
+        self.models = self # `models` is an attribute on the real client, not a method
+
+    def generate_content(self, model, contents, config=None):
+        print("\n--- MOCK: Gemini API call failed. Returning dummy data. ---")
+        types = genai_types()
+        # response.text is derived from the first candidate's parts, as in the SDK
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(parts=[types.Part(text=self.MOCK_TEXT)]))]
+        )
+
+
+def gemini_client(api_key: str):
+    """The genai.Client, or a GeminiClientMock if it cannot be initialized."""
+    def build():
+        try:
+            from google import genai
+            client = genai.Client(api_key=api_key)
+            print("Gemini Client initialized successfully.")
+            return client
+        except Exception as e:
+            print(f"ERROR: Failed to initialize Gemini Client. Ensure your API key is set as an environment variable (GEMINI_API_KEY). {e}")
+            return GeminiClientMock()
+    return _cached("gemini", build)
+
+
+def firestore_client():
+    """The firebase_admin Firestore client; the default app is initialized on first use."""
+    def build():
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if not firebase_admin._apps:
+            try:
+                cred = credentials.Certificate(FIREBASE_CREDENTIALS_FILE)
+                firebase_admin.initialize_app(cred)
+            except Exception as e:
+                print("Error connecting to Firebase: " + str(e))
+        return firestore.client()
+    return _cached("firestore", build)
+
+
+def translate_client():
+    """The Cloud Translation v2 client, using the environment's default credentials."""
+    def build():
+        from google.cloud import translate_v2 as translate
+        return translate.Client()
+    return _cached("translate", build)
+
+
+def cloud_firestore_client():
+    """A google-cloud-firestore client for the Cloud Function (no firebase_admin app needed)."""
+    def build():
+        from google.cloud import firestore
+        return firestore.Client()
+    return _cached("cloud_firestore", build)
@@ -0,0 +1,109 @@
+# compact_format.py
+#
+# Versioned compact encoding for stored news documents (news_summaries
+# snapshots and latest/{id}/categories/{category} subdocuments).
+#
+# Version 1 (no format_version field) stores every source in full on every
+# item: {"link_title": "AP News", "url": "https://apnews.com"}. After
+# get_base_url the same handful of outlets repeats dozens of times per
+# document. Version 2 interns them:
+#
+#   format_version  2
+#   source_table    [[link_title, location], ...], each distinct source once
+#                   per document; location is the bare domain when the url is
+#                   https://<domain>, the full url otherwise
+#   items           "sources" is replaced by "src", a list of indices into
+#                   source_table; every other field is unchanged
+#
+# One table covers the whole document, so a snapshot shares it across all of
+# its categories. Readers that understand version 2 (the Flutter app's
+# NewsItem.fromFirestore and decode_news_data / decode_items here) still read
+# version 1 documents, which is how the documents already stored keep working.
+
+FORMAT_VERSION = 2
+HTTPS = "https://"
+
+
+class SourceTable:
+    """Interns (link_title, url) pairs into a document's source_table."""
+
+    def __init__(self):
+        self.entries = []
+        self._index = {}
+
+    def index_of(self, source: dict):
+        link_title = str(source.get("link_title", "") or "")
+        url = str(source.get("url", "") or "")
+        location = url[len(HTTPS):] if url.startswith(HTTPS) and "/" not in url[len(HTTPS):] else url
+        key = (link_title, location)
+        index = self._index.get(key)
+        if index is None:
+            index = self._index[key] = len(self.entries)
+            self.entries.append([link_title, location])
+        return index
+
+
+def encode_items(news_items: list, table: SourceTable):
+    """Items with their sources replaced by indices into table."""
+    encoded = []
+    for item in news_items:
+        if not isinstance(item, dict):
+            continue
+        compact = {key: value for key, value in item.items() if key != "sources"}
+        compact["src"] = [table.index_of(source) for source in item.get("sources") or [] if isinstance(source, dict)]
+        encoded.append(compact)
+    return encoded
+
+
+def _encode_category(category_data, table: SourceTable):
+    if not isinstance(category_data, dict) or "news_items" not in category_data:
+        return category_data # e.g. a {"ref": ...} placeholder for an unchanged category
+    return {**category_data, "news_items": encode_items(category_data["news_items"], table)}
+
+
+def encode_news_data(news_data: dict):
+    """
+    Compact form of a {category: {'news_items': [...]}} payload.
+    Returns (encoded news_data, source_table); store both with format_version.
+    """
+    table = SourceTable()
+    encoded = {category: _encode_category(category_data, table) for category, category_data in news_data.items()}
+    return encoded, table.entries
+
+
+def encode_category_document(category_data: dict):
+    """(news_items, source_table) for one latest/{id}/categories/{category} document."""
+    table = SourceTable()
+    return encode_items(category_data.get("news_items", []), table), table.entries
+
+
+def _source(entry):
+    link_title, location = (list(entry) + ["", ""])[:2]
+    return {"link_title": link_title, "url": location if "://" in location else f"{HTTPS}{location}"}
+
+
+def decode_items(news_items: list, source_table=None):
+    """Items in the version 1 shape, whichever version they were stored in."""
+    sources = [_source(entry) for entry in source_table or []]
+    decoded = []
+    for item in news_items:
+        if not isinstance(item, dict) or "src" not in item:
+            decoded.append(item)
+            continue
+        expanded = {key: value for key, value in item.items() if key != "src"}
+        expanded["sources"] = [dict(sources[i]) for i in item["src"] if isinstance(i, int) and 0 <= i < len(sources)]
+        decoded.append(expanded)
+    return decoded
+
+
+def decode_news_data(document: dict):
+    """The news_data of a stored snapshot in the version 1 shape, whichever version it was stored in."""
+    news_data = document.get("news_data", {})
+    if document.get("format_version", 1) < 2:
+        return news_data
+    table = document.get("source_table", [])
+    return {
+        category: {**category_data, "news_items": decode_items(category_data["news_items"], table)}
+        if isinstance(category_data, dict) and "news_items" in category_data else category_data
+        for category, category_data in news_data.items()
+    }
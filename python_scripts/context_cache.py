@@ -0,0 +1,167 @@
+# context_cache.py
+#
+# Explicit Gemini context caching for the static prefix of the fetch prompts.
+#
+# Every category query for every country sends the same system instruction
+# (one per template and output language) and the same Google Search tool;
+# only the short user query changes. ContextCache stores that prefix once as
+# a CachedContent resource (client.caches.create) and hands out its name, so
+# each call sends only the query and the prefix is billed at the cached-token
+# rate.
+#
+#   one cache per (model, system instruction, tools), created on first use
+#   a cache is extended (caches.update) once it is within refresh_margin of expiry
+#   a prefix below min_tokens, or one the API refuses to cache, is remembered
+#   and sent inline from then on
+#   invalidate() drops a cache that disappeared server-side; it is recreated
+#   on the next call
+#   close() deletes every cache this process created (storage is billed by
+#   the hour)
+#
+#     cache = ContextCache(get_gemini_client)
+#     name = cache.cached_content_for("gemini-2.5-flash", instruction, tools)
+#     config = GenerateContentConfig(cached_content=name) if name else ...
+
+import hashlib
+import json
+import threading
+import time
+
+import clients
+import metrics
+
+DEFAULT_TTL_SECONDS = 3600       # long enough for a whole world sweep
+REFRESH_MARGIN_SECONDS = 300     # extend a cache this long before it expires
+MIN_CACHE_TOKENS = 1024          # explicit caching minimum for Gemini 2.5 Flash
+CHARS_PER_TOKEN = 4              # rough estimate, used only for the minimum-size check
+
+
+def estimate_tokens(text: str):
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+def _expiry_of(cached_content, fallback: float):
+    """The cache's expire_time as a time.time() value, or fallback if the response has none."""
+    expire_time = getattr(cached_content, "expire_time", None)
+    if hasattr(expire_time, "timestamp"):
+        return expire_time.timestamp()
+    if isinstance(expire_time, (int, float)):
+        return float(expire_time)
+    return fallback
+
+
+class ContextCache:
+    """Creates, refreshes and hands out CachedContent names for shared prompt prefixes. Thread-safe."""
+
+    def __init__(self, client_getter, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 refresh_margin_seconds: float = REFRESH_MARGIN_SECONDS, min_tokens: int = MIN_CACHE_TOKENS,
+                 clock=time.time):
+        self.client_getter = client_getter
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.min_tokens = min_tokens
+        self.clock = clock
+        self._entries = {}       # prefix key -> {"name", "expires_at"}
+        self._uncacheable = set()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def prefix_key(model: str, system_instruction: str, tools):
+        payload = json.dumps([model, system_instruction, tools], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _key_lock(self, key: str):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def cached_content_for(self, model: str, system_instruction: str, tools=None):
+        """
+        Name of a live cache holding this prefix, creating or extending it as needed.
+        Returns None when the prefix should be sent inline instead.
+        """
+        key = self.prefix_key(model, system_instruction, tools)
+        if key in self._uncacheable:
+            return None
+        entry = self._entries.get(key)
+        if entry and entry["expires_at"] - self.clock() > self.refresh_margin_seconds:
+            return entry["name"]
+
+        # Only one thread creates or refreshes a given prefix; the rest wait and reuse it
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] - self.clock() > self.refresh_margin_seconds:
+                return entry["name"]
+            if key in self._uncacheable:
+                return None
+            if entry and entry["expires_at"] > self.clock() and self._refresh(key, entry):
+                return entry["name"]
+            return self._create(key, model, system_instruction, tools)
+
+    def _create(self, key: str, model: str, system_instruction: str, tools):
+        if estimate_tokens(system_instruction) < self.min_tokens:
+            self._uncacheable.add(key)
+            metrics.inc("context_cache_events_total", event="below_minimum")
+            return None
+        types = clients.genai_types()
+        try:
+            cached_content = self.client_getter().caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    tools=tools,
+                    ttl=f"{int(self.ttl_seconds)}s",
+                    display_name=f"news-prefix-{key[:12]}",
+                ),
+            )
+        except Exception as e:
+            # Unsupported model, prefix too short by the API's count, ...: stop asking
+            print(f"⚠️ Context cache unavailable for this prompt, sending it inline: {str(e)[:80]}")
+            self._uncacheable.add(key)
+            metrics.inc("context_cache_events_total", event="create_failed")
+            return None
+        with self._lock:
+            self._entries[key] = {"name": cached_content.name,
+                                  "expires_at": _expiry_of(cached_content, self.clock() + self.ttl_seconds)}
+        metrics.inc("context_cache_events_total", event="created")
+        return cached_content.name
+
+    def _refresh(self, key: str, entry: dict):
+        """Extends a cache that is about to expire. Returns False if it has to be recreated."""
+        types = clients.genai_types()
+        try:
+            cached_content = self.client_getter().caches.update(
+                name=entry["name"],
+                config=types.UpdateCachedContentConfig(ttl=f"{int(self.ttl_seconds)}s"),
+            )
+        except Exception:
+            metrics.inc("context_cache_events_total", event="refresh_failed")
+            with self._lock:
+                self._entries.pop(key, None)
+            return False
+        entry["expires_at"] = _expiry_of(cached_content, self.clock() + self.ttl_seconds)
+        metrics.inc("context_cache_events_total", event="refreshed")
+        return True
+
+    def invalidate(self, name: str):
+        """Forgets a cache the API no longer knows (expired or deleted elsewhere)."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["name"] == name:
+                    del self._entries[key]
+                    metrics.inc("context_cache_events_total", event="invalidated")
+
+    def close(self):
+        """Deletes every cache created by this process. Errors are ignored; the TTL cleans up the rest."""
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            try:
+                self.client_getter().caches.delete(name=entry["name"])
+                metrics.inc("context_cache_events_total", event="deleted")
+            except Exception:
+                pass
+        return len(entries)
+
+    def __len__(self):
+        return len(self._entries)
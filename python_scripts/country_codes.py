@@ -0,0 +1,323 @@
+# country_codes.py
+#
+# Lookup tables for the names used in countries.txt. The Flutter app stores and
+# queries countries by ISO 3166-1 alpha-2 code (see lib/country_data.dart) and
+# languages by Translate API code (see lib/languages_dropdown.dart), so anything
+# that writes documents from countries.txt needs to map names to those codes.
+
+# countries.txt name -> ISO 3166-1 alpha-2 code
+COUNTRY_CODES = {
+    "Afghanistan": "AF",
+    "Albania": "AL",
+    "Algeria": "DZ",
+    "Andorra": "AD",
+    "Angola": "AO",
+    "Antigua and Barbuda": "AG",
+    "Argentina": "AR",
+    "Armenia": "AM",
+    "Australia": "AU",
+    "Austria": "AT",
+    "Azerbaijan": "AZ",
+    "Bahamas": "BS",
+    "Bahrain": "BH",
+    "Bangladesh": "BD",
+    "Barbados": "BB",
+    "Belarus": "BY",
+    "Belgium": "BE",
+    "Belize": "BZ",
+    "Benin": "BJ",
+    "Bhutan": "BT",
+    "Bolivia (Plurinational State of)": "BO",
+    "Bosnia and Herzegovina": "BA",
+    "Botswana": "BW",
+    "Brazil": "BR",
+    "Brunei Darussalam": "BN",
+    "Bulgaria": "BG",
+    "Burkina Faso": "BF",
+    "Burundi": "BI",
+    "Cabo Verde": "CV",
+    "Cambodia": "KH",
+    "Cameroon": "CM",
+    "Canada": "CA",
+    "Central African Republic": "CF",
+    "Chad": "TD",
+    "Chile": "CL",
+    "China": "CN",
+    "Colombia": "CO",
+    "Comoros": "KM",
+    "Congo (Republic of the)": "CG",
+    "Congo (Democratic Republic of the)": "CD",
+    "Costa Rica": "CR",
+    "Côte d'Ivoire": "CI",
+    "Croatia": "HR",
+    "Cuba": "CU",
+    "Cyprus": "CY",
+    "Czechia": "CZ",
+    "Denmark": "DK",
+    "Djibouti": "DJ",
+    "Dominica": "DM",
+    "Dominican Republic": "DO",
+    "Ecuador": "EC",
+    "Egypt": "EG",
+    "El Salvador": "SV",
+    "Equatorial Guinea": "GQ",
+    "Eritrea": "ER",
+    "Estonia": "EE",
+    "Eswatini": "SZ",
+    "Ethiopia": "ET",
+    "Fiji": "FJ",
+    "Finland": "FI",
+    "France": "FR",
+    "Gabon": "GA",
+    "Gambia": "GM",
+    "Georgia": "GE",
+    "Germany": "DE",
+    "Ghana": "GH",
+    "Greece": "GR",
+    "Grenada": "GD",
+    "Guatemala": "GT",
+    "Guinea": "GN",
+    "Guinea-Bissau": "GW",
+    "Guyana": "GY",
+    "Haiti": "HT",
+    "Holy See (Vatican City)": "VA",
+    "Honduras": "HN",
+    "Hungary": "HU",
+    "Iceland": "IS",
+    "India": "IN",
+    "Indonesia": "ID",
+    "Iran (Islamic Republic of)": "IR",
+    "Iraq": "IQ",
+    "Ireland": "IE",
+    "Israel": "IL",
+    "Italy": "IT",
+    "Jamaica": "JM",
+    "Japan": "JP",
+    "Jordan": "JO",
+    "Kazakhstan": "KZ",
+    "Kenya": "KE",
+    "Kiribati": "KI",
+    "Korea (Democratic People's Republic of)": "KP",
+    "Korea (Republic of)": "KR",
+    "Kuwait": "KW",
+    "Kyrgyzstan": "KG",
+    "Lao People's Democratic Republic": "LA",
+    "Latvia": "LV",
+    "Lebanon": "LB",
+    "Lesotho": "LS",
+    "Liberia": "LR",
+    "Libya": "LY",
+    "Liechtenstein": "LI",
+    "Lithuania": "LT",
+    "Luxembourg": "LU",
+    "Madagascar": "MG",
+    "Malawi": "MW",
+    "Malaysia": "MY",
+    "Maldives": "MV",
+    "Mali": "ML",
+    "Malta": "MT",
+    "Marshall Islands": "MH",
+    "Mauritania": "MR",
+    "Mauritius": "MU",
+    "Mexico": "MX",
+    "Micronesia (Federated States of)": "FM",
+    "Moldova (Republic of)": "MD",
+    "Monaco": "MC",
+    "Mongolia": "MN",
+    "Montenegro": "ME",
+    "Morocco": "MA",
+    "Mozambique": "MZ",
+    "Myanmar": "MM",
+    "Namibia": "NA",
+    "Nauru": "NR",
+    "Nepal": "NP",
+    "Netherlands": "NL",
+    "New Zealand": "NZ",
+    "Nicaragua": "NI",
+    "Niger": "NE",
+    "Nigeria": "NG",
+    "North Macedonia": "MK",
+    "Norway": "NO",
+    "Oman": "OM",
+    "Pakistan": "PK",
+    "Palau": "PW",
+    "Palestine (State of)": "PS",
+    "Panama": "PA",
+    "Papua New Guinea": "PG",
+    "Paraguay": "PY",
+    "Peru": "PE",
+    "Philippines": "PH",
+    "Poland": "PL",
+    "Portugal": "PT",
+    "Qatar": "QA",
+    "Romania": "RO",
+    "Russian Federation": "RU",
+    "Rwanda": "RW",
+    "Saint Kitts and Nevis": "KN",
+    "Saint Lucia": "LC",
+    "Saint Vincent and the Grenadines": "VC",
+    "Samoa": "WS",
+    "San Marino": "SM",
+    "Sao Tome and Principe": "ST",
+    "Saudi Arabia": "SA",
+    "Senegal": "SN",
+    "Serbia": "RS",
+    "Seychelles": "SC",
+    "Sierra Leone": "SL",
+    "Singapore": "SG",
+    "Slovakia": "SK",
+    "Slovenia": "SI",
+    "Solomon Islands": "SB",
+    "Somalia": "SO",
+    "South Africa": "ZA",
+    "South Sudan": "SS",
+    "Spain": "ES",
+    "Sri Lanka": "LK",
+    "Sudan": "SD",
+    "Suriname": "SR",
+    "Sweden": "SE",
+    "Switzerland": "CH",
+    "Syrian Arab Republic": "SY",
+    "Tajikistan": "TJ",
+    "Tanzania (United Republic of)": "TZ",
+    "Thailand": "TH",
+    "Timor-Leste": "TL",
+    "Togo": "TG",
+    "Tonga": "TO",
+    "Trinidad and Tobago": "TT",
+    "Tunisia": "TN",
+    "Turkey": "TR",
+    "Turkmenistan": "TM",
+    "Tuvalu": "TV",
+    "Uganda": "UG",
+    "Ukraine": "UA",
+    "United Arab Emirates": "AE",
+    "United Kingdom of Great Britain and Northern Ireland": "GB",
+    "United States of America": "US",
+    "Uruguay": "UY",
+    "Uzbekistan": "UZ",
+    "Vanuatu": "VU",
+    "Venezuela (Bolivarian Republic of)": "VE",
+    "Viet Nam": "VN",
+    "Yemen": "YE",
+    "Zambia": "ZM",
+    "Zimbabwe": "ZW",
+}
+
+# countries.txt language name -> Google Translate language code
+LANGUAGE_CODES = {
+    "Afrikaans": "af",
+    "Albanian": "sq",
+    "Amharic": "am",
+    "Arabic": "ar",
+    "Armenian": "hy",
+    "Aymara": "ay",
+    "Azerbaijani": "az",
+    "Belarusian": "be",
+    "Bengali": "bn",
+    "Berber": "ber",
+    "Bosnian": "bs",
+    "Bulgarian": "bg",
+    "Burmese": "my",
+    "Catalan": "ca",
+    "Chichewa": "ny",
+    "Croatian": "hr",
+    "Czech": "cs",
+    "Danish": "da",
+    "Dari": "fa-AF",
+    "Dhivehi": "dv",
+    "Dutch": "nl",
+    "Dzongkha": "dz",
+    "English": "en",
+    "Estonian": "et",
+    "Farsi": "fa",
+    "Fijian": "fj",
+    "Filipino": "tl",
+    "Finnish": "fi",
+    "French": "fr",
+    "Georgian": "ka",
+    "German": "de",
+    "Greek": "el",
+    "Guaraní": "gn",
+    "Haitian Creole": "ht",
+    "Hebrew": "iw",
+    "Hindi": "hi",
+    "Hindustani": "hi",
+    "Hiri Motu": "ho",
+    "Hungarian": "hu",
+    "Icelandic": "is",
+    "Indonesian": "id",
+    "Irish": "ga",
+    "Italian": "it",
+    "Japanese": "ja",
+    "Kazakh": "kk",
+    "Khmer": "km",
+    "Kinyarwanda": "rw",
+    "Korean": "ko",
+    "Kurdish": "ku",
+    "Kyrgyz": "ky",
+    "Lao": "lo",
+    "Latin": "la",
+    "Latvian": "lv",
+    "Lithuanian": "lt",
+    "Luxembourgish": "lb",
+    "Macedonian": "mk",
+    "Malagasy": "mg",
+    "Malay": "ms",
+    "Maltese": "mt",
+    "Mandarin Chinese": "zh",
+    "Marshallese": "mh",
+    "Mongolian": "mn",
+    "Montenegrin": "sr",
+    "Māori": "mi",
+    "Ndebele": "nr",
+    "Nepali": "ne",
+    "Northern Sotho": "nso",
+    "Norwegian": "no",
+    "Pashto": "ps",
+    "Polish": "pl",
+    "Portuguese": "pt",
+    "Quechua": "qu",
+    "Romanian": "ro",
+    "Romansh": "rm",
+    "Russian": "ru",
+    "Samoan": "sm",
+    "Serbian": "sr",
+    "Sesotho": "st",
+    "Setswana": "tn",
+    "Seychellois Creole": "crs",
+    "Sinhala": "si",
+    "Slovak": "sk",
+    "Slovene": "sl",
+    "Somali": "so",
+    "Sotho": "st",
+    "Spanish": "es",
+    "Standard Chinese (Mandarin)": "zh",
+    "Swahili": "sw",
+    "Swati": "ss",
+    "Swedish": "sv",
+    "Tajik": "tg",
+    "Tamil": "ta",
+    "Thai": "th",
+    "Tigrinya": "ti",
+    "Tok Pisin": "tpi",
+    "Tsonga": "ts",
+    "Tswana": "tn",
+    "Turkish": "tr",
+    "Ukrainian": "uk",
+    "Urdu": "ur",
+    "Uzbek": "uz",
+    "Vietnamese": "vi",
+    "Xhosa": "xh",
+    "Zulu": "zu",
+}
+
+
+def country_code(country: str):
+    """Returns the ISO code for a countries.txt name, or the input if it is already a code/unknown."""
+    return COUNTRY_CODES.get(country, country)
+
+
+def language_code(lang: str):
+    """Returns the Translate code for a language name, or the input if it is already a code/unknown."""
+    return LANGUAGE_CODES.get(lang, lang)
@@ -0,0 +1,211 @@
+# dedup.py
+#
+# Cross-category near-duplicate elimination for a consolidated news_data
+# payload ({category: {'news_items': [...]}}).
+#
+# The Headlines query and the topical queries regularly return the same event
+# in slightly different words. Each item's title and summary are shingled
+# into character 5-grams and sketched with one-permutation MinHash (one hash
+# per shingle, binned, with rotation densification for empty bins). Sketches
+# are banded into an LSH index, so only items sharing a band are ever compared
+# and the whole pass stays close to linear in the number of items. Candidate
+# pairs are confirmed on estimated Jaccard similarity, with a lower bar when
+# the two items cite an overlapping source domain.
+#
+# Each cluster keeps one canonical copy, in the earliest category of the
+# payload. It gains an 'id', the sources of its duplicates and an 'also_in'
+# list. Every other category that had a copy records
+# {'category', 'id'} in its 'cross_references' instead of the full item.
+
+import re
+import unicodedata
+import zlib
+from urllib.parse import urlparse
+
+from fingerprint import item_fingerprint
+
+SHINGLE_SIZE = 5 # characters per shingle
+NUM_BINS = 64 # MinHash signature length
+BANDS = 16 # LSH bands; NUM_BINS / BANDS rows per band, candidate threshold around 0.5
+SIMILARITY_THRESHOLD = 0.5 # estimated Jaccard needed to call two items duplicates
+SHARED_SOURCE_THRESHOLD = 0.4 # lower bar when the items cite a common source domain
+
+_NON_WORD = re.compile(r"[\W_]+")
+_MAX_HASH = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKC", str(text or "")).casefold()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def shingles(item: dict, size: int = SHINGLE_SIZE):
+    """Set of character shingles over an item's normalized title and summary."""
+    text = f"{_normalize(item.get('title'))} {_normalize(item.get('summary'))}".strip()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash_signature(shingle_set, num_bins: int = NUM_BINS):
+    """
+    One-permutation MinHash: each shingle is hashed once and competes only for
+    the minimum of its own bin. Empty bins borrow from the next non-empty bin,
+    so short texts still produce a full signature.
+    """
+    signature = [_MAX_HASH] * num_bins
+    for shingle in shingle_set:
+        # crc32 spread over 64 bits by a multiplicative mix; much cheaper than a cryptographic hash
+        h = (zlib.crc32(shingle.encode("utf-8")) * _MIX) & _MAX_HASH
+        b = (h >> 32) % num_bins
+        if h < signature[b]:
+            signature[b] = h
+
+    filled = [i for i in range(num_bins) if signature[i] != _MAX_HASH]
+    if not filled or len(filled) == num_bins:
+        return signature
+    densified = list(signature)
+    for i in range(num_bins):
+        if signature[i] == _MAX_HASH:
+            # Rotate right to the next filled bin, offset so borrowed values differ per distance
+            distance = next(d for d in range(1, num_bins) if signature[(i + d) % num_bins] != _MAX_HASH)
+            densified[i] = (signature[(i + distance) % num_bins] + distance * _MIX) & _MAX_HASH
+    return densified
+
+
+def estimated_similarity(a, b):
+    """Fraction of agreeing signature positions, an estimate of Jaccard similarity."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def source_domains(item: dict):
+    domains = set()
+    for source in item.get("sources") or []:
+        if isinstance(source, dict) and source.get("url"):
+            netloc = urlparse(source["url"]).netloc or source["url"]
+            domains.add(netloc.lower().replace("www.", ""))
+    return domains
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # The lower index (earlier category) stays the root, and so the canonical copy
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def find_duplicate_clusters(entries: list, bands: int = BANDS):
+    """
+    entries is a list of (category, item). Returns the clusters of near-duplicate
+    entry indices that span more than one category, each sorted by index.
+    """
+    shingle_sets = [shingles(item) for _, item in entries]
+    signatures = [minhash_signature(shingle_set) for shingle_set in shingle_sets]
+    domains = [source_domains(item) for _, item in entries]
+    rows = len(signatures[0]) // bands if signatures else 0
+
+    buckets = {}
+    for index, signature in enumerate(signatures):
+        if not shingle_sets[index]:
+            continue # Items without text never match anything
+        for band in range(bands):
+            key = (band, tuple(signature[band * rows:(band + 1) * rows]))
+            buckets.setdefault(key, []).append(index)
+
+    union_find = _UnionFind(len(entries))
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                a, b = members[x], members[y]
+                if (a, b) in checked or entries[a][0] == entries[b][0]:
+                    continue # Only duplicates across categories are merged
+                checked.add((a, b))
+                similarity = estimated_similarity(signatures[a], signatures[b])
+                threshold = SHARED_SOURCE_THRESHOLD if domains[a] & domains[b] else SIMILARITY_THRESHOLD
+                if similarity >= threshold:
+                    union_find.union(a, b)
+
+    clusters = {}
+    for index in range(len(entries)):
+        clusters.setdefault(union_find.find(index), []).append(index)
+    return [members for members in clusters.values()
+            if len({entries[i][0] for i in members}) > 1]
+
+
+def dedupe_news_data(news_data: dict):
+    """
+    Returns (deduped_news_data, stats) for a {category: {'news_items': [...]}} payload.
+
+    Items are only compared across categories; a copy in a later category is
+    replaced by a cross-reference to the canonical copy. The input is not modified.
+    """
+    categories = list(news_data.keys())
+    entries = []
+    for category in categories:
+        category_data = news_data[category]
+        items = category_data.get("news_items", []) if isinstance(category_data, dict) else []
+        entries.extend((category, item) for item in items if isinstance(item, dict))
+
+    clusters = find_duplicate_clusters(entries) if entries else []
+
+    removed = set()
+    replacements = {} # entry index -> canonical item with merged sources
+    cross_references = {category: [] for category in categories}
+    for members in clusters:
+        canonical_index, duplicates = members[0], members[1:]
+        canonical_category, canonical_item = entries[canonical_index]
+        merged = dict(canonical_item)
+        sources = list(canonical_item.get("sources") or [])
+        seen_urls = {source.get("url") for source in sources if isinstance(source, dict)}
+        also_in = []
+        for index in duplicates:
+            category, item = entries[index]
+            for source in item.get("sources") or []:
+                if isinstance(source, dict) and source.get("url") not in seen_urls:
+                    sources.append(source)
+                    seen_urls.add(source.get("url"))
+            if category != canonical_category and category not in also_in:
+                also_in.append(category)
+            removed.add(index)
+        merged["sources"] = sources
+        merged["id"] = item_fingerprint(merged)[:16]
+        merged["also_in"] = also_in
+        replacements[canonical_index] = merged
+        for category in also_in:
+            cross_references[category].append({"category": canonical_category, "id": merged["id"]})
+
+    deduped = {}
+    position = 0
+    for category in categories:
+        category_data = news_data[category]
+        if not isinstance(category_data, dict):
+            deduped[category] = category_data
+            continue
+        items = []
+        for item in category_data.get("news_items", []):
+            if isinstance(item, dict):
+                if position not in removed:
+                    items.append(replacements.get(position, item))
+                position += 1
+            else:
+                items.append(item)
+        deduped[category] = {**category_data, "news_items": items}
+        if cross_references[category]:
+            deduped[category]["cross_references"] = category_data.get("cross_references", []) + cross_references[category]
+
+    stats = {"items": len(entries), "clusters": len(clusters), "removed": len(removed)}
+    return deduped, stats
@@ -0,0 +1,819 @@
+# fakes.py
+#
+# Offline stand-ins for the Gemini, Firestore and Translate clients used by the
+# journalist scripts and the translate Cloud Function. They let the fetch path be exercised and timed without network access
+# or credentials: swap them in by assigning to the script's module globals, e.g.
+#
+#     import gemini_journalist_with_categories as journalist
+#     journalist.gemini_client = FakeGeminiClient(latency=0.5)
+#     journalist.db = FakeFirestore()
+#
+# Every fake can also inject faults (HTTP 429/500/503 errors; for Gemini also
+# empty and malformed responses) and draw latencies from a long-tailed
+# distribution, so retry behaviour can be measured too (see bench_harness.py):
+#
+#     FakeGeminiClient(latency=0.5, jitter=0.3, latency_distribution="lognormal",
+#                      error_rates={503: 0.05, 429: 0.02}, empty_rate=0.01, malformed_rate=0.01)
+#
+# A Gemini call can also hang (hang_rate): it answers only after `hang_seconds`,
+# unless the request's HttpOptions.timeout is shorter, in which case it raises
+# TimeoutException after that timeout, as google-genai's HTTP client does.
+#
+# FakeGeminiClient also stands in for the batch endpoint used by batch_sweep.py:
+# client.files.upload / download and client.batches.create / get. A job
+# finishes `batch_turnaround` seconds after it is created, and each request in
+# it gets its own injected fault, written to the result file as an error line.
+#
+# client.caches stands in for Gemini context caching (context_cache.py): caches
+# expire after their TTL, refuse prefixes below `min_cache_tokens`, and a call
+# naming a missing cache fails with 404. Prompt tokens include the system
+# instruction, inline or cached, and `prefill_latency` adds time per 1K
+# uncached prompt tokens, so caching shows up in both cost and latency.
+#
+# Well-formed responses carry Google Search grounding metadata (see
+# fake_grounding) and include a 'sources' array only if the system instruction
+# asks for link_title. `output_latency` adds time per 1K output tokens, so
+# shorter answers come back sooner.
+
+import functools
+import json
+import random
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+
+def make_news_items(count: int = 5, prefix: str = "Story", sources: bool = True):
+    """Builds a {'news_items': [...]} object shaped like the model's JSON output (without sources if asked)."""
+    items = []
+    for i in range(count):
+        item = {"title": f"{prefix} {i + 1}", "summary": f"This is the summary for {prefix.lower()} {i + 1}."}
+        if sources:
+            item["sources"] = [{"link_title": "AP News", "url": f"https://www.apnews.com/article/{i + 1}"}]
+        items.append(item)
+    return {"news_items": items}
+
+
+def make_news_payload(count: int = 5, prefix: str = "Story", sources: bool = True):
+    """Builds a fenced ```json``` payload shaped like a real Gemini response."""
+    return f"```json\n{json.dumps(make_news_items(count, prefix, sources), indent=2)}\n```"
+
+
+# --- SEARCH GROUNDING ---
+
+GROUNDING_DOMAINS = ["apnews.com", "reuters.com", "bbc.com", "aljazeera.com", "npr.org", "france24.com"]
+
+
+def fake_grounding(text: str, items: dict):
+    """
+    grounding_metadata-shaped object for a payload: one chunk per domain in
+    GROUNDING_DOMAINS (behind redirect URIs, titled with the domain, as the API
+    returns them) and, per item, a support covering its summary that cites two chunks.
+    """
+    chunks = [
+        SimpleNamespace(web=SimpleNamespace(uri=f"https://vertexaisearch.cloud.google.com/grounding-api-redirect/{uuid.uuid5(uuid.NAMESPACE_DNS, domain).hex}",
+                                            title=domain, domain=None))
+        for domain in GROUNDING_DOMAINS
+    ]
+    supports = []
+    cursor = 0
+    for i, item in enumerate(items.get("news_items", [])):
+        position = text.find(item["summary"], cursor)
+        if position == -1:
+            continue
+        cursor = position + len(item["summary"])
+        start = len(text[:position].encode("utf-8"))
+        supports.append(SimpleNamespace(
+            segment=SimpleNamespace(start_index=start, end_index=start + len(item["summary"].encode("utf-8")), text=item["summary"]),
+            grounding_chunk_indices=[i % len(chunks), (i + 1) % len(chunks)],
+        ))
+    return SimpleNamespace(grounding_chunks=chunks, grounding_supports=supports, web_search_queries=[])
+
+
+# --- FAULT INJECTION ---
+
+STATUS_NAMES = {400: "INVALID_ARGUMENT", 404: "NOT_FOUND", 408: "DEADLINE_EXCEEDED", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 502: "BAD_GATEWAY", 503: "UNAVAILABLE", 504: "GATEWAY_TIMEOUT"}
+
+
+class FakeAPIError(Exception):
+    """An injected API error. Carries .code and is formatted like google-genai's ('503 UNAVAILABLE. ...')."""
+
+    def __init__(self, code: int):
+        self.code = code
+        super().__init__(f"{code} {STATUS_NAMES.get(code, 'ERROR')}. Injected fault.")
+
+
+class TimeoutException(Exception):
+    """Named after httpx.TimeoutException, which google-genai raises when HttpOptions.timeout passes."""
+
+
+def sample_latency(rng: random.Random, distribution: str, latency: float, jitter: float):
+    """
+    Draws one call latency in seconds.
+
+    uniform:     latency + U(0, jitter)
+    exponential: latency + an exponential tail with mean jitter
+    lognormal:   median latency, shape jitter (heavy tail)
+    """
+    if distribution == "uniform":
+        return latency + (rng.uniform(0, jitter) if jitter else 0.0)
+    if distribution == "exponential":
+        return latency + (rng.expovariate(1.0 / jitter) if jitter else 0.0)
+    if distribution == "lognormal":
+        return rng.lognormvariate(0.0, jitter) * latency if jitter else latency
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+
+class FaultInjector:
+    """
+    Decides, per call, whether a fake backend succeeds or how it fails.
+
+    error_rates maps HTTP status codes to probabilities, e.g. {503: 0.05, 429: 0.02}.
+    empty_rate, malformed_rate and hang_rate are only used by the Gemini fake. Every
+    outcome is counted in `counts`, keyed by 'ok', 'empty', 'malformed', 'hang' or
+    the status code.
+    """
+
+    def __init__(self, error_rates: dict = None, empty_rate: float = 0.0, malformed_rate: float = 0.0, seed=None,
+                 hang_rate: float = 0.0):
+        self.error_rates = dict(error_rates or {})
+        self.empty_rate = empty_rate
+        self.malformed_rate = malformed_rate
+        self.hang_rate = hang_rate
+        self.counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        with self._lock:
+            roll = self._random.random()
+            outcome = "ok"
+            for candidate, rate in [*self.error_rates.items(), ("empty", self.empty_rate), ("malformed", self.malformed_rate),
+                                    ("hang", self.hang_rate)]:
+                if roll < rate:
+                    outcome = candidate
+                    break
+                roll -= rate
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            return outcome
+
+    def choice(self, options):
+        with self._lock:
+            return self._random.choice(options)
+
+    def injected(self):
+        """Number of calls that were given a fault."""
+        with self._lock:
+            return sum(count for outcome, count in self.counts.items() if outcome != "ok")
+
+
+def malformed_payloads(items: dict):
+    """Variants of a fenced JSON payload that real responses have broken in."""
+    body = json.dumps(items, indent=2)
+    return [
+        f"```json\n{body}\n",                                   # closing fence missing
+        f"```json\n{body[:len(body) // 2]}\n```",                # truncated mid-object
+        f"Here are the top stories:\n```JSON\n{body}\n```",      # preamble and upper-case fence tag
+        f"```json\n{body}\n```\n```json\n{{}}\n```",              # a second, empty block
+        "I'm sorry, but I can't browse for the latest news right now. " * 40,  # prose instead of JSON
+        json.dumps({"news_items": [{"headline": item["title"], "text": item["summary"]}  # wrong item fields
+                                   for item in items["news_items"]]}),
+    ]
+
+
+class FakeModels:
+    """Implements the subset of client.models used by the scripts."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, config=None):
+        return self._client._respond(model, contents, config)
+
+    def generate_content_stream(self, model, contents, config=None):
+        return self._client._respond_stream(model, contents, config)
+
+
+def fake_usage(contents, text, prefix_tokens: int = 0, cached_tokens: int = 0):
+    """
+    usage_metadata-shaped token counts at roughly four characters per token.
+    As in the API, prompt_token_count includes the cached tokens.
+    """
+    prompt_tokens = len(str(contents)) // 4 + prefix_tokens + cached_tokens
+    candidate_tokens = len(text or "") // 4
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=candidate_tokens,
+                           cached_content_token_count=cached_tokens or None,
+                           total_token_count=prompt_tokens + candidate_tokens)
+
+
+class FakeGeminiClient:
+    """
+    Offline stand-in for genai.Client.
+
+    Every generate_content call sleeps for a latency drawn from
+    `latency_distribution` (see sample_latency) and then returns a fenced JSON
+    payload, unless the FaultInjector decides to raise an error or return an
+    empty or malformed response instead. generate_content_stream returns the
+    same payloads in chunks. Calls and latencies are recorded so benchmarks can
+    report how many requests a run made and how long they took.
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, items_per_response: int = 5, seed=None,
+                 latency_distribution: str = "uniform", error_rates: dict = None, empty_rate: float = 0.0,
+                 malformed_rate: float = 0.0, batch_turnaround: float = 0.0, stream_chunk_chars: int = 64,
+                 stream_first_chunk: float = 0.2, min_cache_tokens: int = 1024, prefill_latency: float = 0.0,
+                 output_latency: float = 0.0, clock=time.time, hang_rate: float = 0.0, hang_seconds: float = 3600.0):
+        self.models = FakeModels(self)
+        self.files = FakeFiles()
+        self.batches = FakeBatches(self, batch_turnaround)
+        self.caches = FakeCaches(min_cache_tokens, clock)
+        self.prefill_latency = prefill_latency
+        self.output_latency = output_latency
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_distribution = latency_distribution
+        self.items_per_response = items_per_response
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_first_chunk = stream_first_chunk
+        self.faults = FaultInjector(error_rates, empty_rate, malformed_rate, seed=None if seed is None else seed + 1,
+                                    hang_rate=hang_rate)
+        self.hang_seconds = hang_seconds
+        self.calls = 0
+        self.batch_requests = 0
+        self.latencies = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw_call(self, contents, config):
+        """
+        Counts a call and draws its latency and outcome. Also returns a usage(text)
+        function that fills in the call's prompt tokens, and whether the system
+        instruction asks for sources. A call naming a missing context cache gets
+        a 404 outcome.
+        """
+        instruction = getattr(config, "system_instruction", None)
+        prefix_tokens = len(instruction or "") // 4
+        cached_tokens = 0
+        cache_error = False
+        if getattr(config, "cached_content", None):
+            cached_tokens = self.caches.tokens_of(config.cached_content)
+            instruction = self.caches.instruction_of(config.cached_content)
+            cache_error = cached_tokens is None
+        with self._lock:
+            self.calls += 1
+            delay = sample_latency(self._random, self.latency_distribution, self.latency, self.jitter)
+        outcome = self.faults.draw()
+        if cache_error:
+            return 0.0, 404, None, True
+        delay += self.prefill_latency * (len(str(contents)) // 4 + prefix_tokens) / 1000
+        # Like the model, write out sources only when the instruction asks for them
+        with_sources = not instruction or "link_title" in instruction
+        return delay, outcome, lambda text: fake_usage(contents, text, prefix_tokens, cached_tokens), with_sources
+
+    def _hang(self, config):
+        """Blocks like a request that gets no answer: until its HTTP timeout, or hang_seconds without one."""
+        http_options = getattr(config, "http_options", None)
+        timeout = getattr(http_options, "timeout", None)
+        if timeout is not None and timeout / 1000 < self.hang_seconds:
+            time.sleep(timeout / 1000)
+            raise TimeoutException(f"Read timed out after {timeout} ms.")
+        time.sleep(self.hang_seconds)
+
+    def _output_delay(self, text: str):
+        return self.output_latency * (len(text or "") // 4) / 1000
+
+    def _payload(self, with_sources: bool):
+        """A well-formed fenced payload and the candidates list carrying its grounding metadata."""
+        items = make_news_items(self.items_per_response, sources=with_sources)
+        text = f"```json\n{json.dumps(items, indent=2)}\n```"
+        return text, [SimpleNamespace(grounding_metadata=fake_grounding(text, items))]
+
+    def _respond(self, model, contents, config):
+        delay, outcome, usage, with_sources = self._draw_call(contents, config)
+        if outcome == "hang":
+            self._hang(config)
+        if isinstance(outcome, int) or outcome == "empty":
+            time.sleep(delay)
+            with self._lock:
+                self.latencies.append(delay)
+            if isinstance(outcome, int):
+                raise FakeAPIError(outcome)
+            return SimpleNamespace(text=None, parsed=None, candidates=[], usage_metadata=usage(""))
+
+        parsed = None
+        candidates = []
+        schema = getattr(config, "response_schema", None)
+        if schema is not None and getattr(config, "response_mime_type", None) == "application/json":
+            # Structured output: plain JSON with one news_items object per schema property
+            combined = {name: make_news_items(self.items_per_response, prefix=name) for name in schema.properties}
+            text = json.dumps(combined)
+            if outcome == "malformed":
+                text = text[:len(text) // 2]
+            else:
+                parsed = combined
+        elif outcome == "malformed":
+            text = self.faults.choice(malformed_payloads(make_news_items(self.items_per_response)))
+        else:
+            text, candidates = self._payload(with_sources)
+
+        delay += self._output_delay(text)
+        time.sleep(delay)
+        with self._lock:
+            self.latencies.append(delay)
+        return SimpleNamespace(text=text, parsed=parsed, candidates=candidates, usage_metadata=usage(text))
+
+    def _respond_stream(self, model, contents, config):
+        """
+        Streams the same payloads as _respond in chunks of `stream_chunk_chars`.
+        The first chunk arrives after `stream_first_chunk` of the call latency and
+        the rest are spread over the remainder, so a consumer that stops reading
+        early saves that share of the latency. Errors are raised on the first read.
+        """
+        delay, outcome, usage, with_sources = self._draw_call(contents, config)
+        first_delay = delay * self.stream_first_chunk
+
+        def chunks():
+            started = time.perf_counter()
+            try:
+                if outcome == "hang":
+                    self._hang(config)
+                time.sleep(first_delay)
+                if isinstance(outcome, int):
+                    raise FakeAPIError(outcome)
+                if outcome == "empty":
+                    yield SimpleNamespace(text=None, candidates=[], usage_metadata=usage(""))
+                    return
+                candidates = []
+                if outcome == "malformed":
+                    text = self.faults.choice(malformed_payloads(make_news_items(self.items_per_response)))
+                else:
+                    text, candidates = self._payload(with_sources)
+                rest = delay - first_delay + self._output_delay(text)
+                pieces = [text[i:i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)]
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(rest / (len(pieces) - 1))
+                    last = i == len(pieces) - 1
+                    # Usage and grounding metadata come with the final chunk, as in the API
+                    yield SimpleNamespace(text=piece, candidates=candidates if last else [],
+                                          usage_metadata=usage(text) if last else None)
+            finally:
+                # Record only the time actually spent streaming, however far the consumer read
+                with self._lock:
+                    self.latencies.append(time.perf_counter() - started)
+
+        return chunks()
+
+
+# --- CONTEXT CACHES ---
+
+class FakeCaches:
+    """
+    Stand-in for client.caches. create() refuses prefixes (system instruction plus
+    contents) below `min_tokens` with a 400, like the API; a cache stops existing
+    `ttl` seconds after it was created or last updated.
+    """
+
+    def __init__(self, min_tokens: int = 1024, clock=time.time):
+        self.min_tokens = min_tokens
+        self.clock = clock
+        self.caches = {}
+        self.created = 0
+        self.updated = 0
+        self.deleted = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ttl_seconds(config):
+        return float(str(getattr(config, "ttl", None) or "3600s").rstrip("s"))
+
+    def create(self, model, config=None):
+        tokens = (len(getattr(config, "system_instruction", None) or "") + len(str(getattr(config, "contents", None) or ""))) // 4
+        if tokens < self.min_tokens:
+            raise FakeAPIError(400)
+        with self._lock:
+            self.created += 1
+            name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+            self.caches[name] = {"model": model, "tokens": tokens, "expires_at": self.clock() + self._ttl_seconds(config),
+                                 "system_instruction": getattr(config, "system_instruction", None)}
+        return self.get(name)
+
+    def _live(self, name):
+        cache = self.caches.get(name)
+        if cache is None or cache["expires_at"] <= self.clock():
+            self.caches.pop(name, None)
+            raise FakeAPIError(404)
+        return cache
+
+    def get(self, name):
+        with self._lock:
+            cache = self._live(name)
+        return SimpleNamespace(name=name, model=cache["model"], expire_time=cache["expires_at"],
+                               usage_metadata=SimpleNamespace(total_token_count=cache["tokens"]))
+
+    def update(self, name, config=None):
+        with self._lock:
+            self._live(name)["expires_at"] = self.clock() + self._ttl_seconds(config)
+            self.updated += 1
+        return self.get(name)
+
+    def delete(self, name):
+        with self._lock:
+            self._live(name)
+            del self.caches[name]
+            self.deleted += 1
+
+    def instruction_of(self, name):
+        with self._lock:
+            cache = self.caches.get(name)
+        return cache["system_instruction"] if cache else None
+
+    def tokens_of(self, name):
+        """Token count of a live cache, or None if a call naming it would fail."""
+        with self._lock:
+            try:
+                return self._live(name)["tokens"]
+            except FakeAPIError:
+                return None
+
+
+# --- BATCH JOBS ---
+
+class FakeFiles:
+    """In-memory stand-in for client.files: upload() stores a file's bytes, download() returns them."""
+
+    def __init__(self):
+        self.contents = {}
+        self._lock = threading.Lock()
+
+    def put(self, content: bytes, display_name: str = None):
+        with self._lock:
+            name = f"files/{uuid.uuid4().hex[:12]}"
+            self.contents[name] = content
+        return SimpleNamespace(name=name, display_name=display_name, size_bytes=len(content))
+
+    def upload(self, file, config=None):
+        with open(file, "rb") as f:
+            content = f.read()
+        return self.put(content, (config or {}).get("display_name"))
+
+    def download(self, file):
+        with self._lock:
+            return self.contents[file]
+
+
+class FakeBatches:
+    """
+    Stand-in for client.batches. A job reads its uploaded JSONL input on create(),
+    stays JOB_STATE_RUNNING for `turnaround` seconds and then succeeds with a
+    result file of {"key", "response"} or {"key", "error"} lines, one per request.
+    Setting `final_state` makes the next jobs end in another state instead.
+    """
+
+    def __init__(self, client, turnaround: float = 0.0):
+        self._client = client
+        self.turnaround = turnaround
+        self.final_state = "JOB_STATE_SUCCEEDED"
+        self.jobs = {}
+        self.polls = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, src, config=None):
+        requests = [json.loads(line) for line in self._client.files.download(src).decode("utf-8").splitlines() if line.strip()]
+        with self._lock:
+            name = f"batches/{uuid.uuid4().hex[:12]}"
+            self.jobs[name] = {"requests": requests, "ready_at": time.monotonic() + self.turnaround,
+                               "final_state": self.final_state, "display_name": (config or {}).get("display_name"),
+                               "result_file": None}
+        with self._client._lock:
+            self._client.batch_requests += len(requests)
+        return self.get(name)
+
+    def get(self, name):
+        with self._lock:
+            self.polls += 1
+            job = self.jobs[name]
+            if time.monotonic() < job["ready_at"]:
+                state = "JOB_STATE_RUNNING"
+            else:
+                state = job["final_state"]
+                if state == "JOB_STATE_SUCCEEDED" and job["result_file"] is None:
+                    lines = [json.dumps(self._result_line(request)) for request in job["requests"]]
+                    job["result_file"] = self._client.files.put("\n".join(lines).encode("utf-8")).name
+        dest = SimpleNamespace(file_name=job["result_file"], inlined_responses=None) if job["result_file"] else None
+        return SimpleNamespace(name=name, display_name=job["display_name"], state=SimpleNamespace(name=state), dest=dest)
+
+    def _result_line(self, request: dict):
+        key = request["key"]
+        contents = request["request"]["contents"]
+        outcome = self._client.faults.draw()
+        if isinstance(outcome, int):
+            return {"key": key, "error": {"code": outcome, "message": "Injected fault.", "status": STATUS_NAMES.get(outcome, "ERROR")}}
+
+        items = make_news_items(self._client.items_per_response, prefix=key)
+        if outcome == "empty":
+            text = ""
+        elif outcome == "malformed":
+            text = self._client.faults.choice(malformed_payloads(items))
+        else:
+            text = f"```json\n{json.dumps(items, indent=2)}\n```"
+        usage = fake_usage(contents, text)
+        response = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}] if text else []}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": usage.prompt_token_count, "candidatesTokenCount": usage.candidates_token_count,
+                              "totalTokenCount": usage.total_token_count},
+        }
+        return {"key": key, "response": response}
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data, reference=None):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+        self.reference = reference
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self):
+        if self._collection._db.read_latency:
+            time.sleep(self._collection._db.read_latency)
+        with self._collection._db._lock:
+            self._collection._db.reads += 1
+            return FakeDocumentSnapshot(self.id, self._collection.docs.get(self.id), self)
+
+    def set(self, data, merge=False):
+        with self._collection._db._lock:
+            if merge and self.id in self._collection.docs:
+                self._collection.docs[self.id].update(data)
+            else:
+                self._collection.docs[self.id] = dict(data)
+            self._collection._db.writes += 1
+
+    def delete(self):
+        with self._collection._db._lock:
+            self._collection.docs.pop(self.id, None)
+            self._collection._db.deletes += 1
+
+
+def _field(data: dict, path: str):
+    """Value at a dotted field path, or _MISSING."""
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+_MISSING = object()
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class FakeQuery:
+    """
+    The subset of a Firestore query used by the scripts: where() with the usual
+    operators, order_by() (ties broken by document ID, as Firestore does),
+    limit(), start_after() a snapshot or a {field: value} cursor, select() and
+    stream()/get(). Documents missing a filtered or ordered field are left out.
+    Every returned document counts as one read.
+    """
+
+    def __init__(self, collection, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = {"filters": self._filters, "orders": self._orders, "limit": self._limit,
+                 "cursor": self._cursor, "fields": self._fields, **changes}
+        return FakeQuery(self._collection, **state)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document):
+        if isinstance(document, FakeDocumentSnapshot):
+            values = {field: _field(document._data or {}, field) for field, _ in self._orders}
+            return self._copy(cursor=(values, document.id))
+        return self._copy(cursor=(dict(document), None))
+
+    def select(self, fields):
+        return self._copy(fields=list(fields))
+
+    def _compare(self, a, b):
+        """Orders (data, doc_id) pairs by the order_by fields, then by ID in the last field's direction."""
+        for field, direction in self._orders:
+            x, y = _field(a[0], field), _field(b[0], field)
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if direction == "DESCENDING" else result
+        if a[1] is None or b[1] is None or a[1] == b[1]:
+            return 0
+        result = -1 if a[1] < b[1] else 1
+        descending = self._orders and self._orders[-1][1] == "DESCENDING"
+        return -result if descending else result
+
+    def stream(self, transaction=None):
+        db = self._collection._db
+        with db._lock:
+            docs = [(doc_id, dict(data)) for doc_id, data in self._collection.docs.items()]
+        matched = []
+        for doc_id, data in docs:
+            values = [(_field(data, field), op, value) for field, op, value in self._filters]
+            if any(found is _MISSING or not _OPERATORS[op](found, value) for found, op, value in values):
+                continue
+            if any(_field(data, field) is _MISSING for field, _ in self._orders):
+                continue
+            matched.append((data, doc_id))
+        matched.sort(key=functools.cmp_to_key(self._compare))
+        if self._cursor is not None:
+            cursor = (self._cursor[0], self._cursor[1])
+            matched = [entry for entry in matched if self._compare(entry, cursor) > 0]
+        if self._limit is not None:
+            matched = matched[:self._limit]
+        with db._lock:
+            db.reads += max(1, len(matched))
+        for data, doc_id in matched:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield FakeDocumentSnapshot(doc_id, data, self._collection.document(doc_id))
+
+    def get(self, transaction=None):
+        return list(self.stream(transaction))
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self._db = db
+        self.name = name
+        self.docs = {}
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data):
+        doc_ref = self.document()
+        doc_ref.set(data)
+        return (None, doc_ref)
+
+    # Queries over the whole collection
+    def where(self, field, op, value):
+        return FakeQuery(self).where(field, op, value)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return FakeQuery(self).order_by(field, direction)
+
+    def limit(self, count):
+        return FakeQuery(self).limit(count)
+
+    def select(self, fields):
+        return FakeQuery(self).select(fields)
+
+    def stream(self, transaction=None):
+        return FakeQuery(self).stream(transaction)
+
+
+class FakeWriteBatch:
+    """Applies every queued set() and delete() atomically on commit()."""
+
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, doc_ref, data, merge=False):
+        self._ops.append((doc_ref, data, merge))
+
+    def delete(self, doc_ref):
+        self._ops.append((doc_ref, None, False))
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        self._db._before_commit()
+        limit = self._db.max_document_bytes
+        if limit and any(data is not None and len(json.dumps(data, default=str).encode("utf-8")) > limit
+                         for _, data, _ in self._ops):
+            # Like Firestore, one oversized document rejects the whole batch
+            raise FakeAPIError(400)
+        with self._db._lock:
+            self._db.commits += 1
+            for doc_ref, data, merge in self._ops:
+                if data is None:
+                    doc_ref.delete()
+                else:
+                    doc_ref.set(data, merge=merge)
+
+
+class FakeFirestore:
+    """
+    In-memory stand-in for firestore.client() that records every write.
+    Batch commits take `commit_latency` seconds and fail at `error_rates`, and
+    with 400 when a document is over `max_document_bytes` (Firestore's limit is
+    1 MiB); document gets take `read_latency` seconds. Collections support
+    simple queries (see FakeQuery) and deletes.
+    """
+
+    def __init__(self, commit_latency: float = 0.0, error_rates: dict = None, seed=None, read_latency: float = 0.0,
+                 max_document_bytes: int = None):
+        self.collections = {}
+        self.writes = 0
+        self.reads = 0
+        self.deletes = 0
+        self.commits = 0
+        self.commit_latency = commit_latency
+        self.read_latency = read_latency
+        self.max_document_bytes = max_document_bytes
+        self.faults = FaultInjector(error_rates, seed=seed)
+        self._lock = threading.RLock()
+
+    def _before_commit(self):
+        outcome = self.faults.draw()
+        if self.commit_latency:
+            time.sleep(self.commit_latency)
+        if isinstance(outcome, int):
+            raise FakeAPIError(outcome)
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self, name)
+            return self.collections[name]
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+
+class FakeTranslateClient:
+    """
+    Offline stand-in for translate_v2.Client. Accepts a single string or a list,
+    like the real client, and returns '[target] text' for each segment after a
+    latency drawn per request (see sample_latency), or raises an injected error.
+    per_segment_latency adds time for every segment in the request, since a
+    large batch takes longer to translate than a small one.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, latency_distribution: str = "uniform",
+                 error_rates: dict = None, seed=None, per_segment_latency: float = 0.0):
+        self.latency = latency
+        self.per_segment_latency = per_segment_latency
+        self.jitter = jitter
+        self.latency_distribution = latency_distribution
+        self.faults = FaultInjector(error_rates, seed=None if seed is None else seed + 1)
+        self.calls = 0
+        self.segments = 0
+        self.latencies = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def translate(self, values, target_language=None, source_language=None, **kwargs):
+        single = isinstance(values, str)
+        texts = [values] if single else list(values)
+        with self._lock:
+            self.calls += 1
+            self.segments += len(texts)
+            delay = sample_latency(self._random, self.latency_distribution, self.latency, self.jitter)
+            delay += self.per_segment_latency * len(texts)
+        outcome = self.faults.draw()
+        time.sleep(delay)
+        with self._lock:
+            self.latencies.append(delay)
+        if isinstance(outcome, int):
+            raise FakeAPIError(outcome)
+        results = [
+            {"translatedText": f"[{target_language}] {text}", "input": text}
+            for text in texts
+        ]
+        return results[0] if single else results
@@ -0,0 +1,64 @@
+# fingerprint.py
+#
+# Content fingerprints for news items and categories, used to detect when a
+# run returned essentially the same stories as the last stored document.
+#
+# Items are normalized before hashing (Unicode NFKC, case-folded, whitespace
+# collapsed, trailing punctuation dropped; sources reduced to a sorted set of
+# base URLs), so cosmetic differences between two generations of the same
+# story do not count as a change. Source URLs are expected to have been through
+# get_base_url already, as they are by the time documents are stored.
+
+import hashlib
+import json
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_text(text):
+    text = unicodedata.normalize("NFKC", str(text or "")).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip(".!?;:")
+
+
+def _normalize_url(url):
+    return str(url or "").strip().lower().rstrip("/")
+
+
+def normalize_item(item: dict):
+    """Canonical form of one news item: normalized title, summary and source domains."""
+    sources = item.get("sources") or []
+    return {
+        "title": _normalize_text(item.get("title")),
+        "summary": _normalize_text(item.get("summary")),
+        "sources": sorted({_normalize_url(source.get("url")) for source in sources if isinstance(source, dict) and source.get("url")}),
+    }
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def item_fingerprint(item: dict):
+    return _digest(normalize_item(item))
+
+
+def category_fingerprint(category_data: dict):
+    """
+    Fingerprint of one category's {'news_items': [...]}, including any
+    cross_references left by dedup. Independent of item order, so a reshuffled
+    but otherwise identical list is not a change.
+    """
+    items = category_data.get("news_items", []) if isinstance(category_data, dict) else []
+    digest = sorted(item_fingerprint(item) for item in items if isinstance(item, dict))
+    cross_references = category_data.get("cross_references") if isinstance(category_data, dict) else None
+    if cross_references:
+        # Stories deduplicated into another category still count as this category's content
+        digest.append(sorted(f"{ref.get('category')}/{ref.get('id')}" for ref in cross_references))
+    return _digest(digest)
+
+
+def fingerprint_news_data(news_data: dict):
+    """Returns {category: fingerprint} for a consolidated news_data payload."""
+    return {category: category_fingerprint(category_data) for category, category_data in news_data.items()}
@@ -0,0 +1,237 @@
+# firestore_writer.py
+#
+# Background write stage for sweep output and error logs.
+#
+# Callers enqueue documents with add()/set() and get the document ID back
+# immediately (IDs are allocated client-side, so no round trip is needed).
+# A single background thread groups queued writes into Firestore batch
+# commits, bounded by operation count, approximate payload size and time,
+# and retries failed commits with the shared RetryPolicy. Everything still
+# buffered is flushed on close() and at interpreter exit. A write can carry
+# an on_commit callback, called from the writer thread once its batch has
+# committed, for state that must not run ahead of Firestore (checkpoints).
+# A batch rejected outright is split until only the offending writes fail.
+
+import atexit
+import json
+import queue
+import threading
+import time
+
+import metrics
+from retry_policy import DeadlineExceeded, RetryPolicy, is_retryable
+
+# Firestore allows at most 500 writes and 10 MiB per commit
+MAX_BATCH_OPERATIONS = 500
+MAX_BATCH_BYTES = 9 * 1024 * 1024
+FLUSH_INTERVAL = 2.0 # seconds a write may wait in the buffer before it is committed
+
+
+def _approximate_size(data: dict):
+    return len(json.dumps(data, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+def when_all_committed(count: int, callback):
+    """Returns an on_commit callback for `count` writes that calls callback() once all of them have committed."""
+    remaining = [count]
+    lock = threading.Lock()
+
+    def on_commit():
+        with lock:
+            remaining[0] -= 1
+            done = remaining[0] == 0
+        if done:
+            callback()
+    return on_commit
+
+
+class BufferedFirestoreWriter:
+    """
+    Buffers Firestore writes and commits them in batches from a background thread.
+
+    db_provider is a zero-argument callable returning the Firestore client; it is
+    looked up on every commit so a script's module-level `db` can be swapped for a
+    fake after import.
+    """
+
+    def __init__(self, db_provider, max_operations: int = MAX_BATCH_OPERATIONS, max_bytes: int = MAX_BATCH_BYTES,
+                 flush_interval: float = FLUSH_INTERVAL, retry_policy: RetryPolicy = None):
+        self._db_provider = db_provider
+        self.max_operations = max_operations
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=30.0, call_timeout=120.0)
+
+        self.committed_batches = 0
+        self.committed_writes = 0
+        self.failed_writes = []
+
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    # --- Public API ---
+
+    def add(self, collection: str, data: dict):
+        """Queues a new document with an auto-generated ID and returns that ID."""
+        doc_id = self._db_provider().collection(collection).document().id
+        self.set(collection, doc_id, data)
+        return doc_id
+
+    def set(self, collection: str, doc_id: str, data: dict, merge: bool = False, on_commit=None):
+        """
+        Queues a set() of collection/doc_id. on_commit, if given, is called without
+        arguments from the writer thread after the write has committed, and never
+        if it fails permanently.
+        """
+        if self._closed:
+            raise RuntimeError("BufferedFirestoreWriter is closed.")
+        self._ensure_started()
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((collection, doc_id, data, merge, on_commit))
+
+    def flush(self, timeout: float = None):
+        """Blocks until every write queued so far has been committed (or given up on)."""
+        self._queue.put(None) # Wake the worker so it commits without waiting for the interval
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._pending_lock:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._pending_lock.wait(remaining)
+        return True
+
+    def close(self):
+        """Flushes everything still buffered and stops the background thread."""
+        if self._closed:
+            return
+        if self._thread is not None:
+            self.flush()
+        self._closed = True
+
+    def failed_doc_ids(self, collection: str):
+        """IDs of the documents in collection whose writes were given up on."""
+        with self._pending_lock:
+            return {op[1] for op in self.failed_writes if op[0] == collection}
+
+    def mark_failed_writes(self, results: dict, collection: str = "news_summaries"):
+        """
+        Turns the success entries of results ({label: result}, as returned by the
+        store functions) whose document in collection failed to commit into errors.
+        Call after flush(); returns the labels that were changed.
+        """
+        failed_ids = self.failed_doc_ids(collection)
+        changed = []
+        for label, result in results.items():
+            if isinstance(result, dict) and result.get("status") == "success" and result.get("doc_id") in failed_ids:
+                results[label] = {"status": "error", "doc_id": result["doc_id"],
+                                  "message": f"Firestore commit of {collection}/{result['doc_id']} failed permanently."}
+                changed.append(label)
+        if changed:
+            print(f"❌ {len(changed)} documents were never committed: {changed}")
+        return changed
+
+    def stats(self):
+        with self._pending_lock:
+            return {
+                "committed_batches": self.committed_batches,
+                "committed_writes": self.committed_writes,
+                "failed_writes": len(self.failed_writes),
+                "pending_writes": self._pending,
+            }
+
+    # --- Background commit loop ---
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="firestore-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        buffer, buffer_bytes, first_at = [], 0, None
+        while True:
+            timeout = None if first_at is None else max(0.0, first_at + self.flush_interval - time.monotonic())
+            try:
+                op = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                op = None
+
+            if op is not None:
+                size = _approximate_size(op[2])
+                if buffer and (len(buffer) >= self.max_operations or buffer_bytes + size > self.max_bytes):
+                    self._commit(buffer)
+                    buffer, buffer_bytes, first_at = [], 0, None
+                buffer.append(op)
+                buffer_bytes += size
+                if first_at is None:
+                    first_at = time.monotonic()
+                if self._queue.qsize() > 0 and len(buffer) < self.max_operations:
+                    continue # Keep draining before committing
+
+            # Commit on flush request, timeout, or a full buffer
+            if buffer and (op is None or len(buffer) >= self.max_operations or time.monotonic() - first_at >= self.flush_interval):
+                self._commit(buffer)
+                buffer, buffer_bytes, first_at = [], 0, None
+
+    def _commit(self, ops: list):
+        metrics.observe("firestore_batch_operations", len(ops))
+        metrics.observe("firestore_batch_bytes", sum(_approximate_size(op[2]) for op in ops))
+        for collection, *_ in ops:
+            # Subcollection paths (latest/{id}/categories) are reported by their last segment
+            metrics.inc("firestore_writes_total", collection=collection.rsplit("/", 1)[-1])
+
+        try:
+            self._commit_or_split(ops)
+        finally:
+            with self._pending_lock:
+                self._pending -= len(ops)
+                self._pending_lock.notify_all()
+
+    def _commit_or_split(self, ops: list):
+        """
+        Commits ops as one batch. A permanent error (e.g. one document over the
+        1 MiB limit) fails the whole batch, so the batch is split in halves and
+        each half committed on its own, down to single writes, until only the
+        offending writes are given up on. Retryable errors that outlast the retry
+        policy say nothing about a single document and fail the batch as it is.
+        """
+        def commit():
+            db = self._db_provider()
+            batch = db.batch()
+            for collection, doc_id, data, merge, _ in ops:
+                batch.set(db.collection(collection).document(doc_id), data, merge=merge)
+            batch.commit()
+
+        try:
+            with metrics.timer("firestore_commit_seconds"):
+                self.retry_policy.run(commit, label=f"Firestore batch of {len(ops)}", labels={"backend": "firestore"})
+        except Exception as e:
+            if len(ops) > 1 and not isinstance(e, DeadlineExceeded) and not is_retryable(e):
+                print(f"⚠️ Firestore batch commit of {len(ops)} writes rejected ({str(e)[:60]}); splitting it to isolate the bad writes.")
+                metrics.inc("firestore_batch_splits_total")
+                middle = len(ops) // 2
+                self._commit_or_split(ops[:middle])
+                self._commit_or_split(ops[middle:])
+                return
+            print(f"❌ Firestore batch commit of {len(ops)} writes failed permanently: {e}")
+            metrics.inc("firestore_failed_writes_total", len(ops))
+            with self._pending_lock:
+                self.failed_writes.extend(ops)
+            return
+
+        with self._pending_lock:
+            self.committed_batches += 1
+            self.committed_writes += len(ops)
+        for op in ops:
+            if op[4] is not None:
+                try:
+                    op[4]()
+                except Exception as e:
+                    print(f"⚠️ Commit callback for {op[0]}/{op[1]} failed: {e}")
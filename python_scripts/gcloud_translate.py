@@ -2,15 +2,294 @@
 
 import functions_framework
 import json
-from google.cloud import translate_v2 as translate
+import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import clients
+import metrics
+from materialized_translations import MaterializedTranslations, RequestCounter
+from translation_cache import LRUCache, FirestoreStore, SQLiteStore, TranslationCache, cache_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Initialize the Google Cloud Translate client
-# It will automatically pick up credentials from the Cloud Function environment.
-translate_client = translate.Client()
+# The Google Cloud Translate client is created on the first request rather than at
+# import, so a cold start does not pay for it before it is needed. It picks up
+# credentials from the Cloud Function environment. Tests may assign a fake.
+translate_client = None
+
+def get_translate_client():
+    global translate_client
+    if translate_client is None:
+        translate_client = clients.translate_client()
+    return translate_client
+
+# --- TRANSLATION CACHE ---
+# TRANSLATION_CACHE_BACKEND picks the persistent tier: 'firestore' (default),
+# 'sqlite' (TRANSLATION_CACHE_PATH) or 'memory' for the in-process LRU only.
+TRANSLATION_CACHE_MAX_BYTES = int(os.environ.get('TRANSLATION_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+def _build_translation_cache():
+    backend = os.environ.get('TRANSLATION_CACHE_BACKEND', 'firestore')
+    store = None
+    if backend == 'firestore':
+        try:
+            store = FirestoreStore(clients.cloud_firestore_client())
+        except Exception as e:
+            logging.warning(f"Translation cache running memory-only; Firestore unavailable: {e}")
+    elif backend == 'sqlite':
+        store = SQLiteStore(os.environ.get('TRANSLATION_CACHE_PATH', '/tmp/translation_cache.sqlite3'))
+    return TranslationCache(LRUCache(TRANSLATION_CACHE_MAX_BYTES), store)
+
+# Built on first use as well; assign a TranslationCache to override it.
+translation_cache = None
+
+def get_translation_cache():
+    global translation_cache
+    if translation_cache is None:
+        translation_cache = _build_translation_cache()
+    return translation_cache
+
+# --- MATERIALIZED TRANSLATIONS ---
+# Every request is counted by target language; the post-sweep stage in
+# materialized_translations.py pre-translates the English news into the most
+# requested languages. A request naming its snapshot_id and category in one of
+# those languages is answered from storage. MATERIALIZED_TRANSLATIONS=0 turns
+# both the counting and the lookups off.
+MATERIALIZED_TRANSLATIONS = os.environ.get('MATERIALIZED_TRANSLATIONS', '1') != '0'
+
+# Built on first use; assign replacements to override them.
+request_counter = None
+materialized = None
+
+def get_request_counter():
+    global request_counter
+    if request_counter is None:
+        request_counter = RequestCounter(clients.cloud_firestore_client)
+    return request_counter
+
+def get_materialized():
+    global materialized
+    if materialized is None:
+        materialized = MaterializedTranslations(clients.cloud_firestore_client)
+    return materialized
+
+def _materialized_items(request_json, target_language):
+    """The pre-translated items for the request's snapshot_id and category, or None to translate live."""
+    snapshot_id = request_json.get('snapshot_id')
+    category = request_json.get('category')
+    if not snapshot_id or not category:
+        return None
+    labels = {'target': target_language}
+    try:
+        with metrics.timer('translate_materialized_lookup_seconds', **labels):
+            items = get_materialized().lookup(snapshot_id, category, target_language)
+    except Exception as e:
+        logging.warning(f"Materialized translation lookup failed, translating live: {e}")
+        items = None
+    metrics.inc('translate_materialized_total', outcome='hit' if items is not None else 'miss', **labels)
+    return items
+
+# --- BATCHING CONFIGURATION ---
+# Cloud Translation Basic (v2) accepts at most 128 segments per request and
+# recommends keeping a request under ~30K characters.
+MAX_SEGMENTS_PER_BATCH = 128
+MAX_BATCH_BYTES = 30000
+
+# --- CONCURRENCY CONFIGURATION ---
+# Batches of one request are sent in parallel, up to this many at a time.
+MAX_CONCURRENT_BATCHES = int(os.environ.get('TRANSLATE_MAX_CONCURRENT_BATCHES', 4))
+
+# --- STREAMING CONFIGURATION ---
+# In streaming mode items are translated in chunks that double in size, starting
+# from FIRST_STREAM_CHUNK_ITEMS: the first item is back after one small call,
+# while a long payload still needs only about log2(items) calls.
+FIRST_STREAM_CHUNK_ITEMS = 1
+MAX_STREAM_CHUNK_ITEMS = 32
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+def _batches(texts):
+    """Splits texts into consecutive chunks that respect the segment and byte limits."""
+    batch, batch_bytes = [], 0
+    for text in texts:
+        size = len(text.encode('utf-8'))
+        if batch and (len(batch) >= MAX_SEGMENTS_PER_BATCH or batch_bytes + size > MAX_BATCH_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(text)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+def translate_texts(texts, target_language, source_language='en'):
+    """
+    Translates a list of strings with as few API calls as possible.
+
+    Empty strings are passed through and duplicates are only sent once, so the
+    number of round trips depends on the number of batches, not strings.
+    Strings already in the translation cache are not sent at all.
+    Returns the translations in the same order as the input.
+    """
+    unique_texts = list(dict.fromkeys(text for text in texts if text))
+    keys = {text: cache_key(text, source_language, target_language) for text in unique_texts}
+
+    cached = get_translation_cache().get_many(keys.values())
+    translations = {text: cached[key] for text, key in keys.items() if key in cached}
+    misses = [text for text in unique_texts if text not in translations]
+
+    labels = {'source': source_language, 'target': target_language}
+    metrics.inc('translate_cache_hits_total', len(translations), **labels)
+    metrics.inc('translate_cache_misses_total', len(misses), **labels)
+
+    def translate_batch(batch):
+        try:
+            with metrics.timer('translate_call_seconds', **labels):
+                results = get_translate_client().translate(
+                    batch,
+                    target_language=target_language,
+                    source_language=source_language
+                )
+        except Exception:
+            metrics.inc('translate_errors_total', **labels)
+            raise
+        metrics.inc('translate_segments_total', len(batch), **labels)
+        metrics.inc('translate_characters_total', sum(len(text) for text in batch), **labels)
+        return results
+
+    batches = list(_batches(misses))
+    if len(batches) > 1 and MAX_CONCURRENT_BATCHES > 1:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_BATCHES, len(batches))) as executor:
+            batch_results = list(executor.map(translate_batch, batches))
+    else:
+        batch_results = [translate_batch(batch) for batch in batches]
+
+    new_entries = {}
+    for batch, results in zip(batches, batch_results):
+        for original, result in zip(batch, results):
+            translations[original] = result['translatedText']
+            new_entries[keys[original]] = result['translatedText']
+
+    get_translation_cache().set_many(new_entries)
+
+    return [translations.get(text, text) for text in texts]
+
+def translate_items(news_items, target_language, source_language='en'):
+    """
+    Translates the title, summary and every source 'link_title' of each news item.
+
+    All strings are flattened into one list, translated in batches, and mapped
+    back into the original nested structure. URLs remain untranslated.
+    """
+    # Flatten every translatable string, in a fixed traversal order
+    texts = []
+    for item in news_items:
+        texts.append(item.get('title', ''))
+        texts.append(item.get('summary', ''))
+        for source in item.get('sources', []):
+            texts.append(source.get('link_title', ''))
+
+    translated = iter(translate_texts(texts, target_language, source_language))
+
+    # Rebuild the items by walking the payload in the same order
+    translated_items = []
+    for item in news_items:
+        translated_title = next(translated)
+        translated_summary = next(translated)
+
+        translated_sources = []
+        for source in item.get('sources', []):
+            translated_sources.append({
+                'link_title': next(translated),
+                'url': source.get('url', '') # URL remains untranslated
+            })
+
+        # Untranslated fields (e.g. the dedup 'id' and 'also_in') are carried over as-is
+        translated_items.append({
+            **item,
+            'title': translated_title,
+            'summary': translated_summary,
+            'sources': translated_sources
+        })
+
+    return translated_items
+
+def _stream_chunks(news_items):
+    """Splits news_items into consecutive chunks of FIRST_STREAM_CHUNK_ITEMS, then twice that, and so on."""
+    size, start = FIRST_STREAM_CHUNK_ITEMS, 0
+    while start < len(news_items):
+        yield news_items[start:start + size]
+        start += size
+        size = min(size * 2, MAX_STREAM_CHUNK_ITEMS)
+
+def iter_translated_items(news_items, target_language, source_language='en', max_workers=None):
+    """
+    Yields the translated news items in input order, each as soon as it is ready.
+
+    Chunks (see _stream_chunks) are translated concurrently, at most max_workers
+    (MAX_CONCURRENT_BATCHES by default) at a time, and released strictly in order,
+    so a slow later chunk never holds back an earlier one. Closing the generator
+    early cancels the chunks that have not started.
+    """
+    chunks = list(_stream_chunks(news_items))
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers or MAX_CONCURRENT_BATCHES, len(chunks) or 1)))
+    try:
+        futures = [executor.submit(translate_items, chunk, target_language, source_language) for chunk in chunks]
+        for future in futures:
+            yield from future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def translate_news_data(news_data, target_language, source_language='en'):
+    """
+    Translates a stored news_data payload in a single batched pass.
+
+    Accepts either shape written to news_summaries: {'news_items': [...]} from
+    gemini_journalist.py, or {category: {'news_items': [...]}} from
+    gemini_journalist_with_categories.py. Returns a copy with the same shape.
+    """
+    if isinstance(news_data, dict) and 'news_items' in news_data:
+        return {'news_items': translate_items(news_data['news_items'], target_language, source_language)}
+
+    # Translate every category's items together so they share batches
+    categories = list(news_data.keys())
+    all_items = []
+    for category in categories:
+        all_items.extend(news_data[category].get('news_items', []))
+
+    translated = translate_items(all_items, target_language, source_language)
+
+    translated_data = {}
+    offset = 0
+    for category in categories:
+        count = len(news_data[category].get('news_items', []))
+        translated_data[category] = {**news_data[category], 'news_items': translated[offset:offset + count]}
+        offset += count
+    return translated_data
+
+def _wants_stream(request, request_json):
+    """Streaming is asked for with "stream": true in the body or an NDJSON Accept header."""
+    if request_json.get('stream'):
+        return True
+    headers = getattr(request, 'headers', None) or {}
+    return NDJSON_CONTENT_TYPE in (headers.get('Accept') or '')
+
+def _ndjson_lines(news_items, target_language):
+    """
+    Response body for streaming mode: one translated item per line, in input order.
+
+    The status line has already gone out by the time a chunk can fail, so a
+    failure is reported as a final {"error": ...} line instead of a 500.
+    """
+    sent = 0
+    try:
+        for item in iter_translated_items(news_items, target_language):
+            sent += 1
+            yield json.dumps(item) + '\n'
+    except Exception as e:
+        logging.error(f"Streaming translation failed after {sent} of {len(news_items)} items: {e}", exc_info=True)
+        yield json.dumps({'error': f"Internal Server Error: {str(e)}", 'translated': sent}) + '\n'
+    logging.info(f"Translation cache stats: {get_translation_cache().stats()}")
 
 @functions_framework.http
 def translate_news_items(request):
@@ -18,6 +297,16 @@ def translate_news_items(request):
     HTTP Cloud Function to translate a list of news items.
 
     This version now also translates the 'link_title' within the 'sources' array.
+    All strings are sent through batched multi-segment translate calls.
+
+    With "stream": true in the body (or Accept: application/x-ndjson) the
+    response is NDJSON, one translated item per line, and each line is sent as
+    soon as its item is translated, so the app can render the first cards early.
+
+    A request that also sends the "snapshot_id" and "category" the items came
+    from is answered from the pre-materialized translation when the target
+    language has one (see materialized_translations.py); news_items is then
+    only used if that lookup misses.
     """
     # Set CORS headers for preflight requests (Dart/Flutter Web)
     if request.method == 'OPTIONS':
@@ -46,63 +335,27 @@ def translate_news_items(request):
         if not news_items or not target_language:
             raise ValueError("Missing 'news_items' or 'target_language' in request body.")
 
-        translated_items = []
+        # 2. Languages materialized after the sweep are a single document read
+        materialized_items = None
+        if MATERIALIZED_TRANSLATIONS:
+            get_request_counter().record(target_language)
+            materialized_items = _materialized_items(request_json, target_language)
 
-        # 2. Iterate and translate
-        for item in news_items:
-            original_title = item.get('title', '')
-            original_summary = item.get('summary', '')
-            original_sources = item.get('sources', [])
+        # 3. In streaming mode, hand back a generator and translate as it is consumed
+        if _wants_stream(request, request_json):
+            stream_headers = {**headers, 'Content-Type': NDJSON_CONTENT_TYPE, 'X-Accel-Buffering': 'no'}
+            if materialized_items is not None:
+                return ((json.dumps(item) + '\n' for item in materialized_items), 200, stream_headers)
+            return (_ndjson_lines(news_items, target_language), 200, stream_headers)
 
-            # --- Translate Title ---
-            translated_title = ''
-            if original_title:
-                result_title = translate_client.translate(
-                    original_title,
-                    target_language=target_language,
-                    source_language='en'
-                )
-                translated_title = result_title['translatedText']
+        if materialized_items is not None:
+            return (json.dumps(materialized_items), 200, headers)
 
-            # --- Translate Summary ---
-            translated_summary = ''
-            if original_summary:
-                result_summary = translate_client.translate(
-                    original_summary,
-                    target_language=target_language,
-                    source_language='en'
-                )
-                translated_summary = result_summary['translatedText']
-
-            # --- Translate Source Titles (New Logic) ---
-            translated_sources = []
-            for source in original_sources:
-                original_link_title = source.get('link_title', '')
-
-                translated_link_title = original_link_title
-                if original_link_title:
-                    result_source_title = translate_client.translate(
-                        original_link_title,
-                        target_language=target_language,
-                        source_language='en'
-                    )
-                    translated_link_title = result_source_title['translatedText']
-
-                # Reconstruct the source object with the translated title and original URL
-                translated_sources.append({
-                    'link_title': translated_link_title,
-                    'url': source.get('url', '') # URL remains untranslated
-                })
-
-            # 3. Create the new translated item
-            translated_item = {
-                'title': translated_title,
-                'summary': translated_summary,
-                'sources': translated_sources
-            }
-            translated_items.append(translated_item)
-
-        # 4. Return the translated list as JSON
+        # 4. Otherwise translate every string in the payload through batched API calls
+        translated_items = translate_items(news_items, target_language)
+        logging.info(f"Translation cache stats: {get_translation_cache().stats()}")
+
+        # 5. Return the translated list as JSON
         return (json.dumps(translated_items), 200, headers)
 
     except ValueError as e:
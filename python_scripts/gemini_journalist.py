@@ -1,18 +1,13 @@
-import requests
 import json
 import re
-import time
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
-# Import for the Google GenAI SDK and types
-from google import genai
-from google.genai import types
-
-# Import for Firebase/Firestore
-import firebase_admin
-from firebase_admin import credentials, firestore
-from firebase_admin.firestore import Query
+import clients
+from country_codes import language_code
+from firestore_writer import BufferedFirestoreWriter
+import metrics
+from retry_policy import CircuitBreaker, EmptyResponseError, RetryPolicy
 
 # --- CONFIGURATION (Replace with your actual settings) ---
 # NOTE: The client handles the API key, typically from the GEMINI_API_KEY env var,
@@ -20,33 +15,28 @@ from firebase_admin.firestore import Query
 GEMINI_API_KEY = "x" # No longer needed directly for client
 FIREBASE_PROJECT_ID = "gemini-journalist-8c449"
 
-# --- FIREBASE / GOOGLE CLOUD AUTH SETUP ---
-
-try:
-    cred = credentials.Certificate("gemini-journalist-8c449-firebase-adminsdk-fbsvc-7bbb8af864.json")
-    firebase_admin.initialize_app(cred)
-except Exception as e:
-    print("Error connecting to Firebase: " + e)
-
-db = firestore.client()
-
-# Initialize the Gemini Client
-# It will automatically look for the GEMINI_API_KEY environment variable.
-try:
-    gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-    print("Gemini Client initialized successfully.")
-except Exception as e:
-    print(f"ERROR: Failed to initialize Gemini Client. Ensure your API key is set as an environment variable (GEMINI_API_KEY). {e}")
-    # Create a mock client if initialization fails
-    class GeminiClientMock:
-        def models(self): return self
-        def generate_content(self, model, contents, config):
-            print("\n--- MOCK: Gemini API call failed. Returning dummy data. ---")
-            return types.GenerateContentResponse(
-                text='[{"title": "Mock News Title", "summary": "This is a mock summary.", "sources": [{"link_title": "Mock Source", "url": "http://mock.com"}]}]',
-                candidates=[types.Candidate(content=types.Content(parts=[types.Part(text='[{"title": "Mock News Title", "summary": "This is a mock summary.", "sources": [{"link_title": "Mock Source", "url": "http://mock.com"}]}]')]))]
-            )
-    gemini_client = GeminiClientMock()
+# --- CLIENTS ---
+# Firestore and Gemini clients are built on first use (see clients.py), so importing
+# this module needs no credentials. Tests and benchmarks may assign fakes to `db`
+# and `gemini_client` directly; the accessors return whatever is assigned.
+db = None
+gemini_client = None
+
+def get_db():
+    global db
+    if db is None:
+        db = clients.firestore_client()
+    return db
+
+def get_gemini_client():
+    global gemini_client
+    if gemini_client is None:
+        gemini_client = clients.gemini_client(GEMINI_API_KEY)
+    return gemini_client
+
+# Documents and error logs are queued here and committed in batches off the hot path.
+# get_db is looked up on every commit, so `db` can be swapped after import.
+firestore_writer = BufferedFirestoreWriter(get_db)
 
 # Strip links down to their base url
 def get_base_url(url: str):
@@ -70,9 +60,22 @@ def get_base_url(url: str):
         # If anything goes wrong, return the original URL so we don't lose data
         return url
 
-# --- NEW: RETRY CONFIGURATION ---
-MAX_RETRIES = 20
-INITIAL_WAIT_TIME = 10 # seconds
+# --- RETRY CONFIGURATION ---
+MAX_RETRIES = 8
+INITIAL_WAIT_TIME = 2 # seconds, doubled (with jitter) on every retry
+MAX_WAIT_TIME = 60 # seconds, cap on a single backoff
+CALL_DEADLINE = 300 # seconds, budget for one query including retries
+ATTEMPT_TIMEOUT = 120 # seconds, cap on one Gemini request before it is abandoned and retried
+
+gemini_circuit_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=15)
+retry_policy = RetryPolicy(
+    max_attempts=MAX_RETRIES,
+    base_delay=INITIAL_WAIT_TIME,
+    max_delay=MAX_WAIT_TIME,
+    call_timeout=CALL_DEADLINE,
+    attempt_timeout=ATTEMPT_TIMEOUT,
+    breaker=gemini_circuit_breaker,
+)
 
 def safe_json_load(text: str):
     """
@@ -98,16 +101,163 @@ def safe_json_load(text: str):
     # 2. Attempt standard JSON decoding on the cleaned content.
     return json.loads(json_content)
 
+def _build_config(lang: str, timeout: float = None):
+    """Builds the grounded GenerateContentConfig for one output language, bounded to timeout seconds if given."""
+    types = clients.genai_types()
+    # Define the System Instruction for the current language
+    system_instruction = (
+        f"You are a helpful news curator. Your task is to provide 10 current individual news stories, if possible. "
+        f"**Your entire response MUST be a single valid JSON structure (with fields title, summary, and sources(link_title, url)) wrapped in ```json ... ``` code fences.** "
+        f"Call the JSON news_items."
+        f"Ensure all output text is in the {lang} language."
+        f"Use the search tool to find authoritative and up-to-date sources and include them in the 'sources' array."
+        f"Do not add anything after the base url for the source. For example: https://apnews.com/<DO NOT ADD ANYTHING HERE>"
+        f"Do not use any article that is more than 1 week old."
+    )
+
+    return types.GenerateContentConfig(
+        # Pass the System Instruction here
+        system_instruction=system_instruction,
+
+        # Enable Google Search grounding
+        tools=[{"googleSearch": {}}],
+
+        # Abandon a request that hangs instead of blocking the worker
+        http_options=clients.gemini_http_options(timeout) if timeout else None,
+    )
+
+def _query_gemini(country: str, lang: str):
+    """
+    Runs the grounded Gemini query for one language under the retry policy.
+    Returns (response, error_message); persistent failures are logged to Firestore.
+    """
+    # Define the core user query
+    user_query = f"What are the top 10 most discussed news items right now for {country}? For each item, provide a concise summary. The summary MUST include links to at least one primary source in the required 'sources' array field."
+    labels = {"country": country, "language": lang}
+
+    # --- START OF RETRY LOGIC ---
+    def generate(timeout):
+        # Execute the API Call using the SDK
+        with metrics.timer("gemini_call_seconds", **labels):
+            response = get_gemini_client().models.generate_content(
+                model="gemini-2.5-flash",
+                contents=user_query,
+                config=_build_config(lang, timeout),
+            )
+        metrics.record_usage(response, **labels)
+        # Treat an empty response text (the "None" case) as a transient failure
+        if not response or not response.text:
+            raise EmptyResponseError("Model returned no text.")
+        metrics.observe("gemini_response_bytes", len(response.text.encode("utf-8")), **labels)
+        return response
+
+    try:
+        response = retry_policy.run(generate, label=lang, labels=labels, timed=True)
+    except EmptyResponseError:
+        print(f"❌ Max retries reached for {country} in {lang}. Skipping.")
+
+        # LOG TO FIRESTORE
+        log_query_error_to_firestore(country, lang, "response empty")
+
+        return None, "response empty"
+    except Exception as e:
+        # Handle non-retryable errors (e.g., Auth, Invalid Argument), max retries or deadline hit
+        error_message = str(e)
+        print(f"❌ A persistent error occurred for {lang}: {e}")
+
+        # LOG TO FIRESTORE
+        log_query_error_to_firestore(country, lang, error_message)
+
+        return None, error_message
+    # --- END OF RETRY LOGIC ---
+
+    return response, None
+
+def _parse_news_response(country: str, lang: str, response):
+    """
+    Extracts the news items from a Gemini response and strips source URLs to their base.
+    Returns (news_items, error_message); failures are logged to Firestore.
+    """
+    # Process the response (Now robustly handles None and JSON extraction)
+    try:
+        with metrics.timer("json_parse_seconds", country=country, language=lang):
+            news_items = safe_json_load(response.text)
+    except json.JSONDecodeError as e:
+        metrics.inc("json_parse_errors_total", country=country, language=lang)
+        # Handle JSON parsing specific errors
+        error_msg = f"JSON Decode Error: {e}. Raw text was: {json.dumps(response.text[:500], indent=2)}..."
+        print(f"❌ An error occurred during JSON parsing for {lang}: {error_msg}")
+
+        # LOG TO FIRESTORE
+        log_query_error_to_firestore(country, lang, error_msg)
+
+        return None, error_msg
+
+    # --- ROBUST JSON CHECK ---
+    if not news_items:
+        error_msg = "Model returned no text (response was empty or blocked). This is the cause of the 'NoneType' error."
+        print(f"❌ An error occurred for {lang}: {error_msg}")
+
+        # LOG TO FIRESTORE
+        log_query_error_to_firestore(country, lang, error_msg)
+
+        return None, error_msg
+
+    # --- STRIP URLS TO BASE ---
+    # Based on your format: {'news_items': [{'title': '...', 'sources': [...]}]}
+    if isinstance(news_items, dict) and 'news_items' in news_items:
+        print("stripping urls")
+        for item in news_items['news_items']:
+            if 'sources' in item:
+                for source in item['sources']:
+                    if 'url' in source:
+                        source['url'] = get_base_url(source['url'])
+    # ---------------------------
+
+    return news_items, None
+
+def _store_news_items(country: str, lang: str, news_items):
+    """Writes one language's news items to Firestore and returns its result entry."""
+    try:
+        # Prepare data for Firestore, keyed by the language code the app queries with
+        firestore_data = {
+            "country": country,
+            "language": language_code(lang),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "news_data": news_items
+        }
+
+        # Save to Firestore (queued; committed in the next batch)
+        doc_id = firestore_writer.add("news_summaries", firestore_data)
+
+        print(f"✅ Successfully fetched and stored news for {country} in {lang}. Document ID: {doc_id}")
+        return {"status": "success", "doc_id": doc_id, "items_count": len(news_items)}
+
+    except ValueError as e:
+        print(f"❌ An error occurred for {lang}: {e}")
+
+        # LOG TO FIRESTORE
+        log_query_error_to_firestore(country, lang, str(e))
+
+        return {"status": "error", "message": str(e)}
+    except Exception as e:
+        # Catch any other unexpected exceptions during processing/Firestore upload
+        print(f"❌ An unexpected error occurred for {lang}: {e}")
+
+        # LOG TO FIRESTORE
+        log_query_error_to_firestore(country, lang, str(e))
+
+        return {"status": "error", "message": str(e)}
+
 def fetch_and_store_news(country: str, languages: list):
     """
     Fetches the top 10 discussed news items for a country in specified languages
     using the Gemini SDK with Google Search grounding, and saves the structured
     results to Firestore.
-    """
-
-    # 1. Define the core user query
-    user_query = f"What are the top 10 most discussed news items right now for {country}? For each item, provide a concise summary. The summary MUST include links to at least one primary source in the required 'sources' array field."
 
+    This runs one grounded query per language; see fetch_and_translate_news for
+    the cheaper fetch-once, translate-many mode.
+    """
     results = {}
 
     for lang in languages:
@@ -115,156 +265,61 @@ def fetch_and_store_news(country: str, languages: list):
         print(f"QUERYING NEWS for '{country}' in language: {lang}")
         print(f"========================================================")
 
-        # 2. Define the System Instruction for the current language
-        system_instruction = (
-            f"You are a helpful news curator. Your task is to provide 10 current individual news stories, if possible. "
-            f"**Your entire response MUST be a single valid JSON structure (with fields title, summary, and sources(link_title, url)) wrapped in ```json ... ``` code fences.** "
-            f"Call the JSON news_items."
-            f"Ensure all output text is in the {lang} language."
-            f"Use the search tool to find authoritative and up-to-date sources and include them in the 'sources' array."
-            f"Do not add anything after the base url for the source. For example: https://apnews.com/<DO NOT ADD ANYTHING HERE>"
-            f"Do not use any article that is more than 1 week old."
-        )
-
-
-        # 3. Create the GenerateContentConfig object
-        config = types.GenerateContentConfig(
-            # Pass the System Instruction here
-            system_instruction=system_instruction,
-
-            # Enable Google Search grounding
-            tools=[{"googleSearch": {}}],
-        )
-
-        # --- START OF RETRY LOGIC (New) ---
-        response = None
-        current_wait_time = INITIAL_WAIT_TIME
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                # 4. Execute the API Call using the SDK
-                response = gemini_client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=user_query,
-                    config=config,
-                )
-
-                # Check for empty response text (the "None" case)
-                if not response or not response.text:
-                    # If this is not the last attempt, trigger the retry/backoff
-                    if attempt < MAX_RETRIES - 1:
-                        print(f"⚠️ Attempt {attempt + 1}/{MAX_RETRIES} failed: Model returned no text. Retrying in {current_wait_time} seconds...")
-                        time.sleep(current_wait_time)
-                        current_wait_time *= 2  # Exponential backoff
-                        continue # Skip to the next iteration (retry)
-                    else:
-                        # Max retries hit for empty response
-                        print(f"❌ Final attempt failed for {lang}: Model returned no text after {MAX_RETRIES} retries.")
-                        break # Exit the loop, response remains None/empty
-
-                # If we get a response, break out of the retry loop
-                break
-            except Exception as e:
-                error_message = str(e)
-                # Check for 503 UNAVAILABLE (or other transient errors like 500)
-                if ("503 UNAVAILABLE" in error_message or "500 INTERNAL_SERVER_ERROR" in error_message) and attempt < MAX_RETRIES - 1:
-                    print(f"⚠️ Attempt {attempt + 1}/{MAX_RETRIES} failed with 503/500. Retrying in {current_wait_time} seconds...")
-                    print(f"{error_message}")
-                    time.sleep(current_wait_time)
-                    current_wait_time *= 2  # Exponential backoff
-                else:
-                    # Handle non-retryable errors (e.g., Auth, Invalid Argument, or max retries hit)
-                    print(f"❌ A persistent error occurred for {lang}: {e}")
-
-                    # LOG TO FIRESTORE
-                    log_query_error_to_firestore(country, lang, error_msg)
-
-                    results[lang] = {"status": "error", "message": error_message}
-                    return results # Exit the language loop on a persistent error
-
-        # Check if the retry loop failed to get a response
-        if not response:
-            print(f"❌ Max retries reached for {country} in {lang}. Skipping.")
-
-            # LOG TO FIRESTORE
-            log_query_error_to_firestore(country, lang, "response empty")
-
-            return results
-
-        # --- END OF RETRY LOGIC (New) ---
-
-        # 5. Process the response (Now robustly handles None and JSON extraction)
-        news_items = safe_json_load(response.text)
-
-        # --- ROBUST JSON CHECK (New) ---
-        if not news_items:
-            error_msg = "Model returned no text (response was empty or blocked). This is the cause of the 'NoneType' error."
-            print(f"❌ An error occurred for {lang}: {error_msg}")
-
-            # LOG TO FIRESTORE
-            log_query_error_to_firestore(country, lang, error_msg)
+        response, error_message = _query_gemini(country, lang)
+        if error_message:
+            results[lang] = {"status": "error", "message": error_message}
+            return results # Exit the language loop on a persistent error
 
-            results[lang] = {"status": "error", "message": error_msg}
+        news_items, error_message = _parse_news_response(country, lang, response)
+        if error_message:
+            results[lang] = {"status": "error", "message": error_message}
             continue # Move to the next language
 
-        # --- STRIP URLS TO BASE ---
-        # Based on your format: {'news_items': [{'title': '...', 'sources': [...]}]}
-        if isinstance(news_items, dict) and 'news_items' in news_items:
-            print("stripping urls")
-            for item in news_items['news_items']:
-                if 'sources' in item:
-                    for source in item['sources']:
-                        if 'url' in source:
-                            print(source['url'])
-                            source['url'] = get_base_url(source['url'])
-                            print(source['url'])
-        # ---------------------------
+        results[lang] = _store_news_items(country, lang, news_items)
 
-        try:
-            # 6. Prepare data for Firestore
-            if (lang == "English"):
-                lang = "en"
-            if (lang == "Spanish"):
-                lang = "es"
-            firestore_data = {
-                "country": country,
-                "language": lang,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "news_data": news_items
-            }
-
-            # 7. Save to Firestore
-            doc_ref = db.collection("news_summaries").add(firestore_data)
-            doc_id = doc_ref[1].id if isinstance(doc_ref, tuple) else doc_ref
-
-            print(f"✅ Successfully fetched and stored news for {country} in {lang}. Document ID: {doc_id}")
-            results[lang] = {"status": "success", "doc_id": doc_id, "items_count": len(news_items)}
-
-        except json.JSONDecodeError as e:
-            # Handle JSON parsing specific errors
-            error_msg = f"JSON Decode Error: {e}. Raw text was: {json.dumps(raw_text, indent=2)}..."
-            print(f"❌ An error occurred during JSON parsing for {lang}: {error_msg}")
-
-            # LOG TO FIRESTORE
-            log_query_error_to_firestore(country, lang, error_msg)
+    return results
 
-            results[lang] = {"status": "error", "message": error_msg}
-        except ValueError as e:
-            # Handle the specific ValueError we raised for empty json_text
-            print(f"❌ An error occurred for {lang}: {e}")
+def fetch_and_translate_news(country: str, languages: list, source_language: str = "English"):
+    """
+    Pipeline mode: runs the grounded Gemini query once, in source_language, then
+    produces every other language through a bulk machine-translation stage and
+    writes each one with the same news_summaries schema as fetch_and_store_news.
+    """
+    from gcloud_translate import translate_news_data # deferred: pulls in the Cloud Function framework
+    results = {}
 
-            # LOG TO FIRESTORE
-            log_query_error_to_firestore(country, lang, str(e))
+    print(f"\n========================================================")
+    print(f"QUERYING NEWS for '{country}' once in {source_language}, translating to: {languages}")
+    print(f"========================================================")
 
-            results[lang] = {"status": "error", "message": str(e)}
-        except Exception as e:
-            # Catch any other unexpected exceptions during processing/Firestore upload
-            print(f"❌ An unexpected error occurred for {lang}: {e}")
+    response, error_message = _query_gemini(country, source_language)
+    news_items = None
+    if not error_message:
+        news_items, error_message = _parse_news_response(country, source_language, response)
+
+    if error_message:
+        for lang in languages:
+            results[lang] = {"status": "error", "message": f"Source fetch in {source_language} failed: {error_message}"}
+        return results
 
-            # LOG TO FIRESTORE
-            log_query_error_to_firestore(country, lang, str(e))
+    source_code = language_code(source_language)
+
+    for lang in languages:
+        target_code = language_code(lang)
+        if target_code == source_code:
+            results[lang] = _store_news_items(country, lang, news_items)
+            continue
+
+        try:
+            translated_items = translate_news_data(news_items, target_code, source_code)
+        except Exception as e:
+            error_msg = f"Translation to {lang} failed: {e}"
+            print(f"❌ {error_msg}")
+            log_query_error_to_firestore(country, lang, error_msg)
+            results[lang] = {"status": "error", "message": error_msg}
+            continue
 
-            results[lang] = {"status": "error", "message": str(e)}
+        results[lang] = _store_news_items(country, lang, translated_items)
 
     return results
 
@@ -278,8 +333,8 @@ def log_query_error_to_firestore(country, lang, error_message):
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "status": "persistent_failure"
         }
-        db.collection("gemini_query_errors").add(error_data)
-        print(f"⚠️ Error logged to Firestore for {country}/{lang}")
+        firestore_writer.add("gemini_query_errors", error_data)
+        print(f"⚠️ Error queued for Firestore log for {country}/{lang}")
     except Exception as firestore_e:
         print(f"❌ Failed to log error to Firestore: {firestore_e}")
 
@@ -294,6 +349,8 @@ if __name__ == '__main__':
         country=COUNTRY_TO_SEARCH,
         languages=TARGET_LANGUAGES
     )
+    firestore_writer.flush()
+    firestore_writer.mark_failed_writes(final_results)
 
     print("\n\nRUN SUMMARY:")
     print(json.dumps(final_results, indent=2))
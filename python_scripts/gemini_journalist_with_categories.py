@@ -1,48 +1,53 @@
 # cd '' && '/usr/local/bin/python3'  'gemini_journalist_with_categories.py'
-import requests
+import argparse
 import json
 import re
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
-# Import for the Google GenAI SDK and types
-from google import genai
-from google.genai import types
-
-# Import for Firebase/Firestore
-import firebase_admin
-from firebase_admin import credentials, firestore
-from firebase_admin.firestore import Query
+import clients
+from checkpoints import DEFAULT_CHECKPOINT_FILE, CheckpointStore, new_run_id
+from compact_format import FORMAT_VERSION, encode_category_document, encode_news_data
+from context_cache import ContextCache
+from country_codes import country_code, language_code
+from dedup import dedupe_news_data
+from fingerprint import fingerprint_news_data
+from firestore_writer import BufferedFirestoreWriter, when_all_committed
+from grounding import attach_grounded_sources, grounding_metadata_of
+import metrics
+from retry_policy import (Cancelled, CircuitBreaker, EmptyResponseError, MalformedResponseError, RetryPolicy,
+                          StaleCacheError, status_code_of)
+from stream_parser import NewsItemStreamParser
 
 # --- CONFIGURATION (Replace with your actual settings) ---
 GEMINI_API_KEY = "x"
 FIREBASE_PROJECT_ID = "gemini-journalist-8c449"
 
-# --- FIREBASE / GOOGLE CLOUD AUTH SETUP ---
-try:
-    cred = credentials.Certificate("gemini-journalist-8c449-firebase-adminsdk-fbsvc-7bbb8af864.json")
-    firebase_admin.initialize_app(cred)
-except Exception as e:
-    print("Error connecting to Firebase: " + str(e))
-
-db = firestore.client()
-
-# Initialize the Gemini Client
-try:
-    gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-    print("Gemini Client initialized successfully.")
-except Exception as e:
-    print(f"ERROR: Failed to initialize Gemini Client. Ensure your API key is set as an environment variable (GEMINI_API_KEY). {e}")
-    class GeminiClientMock:
-        def models(self): return self
-        def generate_content(self, model, contents, config):
-            print("\n--- MOCK: Gemini API call failed. Returning dummy data. ---")
-            return types.GenerateContentResponse(
-                text='[{"title": "Mock News Title", "summary": "This is a mock summary.", "sources": [{"link_title": "Mock Source", "url": "http://mock.com"}]}]',
-                candidates=[types.Candidate(content=types.Content(parts=[types.Part(text='[{"title": "Mock News Title", "summary": "This is a mock summary.", "sources": [{"link_title": "Mock Source", "url": "http://mock.com"}]}]')]))]
-            )
-    gemini_client = GeminiClientMock()
+# --- CLIENTS ---
+# Firestore and Gemini clients are built on first use (see clients.py), so importing
+# this module needs no credentials. Tests and benchmarks may assign fakes to `db`
+# and `gemini_client` directly; the accessors return whatever is assigned.
+db = None
+gemini_client = None
+
+def get_db():
+    global db
+    if db is None:
+        db = clients.firestore_client()
+    return db
+
+def get_gemini_client():
+    global gemini_client
+    if gemini_client is None:
+        gemini_client = clients.gemini_client(GEMINI_API_KEY)
+    return gemini_client
+
+# Documents and error logs are queued here and committed in batches off the hot path.
+# get_db is looked up on every commit, so `db` can be swapped after import.
+firestore_writer = BufferedFirestoreWriter(get_db)
 
 # Strip links down to their base url
 def get_base_url(url: str):
@@ -57,8 +62,121 @@ def get_base_url(url: str):
         return url
 
 # --- RETRY CONFIGURATION ---
-MAX_RETRIES = 20
-INITIAL_WAIT_TIME = 10 # seconds
+MAX_RETRIES = 8
+INITIAL_WAIT_TIME = 2 # seconds, doubled (with jitter) on every retry
+MAX_WAIT_TIME = 60 # seconds, cap on a single backoff
+CALL_DEADLINE = 300 # seconds, budget for one category query including retries
+ATTEMPT_TIMEOUT = 120 # seconds, cap on one Gemini request (stream included) before it is abandoned and retried
+
+# One breaker for the whole process, so concurrent workers back off together.
+gemini_circuit_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=15)
+retry_policy = RetryPolicy(
+    max_attempts=MAX_RETRIES,
+    base_delay=INITIAL_WAIT_TIME,
+    max_delay=MAX_WAIT_TIME,
+    call_timeout=CALL_DEADLINE,
+    attempt_timeout=ATTEMPT_TIMEOUT,
+    breaker=gemini_circuit_breaker,
+)
+
+# --- CHANGE DETECTION ---
+# Skip writing categories whose content fingerprint matches the last stored one.
+CHANGE_DETECTION = True
+
+# --- COMPACT DOCUMENTS ---
+# Store documents in format_version 2: each distinct source once per document in a
+# source_table, referenced from items by index (see compact_format.py). Turn on once
+# the app version that reads it is out; it still reads version 1 documents.
+COMPACT_DOCUMENTS = False
+
+# --- CROSS-CATEGORY DEDUP ---
+# Replace stories repeated across categories (e.g. Headlines and Politics) with a
+# cross-reference to one canonical copy before storing or translating.
+DEDUP_ACROSS_CATEGORIES = True
+
+# --- STREAMING ---
+# Stream each category response and parse news items as they arrive. Output that
+# goes off-schema is abandoned mid-stream and retried (see stream_parser.py).
+STREAM_RESPONSES = False
+
+# --- CONTEXT CACHING ---
+# Keep each (system instruction, tools) prefix in a Gemini context cache and send
+# only the user query with every call (see context_cache.py). Prefixes below the
+# model's caching minimum are sent inline as before.
+CONTEXT_CACHING = False
+context_cache = ContextCache(get_gemini_client)
+
+# --- GROUNDED SOURCES ---
+# Ask the model for titles and summaries only, and take each item's sources from the
+# Google Search grounding metadata instead of model-written URLs (see grounding.py).
+# Applies to per-category fetches; the single structured call keeps model-written sources.
+GROUNDED_SOURCES = False
+
+# --- CONCURRENCY CONFIGURATION ---
+# Number of category queries allowed in flight at once for a single country/language.
+MAX_CONCURRENT_CATEGORIES = 6
+
+# Base prompt snippet for required source mapping
+SOURCE_SUFFIX = "For each item, provide a concise summary. The summary MUST include links to at least one primary source in the required 'sources' array field."
+
+# System instructions dynamically sizing arrays based on category requirements.
+# {lang} is filled in by system_instruction_for().
+SYSTEM_INSTRUCTION_HEADLINES = (
+    f"You are a helpful news curator. Your task is to provide 10 current individual news stories, if possible. "
+    f"**Your entire response MUST be a single valid JSON structure (with fields title, summary, and sources(link_title, url)) wrapped in ```json ... ``` code fences.** "
+    "Call the JSON news_items. Ensure all output text is in the {lang} language. "
+    f"Use the search tool to find authoritative and up-to-date sources and include them in the 'sources' array. "
+    f"Do not add anything after the base url for the source. For example: https://apnews.com/<DO NOT ADD ANYTHING HERE> "
+    f"Do not use any article that is more than 1 week old."
+)
+
+SYSTEM_INSTRUCTION_CATEGORIES = (
+    f"You are a helpful news curator. Your task is to provide 5 current individual news stories, if possible. "
+    f"**Your entire response MUST be a single valid JSON structure (with fields title, summary, and sources(link_title, url)) wrapped in ```json ... ``` code fences.** "
+    "Call the JSON news_items. Ensure all output text is in the {lang} language. "
+    f"Use the search tool to find authoritative and up-to-date sources and include them in the 'sources' array. "
+    f"Do not add anything after the base url for the source. For example: https://apnews.com/<DO NOT ADD ANYTHING HERE> "
+    f"Do not use any article that is more than 1 week old."
+)
+
+# With GROUNDED_SOURCES the model only writes title and summary; sources come from grounding.
+GROUNDED_SOURCE_SUFFIX = "For each item, provide a concise summary based on the search results you used."
+
+SYSTEM_INSTRUCTION_HEADLINES_GROUNDED = (
+    "You are a helpful news curator. Your task is to provide 10 current individual news stories, if possible. "
+    "**Your entire response MUST be a single valid JSON structure (with fields title and summary) wrapped in ```json ... ``` code fences.** "
+    "Call the JSON news_items. Ensure all output text is in the {lang} language. "
+    "Use the search tool to find authoritative and up-to-date reporting. Do not write out URLs. "
+    "Do not use any article that is more than 1 week old."
+)
+
+SYSTEM_INSTRUCTION_CATEGORIES_GROUNDED = (
+    "You are a helpful news curator. Your task is to provide 5 current individual news stories, if possible. "
+    "**Your entire response MUST be a single valid JSON structure (with fields title and summary) wrapped in ```json ... ``` code fences.** "
+    "Call the JSON news_items. Ensure all output text is in the {lang} language. "
+    "Use the search tool to find authoritative and up-to-date reporting. Do not write out URLs. "
+    "Do not use any article that is more than 1 week old."
+)
+
+def build_category_queries(country: str):
+    """Mapping of Category Name -> Targeted User Query, in display order."""
+    suffix = GROUNDED_SOURCE_SUFFIX if GROUNDED_SOURCES else SOURCE_SUFFIX
+    return {
+        "Headlines": f"What are the top 10 most discussed news items right now for {country}? {suffix}",
+        "Business and Markets": f"What are the top 5 most discussed news items right now for {country} in the world of Business and Markets? {suffix}",
+        "Politics": f"What are the top 5 most discussed news items right now for {country} in the world of Politics? {suffix}",
+        "Art and Culture": f"What are the top 5 most discussed news items right now for {country} in the world of Art and Culture? {suffix}",
+        "Sports": f"What are the top 5 most discussed news items right now for {country} in the world of Sports? {suffix}",
+        "Science and Technology": f"What are the top 5 most discussed news items right now for {country} in the world of Science and Technology? {suffix}"
+    }
+
+def system_instruction_for(category: str, lang: str = "English"):
+    """Match the correct prompt length parameters for a category, in the requested language."""
+    if GROUNDED_SOURCES:
+        template = SYSTEM_INSTRUCTION_HEADLINES_GROUNDED if category == "Headlines" else SYSTEM_INSTRUCTION_CATEGORIES_GROUNDED
+    else:
+        template = SYSTEM_INSTRUCTION_HEADLINES if category == "Headlines" else SYSTEM_INSTRUCTION_CATEGORIES
+    return template.format(lang=lang)
 
 def safe_json_load(text: str):
     """Robustly attempts to extract and decode a JSON object from text."""
@@ -69,161 +187,636 @@ def safe_json_load(text: str):
         json_content = text.strip()
     return json.loads(json_content)
 
-def _fetch_category_data(category_name: str, query: str, system_instruction: str, country: str, lang: str):
-    """Helper function to execute a single Gemini query with retry logic and URL stripping."""
-    config = types.GenerateContentConfig(
-        system_instruction=system_instruction,
-        tools=[{"googleSearch": {}}],
-    )
-
-    current_wait_time = INITIAL_WAIT_TIME
-    response = None
+def _generation_config(system_instruction: str, **config):
+    """
+    GenerateContentConfig with the search tool and system_instruction, or with a
+    cached_content handle holding both when CONTEXT_CACHING is on and the prefix
+    can be cached. Other settings (e.g. a response schema) are passed through.
+    """
+    types = clients.genai_types()
+    tools = [{"googleSearch": {}}]
+    cached_content = context_cache.cached_content_for("gemini-2.5-flash", system_instruction, tools) if CONTEXT_CACHING else None
+    if cached_content:
+        return types.GenerateContentConfig(cached_content=cached_content, **config)
+    return types.GenerateContentConfig(system_instruction=system_instruction, tools=tools, **config)
+
+def _check_cache_error(config, exc: Exception):
+    """Turns an error about a vanished context cache into a retryable StaleCacheError."""
+    cached_content = getattr(config, "cached_content", None)
+    if cached_content and status_code_of(exc) in (403, 404):
+        context_cache.invalidate(cached_content)
+        raise StaleCacheError(f"Context cache {cached_content} is gone: {exc}") from exc
+
+def _fetch_category_data(category_name: str, query: str, system_instruction: str, country: str, lang: str,
+                         cancel_event=None, run_deadline=None, before_attempt=None):
+    """
+    Helper function to execute a single Gemini query with retry logic and URL stripping.
+
+    Retries follow the shared retry_policy. If a cancel_event is given, backoff sleeps
+    wake up as soon as it is set and the helper gives up, so sibling categories can be
+    abandoned quickly. run_deadline (a time.monotonic() value) bounds the whole run;
+    before_attempt is called before every attempt, e.g. to take a rate-limiter token.
+    With STREAM_RESPONSES set, items are parsed as they stream in and an off-schema
+    response is abandoned and retried as soon as it goes wrong.
+    """
+    labels = {"country": country, "language": lang, "category": category_name}
 
-    for attempt in range(MAX_RETRIES):
+    def generate(timeout):
+        config = _generation_config(system_instruction, http_options=clients.gemini_http_options(timeout))
         try:
-            response = gemini_client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=query,
-                config=config,
-            )
-
-            if not response or not response.text:
-                if attempt < MAX_RETRIES - 1:
-                    print(f"⚠️ [{category_name}] Attempt {attempt + 1}/{MAX_RETRIES} failed: No text. Retrying in {current_wait_time}s...")
-                    time.sleep(current_wait_time)
-                    current_wait_time *= 2
-                    continue
-                else:
-                    return None, f"Model returned no text after {MAX_RETRIES} retries."
-            break
-
+            with metrics.timer("gemini_call_seconds", **labels):
+                response = get_gemini_client().models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=query,
+                    config=config,
+                )
         except Exception as e:
-            error_message = str(e)
-            if any(err in error_message for err in ["502", "503", "500"]) and attempt < MAX_RETRIES - 1:
-                print(f"⚠️ [{category_name}] Attempt {attempt + 1}/{MAX_RETRIES} failed with transient error ({error_message[:30]}...). Retrying in {current_wait_time}s...")
-                time.sleep(current_wait_time)
-                current_wait_time *= 2
-            else:
-                return None, error_message
+            _check_cache_error(config, e)
+            raise
+        metrics.record_usage(response, **labels)
+        if not response or not response.text:
+            raise EmptyResponseError("Model returned no text.")
+        metrics.observe("gemini_response_bytes", len(response.text.encode("utf-8")), **labels)
+        return response
+
+    def generate_streamed(timeout):
+        # Items are parsed and validated as they arrive; off-schema output raises
+        # MalformedResponseError mid-stream, which the retry policy retries.
+        # The HTTP timeout bounds each read; the stream as a whole is bounded below.
+        config = _generation_config(system_instruction, http_options=clients.gemini_http_options(timeout))
+        parser = NewsItemStreamParser()
+        start = time.perf_counter()
+        stream = None
+        usage_chunk = None
+        grounding_metadata = None
+        text_parts = []
+        received_bytes = 0
+        try:
+            with metrics.timer("gemini_call_seconds", **labels):
+                stream = get_gemini_client().models.generate_content_stream(
+                    model="gemini-2.5-flash",
+                    contents=query,
+                    config=config,
+                )
+                for chunk in stream:
+                    if time.perf_counter() - start > timeout:
+                        raise TimeoutError(f"Stream still open after {timeout:.0f}s.")
+                    if getattr(chunk, "usage_metadata", None) is not None:
+                        usage_chunk = chunk
+                    grounding_metadata = grounding_metadata_of(chunk) or grounding_metadata
+                    text = chunk.text or ""
+                    received_bytes += len(text.encode("utf-8"))
+                    text_parts.append(text)
+                    # Keep reading once the array has closed: usage and grounding
+                    # metadata only arrive with the final chunk (feed() ignores the rest)
+                    new_items = parser.feed(text)
+                    if new_items and len(new_items) == len(parser.items):
+                        metrics.observe("gemini_first_item_seconds", time.perf_counter() - start, **labels)
+                if not parser.chars_seen:
+                    raise EmptyResponseError("Model returned no text.")
+                parser.close()
+        except MalformedResponseError:
+            metrics.inc("gemini_stream_aborts_total", **labels)
+            metrics.inc("gemini_stream_aborted_chars_total", parser.chars_seen, **labels)
+            raise
+        except Exception as e:
+            _check_cache_error(config, e)
+            raise
+        finally:
+            # Stop paying for the rest of a generation we have stopped reading
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+        metrics.record_usage(usage_chunk, **labels)
+        metrics.observe("gemini_response_bytes", received_bytes, **labels)
+        news_items = {"news_items": parser.items}
+        if GROUNDED_SOURCES:
+            _attach_grounded_sources(news_items, "".join(text_parts), grounding_metadata, labels)
+        return news_items
 
-    if not response or not response.text:
-        return None, "Response empty"
+    try:
+        with metrics.timer("category_fetch_seconds", **labels):
+            response = retry_policy.run(generate_streamed if STREAM_RESPONSES else generate, label=category_name,
+                                        run_deadline=run_deadline, cancel_event=cancel_event,
+                                        before_attempt=before_attempt, labels=labels, timed=True)
+    except Cancelled:
+        metrics.inc("category_fetch_total", outcome="cancelled", **labels)
+        return None, "Cancelled because a sibling category failed."
+    except Exception as e:
+        metrics.inc("category_fetch_total", outcome="error", **labels)
+        return None, str(e)
 
     try:
-        news_items = safe_json_load(response.text)
+        if STREAM_RESPONSES:
+            news_items = response # already parsed and validated item by item
+        else:
+            with metrics.timer("json_parse_seconds", **labels):
+                news_items = safe_json_load(response.text)
+            if GROUNDED_SOURCES and news_items:
+                _attach_grounded_sources(news_items, response.text, grounding_metadata_of(response), labels)
         if not news_items:
+            metrics.inc("category_fetch_total", outcome="empty", **labels)
             return None, "Parsed JSON structure was empty."
 
-        # Strip URLs down to base domains
-        if isinstance(news_items, dict) and 'news_items' in news_items:
-            for item in news_items['news_items']:
-                if 'sources' in item:
-                    for source in item['sources']:
-                        if 'url' in source:
-                            source['url'] = get_base_url(source['url'])
-
+        if not GROUNDED_SOURCES:
+            _strip_source_urls(news_items) # grounded sources are stored as base URLs already
+        metrics.inc("category_fetch_total", outcome="success", **labels)
         return news_items, None
 
     except Exception as e:
+        metrics.inc("json_parse_errors_total", **labels)
+        metrics.inc("category_fetch_total", outcome="parse_error", **labels)
         return None, f"JSON parsing/processing error: {str(e)}"
 
+def _attach_grounded_sources(news_items, text: str, metadata, labels: dict):
+    """Fills in every item's sources from the response's grounding metadata and counts the items left without any."""
+    with metrics.timer("grounding_seconds", **labels):
+        grounded = attach_grounded_sources(news_items, text, metadata)
+    items = len(news_items.get("news_items", [])) if isinstance(news_items, dict) else 0
+    metrics.inc("grounded_items_total", grounded, outcome="sourced", **labels)
+    metrics.inc("grounded_items_total", items - grounded, outcome="unsourced", **labels)
+
+def _strip_source_urls(news_items):
+    """Strip URLs down to base domains, in place."""
+    if isinstance(news_items, dict) and 'news_items' in news_items:
+        for item in news_items['news_items']:
+            if 'sources' in item:
+                for source in item['sources']:
+                    if 'url' in source:
+                        source['url'] = get_base_url(source['url'])
+
+def _news_items_schema():
+    """Typed schema for one category: {news_items: [{title, summary, sources: [{link_title, url}]}]}."""
+    types = clients.genai_types()
+    source_schema = types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "link_title": types.Schema(type=types.Type.STRING),
+            "url": types.Schema(type=types.Type.STRING),
+        },
+        required=["link_title", "url"],
+    )
+    item_schema = types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "title": types.Schema(type=types.Type.STRING),
+            "summary": types.Schema(type=types.Type.STRING),
+            "sources": types.Schema(type=types.Type.ARRAY, items=source_schema),
+        },
+        required=["title", "summary", "sources"],
+        property_ordering=["title", "summary", "sources"],
+    )
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={"news_items": types.Schema(type=types.Type.ARRAY, items=item_schema)},
+        required=["news_items"],
+    )
+
+def build_combined_schema(categories: list):
+    """Response schema with one news_items object per category, in display order."""
+    types = clients.genai_types()
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={category: _news_items_schema() for category in categories},
+        required=list(categories),
+        property_ordering=list(categories),
+    )
+
+def build_combined_query(country: str, categories: list):
+    """Single user query asking for every category at once."""
+    category_list = ", ".join(f"'{category}'" for category in categories)
+    return (
+        f"What are the most discussed news items right now for {country}? "
+        f"Answer separately for each of these categories: {category_list}. "
+        f"Give the top 10 items for 'Headlines' and the top 5 items for every other category. {SOURCE_SUFFIX}"
+    )
+
+# Shared instruction for the single-call mode; the JSON shape comes from the response schema.
+SYSTEM_INSTRUCTION_COMBINED = (
+    "You are a helpful news curator. Your task is to provide current individual news stories for each requested category, if possible. "
+    "Each category holds its stories in news_items, with fields title, summary, and sources(link_title, url). "
+    "Ensure all output text is in the {lang} language. "
+    "Use the search tool to find authoritative and up-to-date sources and include them in the 'sources' array. "
+    "Do not add anything after the base url for the source. For example: https://apnews.com/<DO NOT ADD ANYTHING HERE> "
+    "Do not use any article that is more than 1 week old."
+)
+
+def _is_complete_category(category_data):
+    """A category is usable if it has at least one item with a title and a summary."""
+    if not isinstance(category_data, dict):
+        return False
+    items = category_data.get('news_items')
+    if not isinstance(items, list) or not items:
+        return False
+    return all(isinstance(item, dict) and item.get('title') and item.get('summary') for item in items)
+
+def _fetch_categories_structured(categories_to_fetch: dict, country: str, lang: str, max_workers: int = MAX_CONCURRENT_CATEGORIES):
+    """
+    Asks for every category in one generate_content call with a typed response schema,
+    so the model returns JSON directly and no fence-stripping is needed.
+
+    Any category missing or incomplete in the combined response (or all of them, if the
+    call fails outright) falls back to the per-category path.
+    Returns (consolidated_news_data, failed_category, error_msg).
+    """
+    categories = list(categories_to_fetch.keys())
+    print(f"Fetching all {len(categories)} categories in one structured call...")
+
+    response_schema = build_combined_schema(categories)
+    labels = {"country": country, "language": lang, "category": "All categories"}
+
+    def generate(timeout):
+        config = _generation_config(SYSTEM_INSTRUCTION_COMBINED.format(lang=lang),
+                                    response_mime_type="application/json", response_schema=response_schema,
+                                    http_options=clients.gemini_http_options(timeout))
+        try:
+            with metrics.timer("gemini_call_seconds", **labels):
+                response = get_gemini_client().models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=build_combined_query(country, categories),
+                    config=config,
+                )
+        except Exception as e:
+            _check_cache_error(config, e)
+            raise
+        metrics.record_usage(response, **labels)
+        if not response or not response.text:
+            raise EmptyResponseError("Model returned no text.")
+        metrics.observe("gemini_response_bytes", len(response.text.encode("utf-8")), **labels)
+        return response
+
+    combined = {}
+    try:
+        response = retry_policy.run(generate, label="All categories", labels=labels, timed=True)
+        parsed = getattr(response, 'parsed', None)
+        combined = parsed if isinstance(parsed, dict) else json.loads(response.text)
+    except Exception as e:
+        print(f"⚠️ Structured fetch failed ({str(e)[:60]}). Falling back to per-category queries.")
+
+    consolidated_news_data = {}
+    missing = {}
+    for category, query in categories_to_fetch.items():
+        category_data = combined.get(category) if isinstance(combined, dict) else None
+        if _is_complete_category(category_data):
+            _strip_source_urls(category_data)
+            consolidated_news_data[category] = category_data
+        else:
+            missing[category] = query
+
+    if missing:
+        print(f"⚠️ Structured response incomplete for {list(missing)}. Fetching them individually...")
+        fallback_data, failed_category, error_msg = _fetch_categories_concurrently(missing, country, lang, max_workers)
+        if failed_category:
+            return consolidated_news_data, failed_category, error_msg
+        consolidated_news_data.update(fallback_data)
+
+    # Keep the fixed category order in the stored document
+    consolidated_news_data = {category: consolidated_news_data[category] for category in categories}
+    return consolidated_news_data, None, None
+
+def _fetch_categories(categories_to_fetch: dict, country: str, lang: str, concurrent: bool, max_workers: int, structured: bool):
+    """Dispatches to the structured, concurrent or sequential category fetch."""
+    if structured:
+        return _fetch_categories_structured(categories_to_fetch, country, lang, max_workers)
+    if concurrent:
+        return _fetch_categories_concurrently(categories_to_fetch, country, lang, max_workers)
+    return _fetch_categories_sequentially(categories_to_fetch, country, lang)
+
+def _fetch_with_checkpoint(categories_to_fetch: dict, country: str, lang: str, concurrent: bool, max_workers: int, structured: bool,
+                          checkpoint: CheckpointStore = None, run_id: str = None):
+    """
+    Like _fetch_categories, but skips categories already checkpointed for this run and
+    records every newly fetched category, even when a sibling fails.
+    """
+    done = checkpoint.completed_categories(run_id, country, lang) if checkpoint else {}
+    missing = {category: query for category, query in categories_to_fetch.items() if category not in done}
+    if done:
+        print(f"♻️ Resuming {country} [{lang}]: {len(done)} categories from checkpoint, fetching {len(missing)}.")
+
+    fetched, failed_category, error_msg = ({}, None, None)
+    if missing:
+        fetched, failed_category, error_msg = _fetch_categories(missing, country, lang, concurrent, max_workers, structured)
+
+    if checkpoint:
+        for category, news_items in fetched.items():
+            checkpoint.record_category(run_id, country, lang, category, news_items)
+
+    merged = {**done, **fetched}
+    consolidated_news_data = {category: merged[category] for category in categories_to_fetch if category in merged}
+    return consolidated_news_data, failed_category, error_msg
+
+def _fetch_categories_sequentially(categories_to_fetch: dict, country: str, lang: str):
+    """
+    Runs each category query one after another.
+    Returns (consolidated_news_data, failed_category, error_msg).
+    """
+    consolidated_news_data = {}
+
+    for category, query in categories_to_fetch.items():
+        print(f"Fetching category: {category}...")
+
+        news_items, error_msg = _fetch_category_data(category, query, system_instruction_for(category, lang), country, lang)
+
+        if error_msg:
+            return consolidated_news_data, category, error_msg # Stop at the first category that completely fails
+
+        # Store the nested content directly into our payload dict
+        consolidated_news_data[category] = news_items
+
+    return consolidated_news_data, None, None
+
+def _fetch_categories_concurrently(categories_to_fetch: dict, country: str, lang: str, max_workers: int = MAX_CONCURRENT_CATEGORIES):
+    """
+    Issues every category query at once on a bounded thread pool, so a country/language
+    costs roughly the slowest single category instead of the sum of all of them.
+
+    Results are collected in the fixed order of categories_to_fetch. As soon as one
+    category fails permanently, the siblings are cancelled: queued ones never start and
+    running ones stop at their next retry/backoff point.
+    Returns (consolidated_news_data, failed_category, error_msg).
+    """
+    cancel_event = threading.Event()
+    fetched = {}
+    failed_category, failure_msg = None, None
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"{country}-{lang}")
+    try:
+        futures = {}
+        for category, query in categories_to_fetch.items():
+            print(f"Fetching category: {category}...")
+            future = executor.submit(_fetch_category_data, category, query, system_instruction_for(category, lang), country, lang, cancel_event)
+            futures[future] = category
+
+        for future in as_completed(futures):
+            category = futures[future]
+            try:
+                news_items, error_msg = future.result()
+            except Exception as e:
+                news_items, error_msg = None, f"Unexpected error: {str(e)}"
+
+            if error_msg:
+                failed_category, failure_msg = category, error_msg
+                cancel_event.set()
+                for sibling in futures:
+                    sibling.cancel()
+                break
+
+            fetched[category] = news_items
+    finally:
+        # Don't wait on in-flight siblings; they exit on their own once cancel_event is set.
+        executor.shutdown(wait=False, cancel_futures=True)
 
-def fetch_and_store_news(country: str, languages: list):
+    consolidated_news_data = {category: fetched[category] for category in categories_to_fetch if category in fetched}
+    return consolidated_news_data, failed_category, failure_msg
+
+
+def fetch_and_store_news(country: str, languages: list, concurrent: bool = True, max_workers: int = MAX_CONCURRENT_CATEGORIES,
+                         translate_from: str = None, structured: bool = False,
+                         checkpoint: CheckpointStore = None, run_id: str = None):
     """
     Fetches news across multiple categories (including Headlines) using Gemini Search grounding,
     combines them into a single payload, and writes it once to Firestore per language.
+
+    With concurrent=True (the default) all categories for a language are requested at once,
+    with at most max_workers queries in flight; concurrent=False keeps the sequential behaviour.
+
+    With translate_from set (e.g. "English"), the categories are only fetched once in that
+    language and every other language is produced by bulk machine translation.
+
+    With structured=True, all categories are requested in a single call with a typed
+    response schema, falling back to per-category queries for anything incomplete.
+
+    With a checkpoint store, every fetched category is recorded under run_id; running
+    again with the same run_id only fetches what is missing and skips written documents.
     """
     results = {}
 
+    if translate_from:
+        return _fetch_once_translate_many(country, languages, translate_from, concurrent, max_workers, structured, checkpoint, run_id)
+
     for lang in languages:
         print(f"\n========================================================")
         print(f"STARTING COMPREHENSIVE NEWS FETCH FOR '{country}' [{lang}]")
         print(f"========================================================")
 
-        # Base prompt snippet for required source mapping
-        source_suffix = "For each item, provide a concise summary. The summary MUST include links to at least one primary source in the required 'sources' array field."
-
-        # Mapping of Category Name -> Targeted User Query
-        categories_to_fetch = {
-            "Headlines": f"What are the top 10 most discussed news items right now for {country}? {source_suffix}",
-            "Business and Markets": f"What are the top 5 most discussed news items right now for {country} in the world of Business and Markets? {source_suffix}",
-            "Politics": f"What are the top 5 most discussed news items right now for {country} in the world of Politics? {source_suffix}",
-            "Art and Culture": f"What are the top 5 most discussed news items right now for {country} in the world of Art and Culture? {source_suffix}",
-            "Sports": f"What are the top 5 most discussed news items right now for {country} in the world of Sports? {source_suffix}",
-            "Science and Technology": f"What are the top 5 most discussed news items right now for {country} in the world of Science and Technology? {source_suffix}"
-        }
+        if checkpoint and checkpoint.written_doc_id(run_id, country, lang):
+            doc_id = checkpoint.written_doc_id(run_id, country, lang)
+            print(f"♻️ Already written in run {run_id}. Document ID: {doc_id}")
+            results[lang] = {"status": "success", "doc_id": doc_id, "resumed": True}
+            continue
 
-        # System instructions dynamically sizing arrays based on category requirements
-        system_instruction_headlines = (
-            f"You are a helpful news curator. Your task is to provide 10 current individual news stories, if possible. "
-            f"**Your entire response MUST be a single valid JSON structure (with fields title, summary, and sources(link_title, url)) wrapped in ```json ... ``` code fences.** "
-            f"Call the JSON news_items. Ensure all output text is in the English language. "
-            f"Use the search tool to find authoritative and up-to-date sources and include them in the 'sources' array. "
-            f"Do not add anything after the base url for the source. For example: https://apnews.com/<DO NOT ADD ANYTHING HERE> "
-            f"Do not use any article that is more than 1 week old."
-        )
-
-        system_instruction_categories = (
-            f"You are a helpful news curator. Your task is to provide 5 current individual news stories, if possible. "
-            f"**Your entire response MUST be a single valid JSON structure (with fields title, summary, and sources(link_title, url)) wrapped in ```json ... ``` code fences.** "
-            f"Call the JSON news_items. Ensure all output text is in the English language. "
-            f"Use the search tool to find authoritative and up-to-date sources and include them in the 'sources' array. "
-            f"Do not add anything after the base url for the source. For example: https://apnews.com/<DO NOT ADD ANYTHING HERE> "
-            f"Do not use any article that is more than 1 week old."
-        )
-
-        consolidated_news_data = {}
-        has_failed_category = False
-
-        # Loop through each category sequentially
-        for category, query in categories_to_fetch.items():
-            print(f"Fetching category: {category}...")
+        categories_to_fetch = build_category_queries(country)
 
-            # Match the correct prompt length parameters
-            sys_instruction = system_instruction_headlines if category == "Headlines" else system_instruction_categories
+        consolidated_news_data, failed_category, error_msg = _fetch_with_checkpoint(categories_to_fetch, country, lang, concurrent, max_workers, structured, checkpoint, run_id)
 
-            news_items, error_msg = _fetch_category_data(category, query, sys_instruction, country, lang)
+        if failed_category:
+            print(f"❌ Error during category '{failed_category}': {error_msg}")
+            log_query_error_to_firestore(country, lang, f"Category [{failed_category}] failed: {error_msg}")
+            results[lang] = {"status": "error", "message": "One or more categories failed to gather completely."}
+            continue
 
-            if error_msg:
-                print(f"❌ Error during category '{category}': {error_msg}")
-                log_query_error_to_firestore(country, lang, f"Category [{category}] failed: {error_msg}")
-                has_failed_category = True
-                break # Break out of category loop for this language if a query completely fails
+        results[lang] = store_consolidated_news(country, lang, dedupe_categories(consolidated_news_data),
+                                                on_written=checkpoint_on_written(checkpoint, run_id, country, lang))
 
-            # Store the nested content directly into our payload dict
-            consolidated_news_data[category] = news_items
+    return results
 
-        if has_failed_category:
-            results[lang] = {"status": "error", "message": "One or more categories failed to gather completely."}
-            continue
+def _fetch_once_translate_many(country: str, languages: list, source_language: str, concurrent: bool, max_workers: int, structured: bool,
+                               checkpoint: CheckpointStore = None, run_id: str = None):
+    """Pipeline mode for fetch_and_store_news: one grounded fetch, then one translation pass per language."""
+    results = {}
 
-        try:
-            # Language localization identifier adjustment
-            lang_code = "en" if lang == "English" else ("es" if lang == "Spanish" else lang)
-
-            # Structure our single, comprehensive firestore document
-            firestore_payload = {
-                "country": country,
-                "language": lang_code,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "news_data": consolidated_news_data
-            }
+    print(f"\n========================================================")
+    print(f"STARTING COMPREHENSIVE NEWS FETCH FOR '{country}' [{source_language}], TRANSLATING TO {languages}")
+    print(f"========================================================")
 
-            # Write once to Firestore
-            doc_ref = db.collection("news_summaries").add(firestore_payload)
-            doc_id = doc_ref[1].id if isinstance(doc_ref, tuple) else doc_ref
+    categories_to_fetch = build_category_queries(country)
+    consolidated_news_data, failed_category, error_msg = _fetch_with_checkpoint(categories_to_fetch, country, source_language, concurrent, max_workers, structured, checkpoint, run_id)
 
-            print(f"✅ Document complete! Successfully wrote all combined metrics to Firestore. ID: {doc_id}")
-            results[lang] = {"status": "success", "doc_id": doc_id, "categories_included": list(consolidated_news_data.keys())}
+    if failed_category:
+        print(f"❌ Error during category '{failed_category}': {error_msg}")
+        log_query_error_to_firestore(country, source_language, f"Category [{failed_category}] failed: {error_msg}")
+        for lang in languages:
+            results[lang] = {"status": "error", "message": f"Source fetch in {source_language} failed."}
+        return results
 
+    return store_translated_news(country, languages, source_language, consolidated_news_data, checkpoint, run_id)
+
+def store_translated_news(country: str, languages: list, source_language: str, consolidated_news_data: dict,
+                          checkpoint: CheckpointStore = None, run_id: str = None):
+    """
+    Writes consolidated_news_data (fetched in source_language) once per language,
+    machine-translating it for every language other than the source. Cross-category
+    duplicates are removed first, so they are not translated either.
+    Languages already written under run_id in the checkpoint store are skipped.
+    """
+    from gcloud_translate import translate_news_data # deferred: pulls in the Cloud Function framework
+    results = {}
+    source_code = language_code(source_language)
+    consolidated_news_data = dedupe_categories(consolidated_news_data)
+
+    for lang in languages:
+        if checkpoint and checkpoint.written_doc_id(run_id, country, lang):
+            results[lang] = {"status": "success", "doc_id": checkpoint.written_doc_id(run_id, country, lang), "resumed": True}
+            continue
+
+        target_code = language_code(lang)
+        if target_code == source_code:
+            results[lang] = store_consolidated_news(country, lang, consolidated_news_data,
+                                                    on_written=checkpoint_on_written(checkpoint, run_id, country, lang))
+            continue
+
+        try:
+            translated_news_data = translate_news_data(consolidated_news_data, target_code, source_code)
         except Exception as e:
-            error_msg = f"Firestore Write Failure: {str(e)}"
+            error_msg = f"Translation to {lang} failed: {str(e)}"
             print(f"❌ {error_msg}")
             log_query_error_to_firestore(country, lang, error_msg)
             results[lang] = {"status": "error", "message": error_msg}
+            continue
+
+        results[lang] = store_consolidated_news(country, lang, translated_news_data,
+                                                on_written=checkpoint_on_written(checkpoint, run_id, country, lang))
 
     return results
 
+def checkpoint_on_written(checkpoint: CheckpointStore, run_id: str, country: str, lang: str):
+    """on_written callback for store_consolidated_news that records the document in the checkpoint store."""
+    if not checkpoint:
+        return None
+    return lambda doc_id: checkpoint.record_written(run_id, country, lang, doc_id)
+
+def dedupe_categories(consolidated_news_data: dict):
+    """Applies cross-category near-duplicate elimination if DEDUP_ACROSS_CATEGORIES is on."""
+    if not DEDUP_ACROSS_CATEGORIES:
+        return consolidated_news_data
+    deduped, stats = dedupe_news_data(consolidated_news_data)
+    if stats["removed"]:
+        print(f"🧹 Merged {stats['removed']} duplicate stories across categories into {stats['clusters']} canonical copies.")
+    return deduped
+
+def latest_doc_id(country: str, lang: str):
+    """Deterministic ID of the materialized latest/{country}_{language} document."""
+    return f"{country_code(country)}_{language_code(lang)}"
+
+def _load_latest_state(latest_id: str):
+    """Reads the fingerprints and per-category snapshot IDs stored on the latest document."""
+    try:
+        snapshot = get_db().collection("latest").document(latest_id).get()
+        if snapshot.exists:
+            data = snapshot.to_dict() or {}
+            return data.get("fingerprints", {}), data.get("category_snapshots", {})
+    except Exception as e:
+        print(f"⚠️ Could not read previous fingerprints for {latest_id}: {e}")
+    return {}, {}
+
+def store_consolidated_news(country: str, lang: str, consolidated_news_data: dict, on_written=None):
+    """
+    Writes one complete multi-category document to Firestore and returns its result entry.
+
+    The snapshot is appended to news_summaries as before. Alongside it, the
+    latest/{country}_{language} document and one latest/{id}/categories/{category}
+    subdocument per category are overwritten, so the app can read the current
+    news for a category with a single document get instead of a query.
+
+    With CHANGE_DETECTION on, each category is fingerprinted and compared with the
+    fingerprint stored on the latest document. Unchanged categories are stored in the
+    snapshot as a reference to the snapshot that holds their content, and their latest
+    subdocuments are left untouched. If nothing changed, no snapshot is written at all.
+
+    With COMPACT_DOCUMENTS on, the snapshot and the category subdocuments are
+    written in the compact format_version 2 encoding (see compact_format.py).
+
+    on_written(doc_id), if given, is called from the Firestore writer thread once
+    every write queued here has committed (never if one of them fails), so a
+    checkpoint is only recorded for documents that are really stored.
+    """
+    try:
+        timestamp = datetime.now(timezone.utc).isoformat()
+        latest_id = latest_doc_id(country, lang)
+
+        fingerprints = fingerprint_news_data(consolidated_news_data)
+        previous_fingerprints, category_snapshots = _load_latest_state(latest_id) if CHANGE_DETECTION else ({}, {})
+        unchanged = [
+            category for category in consolidated_news_data
+            if previous_fingerprints.get(category) == fingerprints[category] and category in category_snapshots
+        ]
+
+        if unchanged and len(unchanged) == len(consolidated_news_data):
+            doc_id = category_snapshots[unchanged[0]]
+            firestore_writer.set("latest", latest_id, {"checked_at": timestamp}, merge=True,
+                                 on_commit=(lambda: on_written(doc_id)) if on_written else None)
+            print(f"⏭️ No changes for {country} [{lang}]; skipped the snapshot write.")
+            return {"status": "success", "unchanged": True, "doc_id": doc_id,
+                    "categories_included": list(consolidated_news_data.keys())}
+
+        # Allocate the snapshot ID up front so changed categories can point at it
+        doc_id = get_db().collection("news_summaries").document().id
+        changed = [category for category in consolidated_news_data if category not in unchanged]
+        # The snapshot, one subdocument per changed category and the latest document
+        on_commit = when_all_committed(len(changed) + 2, lambda: on_written(doc_id)) if on_written else None
+
+        news_data = {}
+        for category, category_data in consolidated_news_data.items():
+            if category in unchanged:
+                news_data[category] = {"ref": category_snapshots[category], "fingerprint": fingerprints[category]}
+            else:
+                news_data[category] = category_data
+                category_snapshots[category] = doc_id
+
+        # Structure our single, comprehensive firestore document.
+        # The app looks documents up by ISO country code and Translate language code.
+        firestore_payload = {
+            "country": country_code(country),
+            "language": language_code(lang),
+            "timestamp": timestamp,
+            "news_data": news_data,
+            "fingerprints": fingerprints,
+        }
+        if COMPACT_DOCUMENTS:
+            firestore_payload["news_data"], firestore_payload["source_table"] = encode_news_data(news_data)
+            firestore_payload["format_version"] = FORMAT_VERSION
+
+        # Write once to Firestore (queued; committed in the next batch)
+        firestore_writer.set("news_summaries", doc_id, firestore_payload, on_commit=on_commit)
+
+        # Materialize the latest view for point lookups; unchanged categories keep their subdocument
+        for category in changed:
+            category_data = consolidated_news_data[category]
+            category_document = {
+                "category": category,
+                "news_items": category_data.get("news_items", []) if isinstance(category_data, dict) else [],
+                "cross_references": category_data.get("cross_references", []) if isinstance(category_data, dict) else [],
+                "timestamp": timestamp,
+                "snapshot_id": doc_id,
+                "fingerprint": fingerprints[category],
+            }
+            if COMPACT_DOCUMENTS:
+                category_document["news_items"], category_document["source_table"] = encode_category_document(category_document)
+                category_document["format_version"] = FORMAT_VERSION
+            firestore_writer.set(f"latest/{latest_id}/categories", category, category_document, on_commit=on_commit)
+        firestore_writer.set("latest", latest_id, {
+            "country": firestore_payload["country"],
+            "language": firestore_payload["language"],
+            "timestamp": timestamp,
+            "checked_at": timestamp,
+            "snapshot_id": doc_id,
+            "categories": list(consolidated_news_data.keys()),
+            "fingerprints": fingerprints,
+            "category_snapshots": {category: category_snapshots[category] for category in consolidated_news_data},
+        }, on_commit=on_commit)
+
+        if unchanged:
+            print(f"⏭️ Unchanged categories stored as references: {unchanged}")
+        print(f"✅ Document complete! Queued combined metrics for Firestore. ID: {doc_id}")
+        return {"status": "success", "doc_id": doc_id, "categories_included": list(consolidated_news_data.keys()),
+                "unchanged_categories": unchanged}
+
+    except Exception as e:
+        error_msg = f"Firestore Write Failure: {str(e)}"
+        print(f"❌ {error_msg}")
+        log_query_error_to_firestore(country, lang, error_msg)
+        return {"status": "error", "message": error_msg}
+
 def log_query_error_to_firestore(country, lang, error_message):
     """Logs persistent errors into a isolated collection."""
     try:
@@ -234,8 +827,8 @@ def log_query_error_to_firestore(country, lang, error_message):
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "status": "persistent_failure"
         }
-        db.collection("gemini_query_errors").add(error_data)
-        print(f"⚠️ Error trace appended to Firebase logs.")
+        firestore_writer.add("gemini_query_errors", error_data)
+        print(f"⚠️ Error trace queued for Firebase logs.")
     except Exception as firestore_e:
         print(f"❌ Failed to log error to Firestore: {firestore_e}")
 
@@ -244,12 +837,39 @@ if __name__ == '__main__':
     COUNTRY_TO_SEARCH = "US"
     TARGET_LANGUAGES = ["English"]
 
-    print(f"Starting aggregated category fetcher for {COUNTRY_TO_SEARCH} in {TARGET_LANGUAGES}...")
+    parser = argparse.ArgumentParser(description="Fetch and store categorized news for one country.")
+    parser.add_argument("--resume", action="store_true", help="Continue a previous run, re-fetching only missing categories.")
+    parser.add_argument("--run-id", help="Run to resume (defaults to the last run in the checkpoint file).")
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE)
+    parser.add_argument("--metrics-out", help="Write run metrics here: Prometheus text for .prom/.txt, a JSON report otherwise.")
+    parser.add_argument("--stream", action="store_true", help="Stream responses and parse news items as they arrive.")
+    parser.add_argument("--context-cache", action="store_true", help="Send the shared system instructions through Gemini context caches.")
+    parser.add_argument("--grounded-sources", action="store_true", help="Take sources from search grounding metadata instead of the model's output.")
+    parser.add_argument("--compact-documents", action="store_true", help="Store documents in the compact format_version 2 encoding.")
+    args = parser.parse_args()
+    STREAM_RESPONSES = args.stream
+    CONTEXT_CACHING = args.context_cache
+    GROUNDED_SOURCES = args.grounded_sources
+    COMPACT_DOCUMENTS = args.compact_documents
+
+    checkpoint = CheckpointStore(args.checkpoint_file)
+    run_id = (args.run_id or checkpoint.last_run_id()) if args.resume else new_run_id()
+    if not run_id:
+        run_id = new_run_id()
+
+    print(f"Starting aggregated category fetcher for {COUNTRY_TO_SEARCH} in {TARGET_LANGUAGES} (run {run_id})...")
 
     final_results = fetch_and_store_news(
         country=COUNTRY_TO_SEARCH,
-        languages=TARGET_LANGUAGES
+        languages=TARGET_LANGUAGES,
+        checkpoint=checkpoint,
+        run_id=run_id
     )
+    firestore_writer.flush()
+    firestore_writer.mark_failed_writes(final_results)
+    context_cache.close()
+    if args.metrics_out:
+        metrics.write_report(args.metrics_out)
 
     print("\n\nRUN SUMMARY:")
     print(json.dumps(final_results, indent=2))
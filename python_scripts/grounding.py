@@ -0,0 +1,137 @@
+# grounding.py
+#
+# Attaches news item sources from a response's Google Search grounding
+# metadata instead of having the model write them out.
+#
+# A grounded response carries, per candidate:
+#
+#   grounding_chunks    the web results the answer used: web.uri (a redirect
+#                       URL), web.title (usually the site's domain) and, on
+#                       some backends, web.domain
+#   grounding_supports  byte ranges of the response text (segment.start_index /
+#                       end_index), each with the grounding_chunk_indices that
+#                       back it
+#
+# Each chunk is resolved to a {link_title, url} source once per response, with
+# the url already reduced to https://<domain> the way get_base_url would.
+# Each item is then located in the response text (its title through its
+# summary), and the chunks cited by every support overlapping that span become
+# its sources, deduplicated by domain, in citation order. The result has the
+# same sources schema as model-written output.
+
+import json
+import re
+from urllib.parse import urlparse
+
+MAX_SOURCES_PER_ITEM = 3
+
+# A bare hostname such as "apnews.com" or "www.bbc.co.uk"
+HOSTNAME = re.compile(r'^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,}$', re.IGNORECASE)
+
+
+def grounding_metadata_of(response):
+    """The first candidate's grounding_metadata, or None."""
+    candidates = getattr(response, "candidates", None) or []
+    return getattr(candidates[0], "grounding_metadata", None) if candidates else None
+
+
+def _domain_of(web):
+    """Normalized domain of one grounding chunk's web result, or None."""
+    for candidate in (getattr(web, "domain", None), getattr(web, "title", None)):
+        if candidate and HOSTNAME.match(candidate.strip()):
+            return candidate.strip().lower().removeprefix("www.")
+    uri = getattr(web, "uri", None)
+    netloc = urlparse(uri).netloc if uri else ""
+    # Grounding URIs are usually redirects through a Google host; those say nothing about the site
+    if not netloc or netloc.endswith("vertexaisearch.cloud.google.com"):
+        return None
+    return netloc.lower().removeprefix("www.")
+
+
+def resolve_chunks(metadata):
+    """One {link_title, url} source (or None if unresolvable) per grounding chunk, by index."""
+    sources = []
+    for chunk in getattr(metadata, "grounding_chunks", None) or []:
+        web = getattr(chunk, "web", None)
+        domain = _domain_of(web) if web is not None else None
+        if domain is None:
+            sources.append(None)
+            continue
+        title = getattr(web, "title", None) or domain
+        sources.append({"link_title": title.removeprefix("www."), "url": f"https://{domain}"})
+    return sources
+
+
+def _supports(metadata):
+    """(start_byte, end_byte, chunk_indices) per grounding support, sorted by start."""
+    supports = []
+    for support in getattr(metadata, "grounding_supports", None) or []:
+        segment = getattr(support, "segment", None)
+        indices = getattr(support, "grounding_chunk_indices", None) or []
+        if segment is None or not indices:
+            continue
+        supports.append((getattr(segment, "start_index", None) or 0, getattr(segment, "end_index", None) or 0, list(indices)))
+    return sorted(supports, key=lambda support: support[0])
+
+
+def _find(text: str, value: str, start: int):
+    """
+    (position, length) of value as a JSON string in text, at or after start,
+    whichever way the model escaped it. (-1, 0) if absent.
+    """
+    if not value:
+        return -1, 0
+    for form in (json.dumps(value, ensure_ascii=False), json.dumps(value), f'"{value}"'):
+        position = text.find(form, start)
+        if position != -1:
+            return position, len(form)
+    return -1, 0
+
+
+def item_spans(text: str, items: list):
+    """Byte range (start, end) of each item's title through summary in text, or None if not found."""
+    spans = []
+    cursor = cursor_bytes = 0
+    for item in items:
+        title_at, _ = _find(text, item.get("title", ""), cursor)
+        summary_at, summary_length = _find(text, item.get("summary", ""), title_at if title_at != -1 else cursor)
+        if summary_at == -1:
+            spans.append(None)
+            continue
+        start = title_at if title_at != -1 else summary_at
+        end = summary_at + summary_length
+        # Byte offsets are counted from the previous item on, so the text is encoded once overall
+        start_bytes = cursor_bytes + len(text[cursor:start].encode("utf-8"))
+        end_bytes = start_bytes + len(text[start:end].encode("utf-8"))
+        spans.append((start_bytes, end_bytes))
+        cursor, cursor_bytes = end, end_bytes
+    return spans
+
+
+def attach_grounded_sources(news_items, text: str, metadata, max_sources: int = MAX_SOURCES_PER_ITEM):
+    """
+    Sets every item's 'sources' from the grounding metadata, in place. Items no
+    support points at get an empty list. Returns the number of items that got
+    at least one source.
+    """
+    items = news_items.get("news_items", []) if isinstance(news_items, dict) else []
+    sources = resolve_chunks(metadata) if metadata is not None else []
+    supports = _supports(metadata) if metadata is not None else []
+
+    grounded = 0
+    for item, span in zip(items, item_spans(text or "", items)):
+        item_sources, seen = [], set()
+        if span is not None:
+            for start, end, indices in supports:
+                if start >= span[1]:
+                    break
+                if end <= span[0]:
+                    continue
+                for index in indices:
+                    source = sources[index] if 0 <= index < len(sources) else None
+                    if source is not None and source["url"] not in seen and len(item_sources) < max_sources:
+                        seen.add(source["url"])
+                        item_sources.append(dict(source))
+        item["sources"] = item_sources
+        grounded += bool(item_sources)
+    return grounded
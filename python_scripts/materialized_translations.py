@@ -0,0 +1,348 @@
+# materialized_translations.py
+#
+# Pre-materialized translations of the English news for the most requested
+# languages.
+#
+# The translate Cloud Function counts requests per target language
+# (RequestCounter). After a sweep, run_stage picks the top-K languages from
+# those counts over the last REQUEST_WINDOW_DAYS, translates every current
+# English news_summaries snapshot into each of them, and stores the result
+# under a deterministic key:
+#
+#   translated_news/{snapshot_id}_{target}
+#       snapshot_id, country, source_language, language, timestamp (the
+#       snapshot's), translated_at, news_data in the snapshot's shape; a
+#       category the snapshot holds as a {"ref": id} placeholder stays a
+#       placeholder pointing at translated_news/{id}_{target}, which the stage
+#       also writes. With compact documents on, news_data is stored in the
+#       format_version 2 encoding (compact_format.py).
+#   translated_news_config/languages
+#       {languages, source_language, updated_at}: the set the function serves
+#       from storage
+#   translation_request_counts/{day}_{instance}
+#       {day, instance, counts: {target: requests}}, one document per function
+#       instance and UTC day, written with absolute counts so instances never
+#       contend for a document and a repeated flush is harmless. Counts are
+#       written from a background thread and at interpreter exit, never on a
+#       request thread
+#
+# A request that names its snapshot_id and category in a materialized language
+# is answered with a single document read (MaterializedTranslations.lookup);
+# everything else, and any miss, falls back to live translation. The stage is
+# idempotent: translations that already exist are not redone, and strings are
+# translated through the function's content-addressed translation cache.
+#
+# Usage: python materialized_translations.py --top-k 5
+#        python materialized_translations.py --languages es fr de --snapshot-ids abc123
+
+import argparse
+import atexit
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import clients
+import metrics
+from compact_format import FORMAT_VERSION, decode_news_data, encode_news_data
+from firestore_writer import BufferedFirestoreWriter
+
+# --- MATERIALIZATION CONFIGURATION ---
+DEFAULT_TOP_K = 5                 # languages pre-translated after each sweep
+REQUEST_WINDOW_DAYS = 7           # request counts this far back decide the top-K
+SOURCE_LANGUAGE = "en"            # snapshots in this language are the ones translated
+MAX_WORKERS = 8                   # snapshots translated at once
+COUNT_FLUSH_SECONDS = 60          # how often a function instance writes its request counts
+LANGUAGES_TTL_SECONDS = 600       # how long a function instance trusts its copy of the language set
+
+TRANSLATIONS = "translated_news"
+CONFIG = "translated_news_config"
+CONFIG_DOC = "languages"
+REQUEST_COUNTS = "translation_request_counts"
+SNAPSHOTS = "news_summaries"
+LATEST = "latest"
+
+
+def materialized_key(snapshot_id: str, target_language: str):
+    """Deterministic ID of a snapshot's stored translation."""
+    return f"{snapshot_id}_{target_language}"
+
+
+def _utc_day(when: float):
+    return datetime.fromtimestamp(when, timezone.utc).date().isoformat()
+
+
+# --- FUNCTION SIDE ---
+
+class RequestCounter:
+    """
+    Tally of translation requests by target language, kept in memory. record()
+    only updates the tally; a background thread, started by the first record(),
+    writes it to translation_request_counts every flush_seconds, and close()
+    (also run at interpreter exit, e.g. when an instance is scaled down) writes
+    it once more. With an infinite flush_seconds only explicit flush() calls
+    write. Thread-safe; a failed flush is logged and retried with the next one.
+    """
+
+    def __init__(self, db_getter, flush_seconds: float = COUNT_FLUSH_SECONDS, instance_id: str = None, clock=time.time):
+        self.db_getter = db_getter
+        self.flush_seconds = flush_seconds
+        self.instance_id = instance_id or uuid.uuid4().hex[:12]
+        self.clock = clock
+        self._counts = {}   # UTC day -> Counter of target languages
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # one flush at a time, so an older tally never overwrites a newer one
+        self._stop = threading.Event()
+        self._thread = None
+        atexit.register(self.close)
+
+    def record(self, target_language: str):
+        now = self.clock()
+        with self._lock:
+            self._counts.setdefault(_utc_day(now), Counter())[target_language] += 1
+            start = self._thread is None and math.isfinite(self.flush_seconds) and not self._stop.is_set()
+            if start:
+                self._thread = threading.Thread(target=self._run, name="request-counter", daemon=True)
+        if start:
+            self._thread.start()
+
+    def close(self):
+        """Stops the background thread and writes whatever was recorded since the last flush."""
+        self._stop.set()
+        with self._lock:
+            pending = bool(self._counts)
+        if pending:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            counts = {day: dict(counter) for day, counter in self._counts.items()}
+        today = _utc_day(self.clock())
+        try:
+            collection = self.db_getter().collection(REQUEST_COUNTS)
+            for day, day_counts in counts.items():
+                collection.document(f"{day}_{self.instance_id}").set({
+                    "day": day,
+                    "instance": self.instance_id,
+                    "counts": day_counts,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                })
+        except Exception as e:
+            logging.warning(f"Could not write translation request counts: {e}")
+            return False
+        with self._lock:
+            # Past days will not change any more and were just written in full
+            for day in [day for day in self._counts if day < today]:
+                del self._counts[day]
+        return True
+
+
+class MaterializedTranslations:
+    """Function-side reader for translated_news. Thread-safe."""
+
+    def __init__(self, db_getter, languages_ttl: float = LANGUAGES_TTL_SECONDS, clock=time.monotonic):
+        self.db_getter = db_getter
+        self.languages_ttl = languages_ttl
+        self.clock = clock
+        self._languages = frozenset()
+        self._languages_read_at = None
+        self._lock = threading.Lock()
+
+    def languages(self):
+        """The materialized language set, re-read from translated_news_config every languages_ttl seconds."""
+        with self._lock:
+            if self._languages_read_at is not None and self.clock() - self._languages_read_at < self.languages_ttl:
+                return self._languages
+            self._languages_read_at = self.clock()
+        try:
+            snapshot = self.db_getter().collection(CONFIG).document(CONFIG_DOC).get()
+            languages = frozenset((snapshot.to_dict() or {}).get("languages", [])) if snapshot.exists else frozenset()
+        except Exception as e:
+            logging.warning(f"Could not read the materialized language set, keeping the previous one: {e}")
+            return self._languages
+        with self._lock:
+            self._languages = languages
+        return languages
+
+    def lookup(self, snapshot_id: str, category: str, target_language: str):
+        """
+        The stored translation of one category of a snapshot, as a list of news
+        items, or None if it was not materialized (the caller translates live).
+        A {"ref": ...} placeholder is followed once, to the snapshot holding the content.
+        """
+        if target_language not in self.languages():
+            return None
+        collection = self.db_getter().collection(TRANSLATIONS)
+        for _ in range(2):
+            snapshot = collection.document(materialized_key(snapshot_id, target_language)).get()
+            if not snapshot.exists:
+                return None
+            category_data = decode_news_data(snapshot.to_dict() or {}).get(category)
+            if not isinstance(category_data, dict):
+                return None
+            if "news_items" in category_data:
+                return category_data["news_items"]
+            snapshot_id = category_data.get("ref")
+            if not snapshot_id:
+                return None
+        return None
+
+
+# --- POST-SWEEP STAGE ---
+
+def top_languages(db, k: int = DEFAULT_TOP_K, window_days: int = REQUEST_WINDOW_DAYS, exclude=(), now: datetime = None):
+    """The k most requested target languages over the last window_days UTC days, and all of their totals."""
+    now = now or datetime.now(timezone.utc)
+    first_day = (now - timedelta(days=window_days)).date().isoformat()
+    totals = Counter()
+    for snapshot in db.collection(REQUEST_COUNTS).where("day", ">=", first_day).stream():
+        totals.update((snapshot.to_dict() or {}).get("counts", {}))
+    ranked = sorted((language for language in totals if language not in exclude), key=lambda language: (-totals[language], language))
+    return ranked[:k], dict(totals)
+
+
+def current_snapshots(db, source_language: str = SOURCE_LANGUAGE):
+    """IDs of the snapshots the latest documents in source_language point at: the newest one and every category's content holder."""
+    snapshot_ids = set()
+    for snapshot in db.collection(LATEST).where("language", "==", source_language).stream():
+        data = snapshot.to_dict() or {}
+        snapshot_ids.update((data.get("category_snapshots") or {}).values())
+        if data.get("snapshot_id"):
+            snapshot_ids.add(data["snapshot_id"])
+    return sorted(snapshot_ids)
+
+
+def materialize_snapshot(db, writer: BufferedFirestoreWriter, snapshot_id: str, languages: list,
+                         source_language: str = SOURCE_LANGUAGE, compact: bool = False):
+    """
+    Writes the missing translations of one snapshot. Returns ({language: outcome},
+    referenced snapshot IDs); outcome is written, exists, failed or not_source.
+    """
+    from gcloud_translate import translate_news_data # deferred: pulls in the Cloud Function framework
+    collection = db.collection(TRANSLATIONS)
+    missing = [language for language in languages
+               if not collection.document(materialized_key(snapshot_id, language)).get().exists]
+    outcomes = {language: "exists" for language in languages if language not in missing}
+    if not missing:
+        return outcomes, set()
+
+    snapshot = db.collection(SNAPSHOTS).document(snapshot_id).get()
+    data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    if data.get("language") != source_language:
+        return {**outcomes, **{language: "not_source" for language in missing}}, set()
+
+    news_data = decode_news_data(data)
+    content = {category: category_data for category, category_data in news_data.items()
+               if isinstance(category_data, dict) and "news_items" in category_data}
+    refs = {category: category_data["ref"] for category, category_data in news_data.items()
+            if isinstance(category_data, dict) and category_data.get("ref")}
+
+    for language in missing:
+        try:
+            with metrics.timer("materialize_seconds", language=language):
+                translated = translate_news_data(content, language, source_language)
+        except Exception as e:
+            print(f"❌ Translating snapshot {snapshot_id} to {language} failed: {e}")
+            outcomes[language] = "failed"
+            continue
+        # Keep the snapshot's category order, with placeholders where it has them
+        translated_news = {category: translated[category] if category in content else {"ref": refs[category]}
+                           for category in news_data if category in content or category in refs}
+        payload = {
+            "snapshot_id": snapshot_id,
+            "country": data.get("country"),
+            "source_language": source_language,
+            "language": language,
+            "timestamp": data.get("timestamp"),
+            "translated_at": datetime.now(timezone.utc).isoformat(),
+            "news_data": translated_news,
+        }
+        if compact:
+            payload["news_data"], payload["source_table"] = encode_news_data(translated_news)
+            payload["format_version"] = FORMAT_VERSION
+        writer.set(TRANSLATIONS, materialized_key(snapshot_id, language), payload)
+        outcomes[language] = "written"
+    return outcomes, set(refs.values())
+
+
+def run_stage(db, top_k: int = DEFAULT_TOP_K, languages: list = None, snapshot_ids: list = None,
+              source_language: str = SOURCE_LANGUAGE, window_days: int = REQUEST_WINDOW_DAYS,
+              max_workers: int = MAX_WORKERS, compact: bool = False):
+    """
+    Materializes the top_k most requested languages (or the given ones) for the
+    given snapshots (by default every snapshot the latest documents point at),
+    then publishes the language set to translated_news_config. Returns a report.
+    """
+    totals = None
+    if languages is None:
+        languages, totals = top_languages(db, top_k, window_days, exclude={source_language})
+    languages = [language for language in languages if language != source_language]
+    if not languages:
+        print("⚠️ No translation requests recorded yet; nothing to materialize.")
+        return {"languages": [], "request_totals": totals or {}, "snapshots": 0, "outcomes": {}}
+
+    pending = list(snapshot_ids) if snapshot_ids is not None else current_snapshots(db, source_language)
+    print(f"🌐 Materializing {len(pending)} snapshots into {languages}...")
+    writer = BufferedFirestoreWriter(lambda: db)
+    outcomes = Counter()
+    seen = set(pending)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="materialize") as executor:
+        # Referenced snapshots are found while translating; they go out in the next wave
+        while pending:
+            futures = [executor.submit(materialize_snapshot, db, writer, snapshot_id, languages, source_language, compact)
+                       for snapshot_id in pending]
+            pending = []
+            for future in futures:
+                snapshot_outcomes, refs = future.result()
+                for language, outcome in snapshot_outcomes.items():
+                    outcomes[outcome] += 1
+                    metrics.inc("materialized_translations_total", outcome=outcome, language=language)
+                for ref in refs - seen:
+                    seen.add(ref)
+                    pending.append(ref)
+    writer.close()
+    if writer.failed_writes:
+        outcomes["failed"] += len(writer.failed_writes)
+        outcomes["written"] -= len(writer.failed_writes)
+
+    # Published last, so the function never looks for a language before its documents exist
+    db.collection(CONFIG).document(CONFIG_DOC).set({
+        "languages": languages,
+        "source_language": source_language,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    })
+    print(f"✅ Materialized translations: {dict(outcomes)}")
+    return {"languages": languages, "request_totals": totals, "snapshots": len(seen), "outcomes": dict(outcomes)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pre-translate the current English news into the most requested languages.")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Number of most requested languages to materialize.")
+    parser.add_argument("--languages", nargs="*", help="Materialize these language codes instead of the top-K.")
+    parser.add_argument("--snapshot-ids", nargs="*", help="Translate these news_summaries snapshots instead of the current ones.")
+    parser.add_argument("--window-days", type=int, default=REQUEST_WINDOW_DAYS)
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--compact-documents", action="store_true", help="Store translations in the compact format_version 2 encoding.")
+    parser.add_argument("--metrics-out", help="Write metrics here: Prometheus text for .prom/.txt, a JSON report otherwise.")
+    args = parser.parse_args()
+
+    report = run_stage(clients.firestore_client(), top_k=args.top_k, languages=args.languages, snapshot_ids=args.snapshot_ids,
+                       window_days=args.window_days, max_workers=args.max_workers, compact=args.compact_documents)
+    if args.metrics_out:
+        metrics.write_report(args.metrics_out)
+
+    print("\n\nMATERIALIZATION SUMMARY:")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
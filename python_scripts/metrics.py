@@ -0,0 +1,222 @@
+# metrics.py
+#
+# In-process metrics for the hot paths: Gemini calls, retries, JSON parsing,
+# Firestore batch commits and Translate calls.
+#
+# Counters and fixed-bucket histograms are kept in a thread-safe, in-memory
+# MetricsRegistry, labelled by country, language and category where the call
+# site knows them. A run can be exported as Prometheus text exposition
+# (to_prometheus) or as a JSON run report (to_json_report). Benchmarks
+# and tests read the same registry directly; reset() clears it between runs.
+#
+#     with metrics.timer("gemini_call_seconds", country="Kenya", language="English", category="Politics"):
+#         ...
+#     metrics.inc("gemini_tokens_total", 1234, kind="prompt", country="Kenya")
+#     metrics.write_report("sweep_metrics.json")
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+ATTEMPT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500)
+
+# Histograms whose name does not pick a bucket layout default to LATENCY_BUCKETS
+BUCKETS_BY_SUFFIX = {"_seconds": LATENCY_BUCKETS, "_bytes": SIZE_BUCKETS, "_attempts": ATTEMPT_BUCKETS, "_operations": COUNT_BUCKETS}
+
+
+def _buckets_for(name: str):
+    for suffix, buckets in BUCKETS_BY_SUFFIX.items():
+        if name.endswith(suffix):
+            return buckets
+    return LATENCY_BUCKETS
+
+
+def _label_key(labels: dict):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _json_bound(bound):
+    return "+Inf" if bound == float("inf") else bound
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as in the Prometheus data model."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        """Upper bound of the bucket holding the q-quantile (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        running, result = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+
+class MetricsRegistry:
+    """Thread-safe in-memory store of labelled counters and histograms."""
+
+    def __init__(self):
+        self._counters = {}   # (name, label_key) -> value
+        self._histograms = {} # (name, label_key) -> Histogram
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(_buckets_for(name))
+            self._histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observes the duration of the block in seconds, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_value(self, name: str, **labels):
+        """Sum of a counter over every label set that includes the given labels."""
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(value for (n, key), value in self._counters.items() if n == name and wanted <= set(key))
+
+    def counter_totals(self):
+        """{counter name: value summed over all label sets}."""
+        with self._lock:
+            totals = {}
+            for (name, _), value in self._counters.items():
+                totals[name] = totals.get(name, 0) + value
+            return dict(sorted(totals.items()))
+
+    def histogram(self, name: str, **labels):
+        """The histogram for exactly these labels, or None."""
+        with self._lock:
+            return self._histograms.get((name, _label_key(labels)))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # --- Exporters ---
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        def render_labels(label_key, extra=()):
+            pairs = list(label_key) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda entry: entry[0])
+
+            for name in sorted({name for (name, _), _ in counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (n, label_key), value in counters:
+                    if n == name:
+                        lines.append(f"{name}{render_labels(label_key)} {value}")
+
+            for name in sorted({name for (name, _), _ in histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, label_key), histogram in histograms:
+                    if n != name:
+                        continue
+                    for bound, count in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{render_labels(label_key, [('le', le)])} {count}")
+                    lines.append(f"{name}_sum{render_labels(label_key)} {histogram.sum}")
+                    lines.append(f"{name}_count{render_labels(label_key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_report(self):
+        """A JSON-serializable run report: every counter and a summary of every histogram."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(label_key), "value": value}
+                        for (name, label_key), value in sorted(self._counters.items())]
+            histograms = [{
+                "name": name,
+                "labels": dict(label_key),
+                "count": histogram.count,
+                "sum": round(histogram.sum, 6),
+                "mean": round(histogram.sum / histogram.count, 6) if histogram.count else None,
+                "p50_le": _json_bound(histogram.quantile(0.5)),
+                "p99_le": _json_bound(histogram.quantile(0.99)),
+            } for (name, label_key), histogram in sorted(self._histograms.items(), key=lambda entry: entry[0])]
+        return {"generated_at": datetime.now(timezone.utc).isoformat(), "counters": counters, "histograms": histograms}
+
+
+# --- Process-wide default registry ---
+
+registry = MetricsRegistry()
+
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
+
+
+def record_usage(response, **labels):
+    """
+    Adds a Gemini response's usage_metadata token counts to gemini_tokens_total, and
+    splits its input tokens into gemini_input_tokens_total{cache="cached"|"uncached"}.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind in ("prompt", "candidates", "thoughts", "tool_use_prompt", "cached_content", "total"):
+        count = getattr(usage, f"{kind}_token_count", None)
+        if isinstance(count, int) and count:
+            registry.inc("gemini_tokens_total", count, kind=kind, **labels)
+    prompt = getattr(usage, "prompt_token_count", None)
+    if isinstance(prompt, int):
+        cached = getattr(usage, "cached_content_token_count", None)
+        cached = cached if isinstance(cached, int) else 0
+        registry.inc("gemini_input_tokens_total", cached, cache="cached", **labels)
+        registry.inc("gemini_input_tokens_total", prompt - cached, cache="uncached", **labels)
+
+
+def write_report(path: str):
+    """Writes the default registry to path: Prometheus text for *.prom/*.txt, JSON otherwise."""
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith((".prom", ".txt")):
+            f.write(registry.to_prometheus())
+        else:
+            json.dump(registry.to_json_report(), f, indent=2, ensure_ascii=False)
+    print(f"📈 Metrics written to {path}")
@@ -0,0 +1,415 @@
+# retention.py
+#
+# Retention and compaction job for the append-only collections.
+#
+# Every stored run adds a news_summaries snapshot and every persistent failure
+# a gemini_query_errors record, so both grow without limit. This job trims them:
+#
+#   news_summaries      per (country, language), the newest --keep snapshots
+#                       are kept, plus the newest snapshot of each UTC day for
+#                       the last --keep-daily days. Any snapshot a kept one
+#                       points at through a {"ref": ...} placeholder (change
+#                       detection), or that latest/{id}.category_snapshots
+#                       points at, is kept too, so no reference a reader can
+#                       follow ever dangles. Everything else is deleted,
+#                       along with its translated_news translations.
+#   gemini_query_errors records older than --error-days are counted per UTC day
+#                       into gemini_query_error_rollups/{YYYY-MM-DD}
+#                       ({total, counts: [{country, language, status, count}]})
+#                       and then deleted. A day whose rollup is already marked
+#                       complete is not counted twice.
+#
+# Groups are the (country, language) pairs of the latest collection, listed
+# with the same where/where/orderBy(timestamp desc) query the app runs, so no
+# new index is needed. Deletes go out in batches of up to 500 (the Firestore
+# batch limit), paced to --max-ops-per-second and retried with RetryPolicy.
+#
+# Progress is kept in a small JSON state file: the groups and error days
+# already finished, and the run's reference time. A run stopped part way (a
+# crash, or --max-batches) continues with --resume instead of starting over;
+# every step is idempotent, so repeating a half-finished one is safe.
+# --dry-run reads everything and reports what would be removed without
+# writing anything.
+#
+# Point FIRESTORE_EMULATOR_HOST at the Firestore emulator to run it there.
+#
+# Usage: python retention.py --dry-run
+#        python retention.py --keep 30 --keep-daily 90 --error-days 14
+#        python retention.py --resume
+
+import argparse
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import clients
+import metrics
+from materialized_translations import TRANSLATIONS
+from retry_policy import RetryPolicy
+from sweep import TokenBucket
+
+# --- RETENTION CONFIGURATION ---
+KEEP_LATEST = 30                  # newest snapshots kept per (country, language)
+KEEP_DAILY_DAYS = 90              # plus the newest snapshot of each UTC day this far back (0 to disable)
+ERROR_RETENTION_DAYS = 14         # raw error records older than this are rolled up and deleted
+MAX_OPS_PER_SECOND = 500          # delete pace, well under Firestore's sustained write limits
+PAGE_SIZE = 500                   # documents per query page and per delete batch (the batch limit)
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retention_state.json")
+
+SNAPSHOTS = "news_summaries"
+ERRORS = "gemini_query_errors"
+ERROR_ROLLUPS = "gemini_query_error_rollups"
+LATEST = "latest"
+DESCENDING = "DESCENDING"         # firestore.Query.DESCENDING
+
+# --- CLIENTS ---
+# Built on first use; benchmarks assign a FakeFirestore to `db` directly.
+db = None
+
+def get_db():
+    global db
+    if db is None:
+        db = clients.firestore_client()
+    return db
+
+
+class BatchLimitReached(Exception):
+    """Raised when a run has used its --max-batches budget; resume it to continue."""
+
+
+def _paged(query, page_size: int = PAGE_SIZE):
+    """Streams a query one page at a time, each page starting after the last document of the previous one."""
+    last = None
+    while True:
+        page_query = query.limit(page_size)
+        if last is not None:
+            page_query = page_query.start_after(last)
+        page = list(page_query.stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+# --- STATE ---
+
+class RetentionState:
+    """Progress of the current run, persisted as a small JSON file so an interrupted run can resume."""
+
+    def __init__(self, path: str = STATE_FILE, resume: bool = False, now: datetime = None):
+        self.path = path
+        self.data = None
+        if resume and path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+        if self.data is None:
+            now = now or datetime.now(timezone.utc)
+            self.data = {"now": now.isoformat(), "groups_done": [], "error_days_done": []}
+        self.resumed = resume and bool(self.data["groups_done"] or self.data["error_days_done"])
+
+    @property
+    def now(self):
+        """The run's reference time; a resumed run keeps the original one so its windows do not shift."""
+        return datetime.fromisoformat(self.data["now"])
+
+    def done(self, kind: str, key: str):
+        return key in self.data[kind]
+
+    def mark(self, kind: str, key: str):
+        self.data[kind].append(key)
+        self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        # Write-then-rename so a crash never leaves a half-written state file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Called once a run completes; the next run starts from scratch."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# --- DELETES ---
+
+class BulkDeleter:
+    """Deletes documents in batches of up to PAGE_SIZE, paced by a token bucket, retrying failed commits."""
+
+    def __init__(self, db, max_ops_per_second: float = MAX_OPS_PER_SECOND, max_batches: int = None,
+                 retry_policy: RetryPolicy = None, batch_size: int = PAGE_SIZE):
+        self.db = db
+        self.bucket = TokenBucket(max_ops_per_second, max(float(batch_size), max_ops_per_second))
+        self.max_batches = max_batches
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=30.0, call_timeout=120.0)
+        self.batch_size = batch_size
+        self.batches = 0
+        self.deleted = 0
+
+    def delete(self, refs: list, collection: str):
+        for start in range(0, len(refs), self.batch_size):
+            if self.max_batches is not None and self.batches >= self.max_batches:
+                raise BatchLimitReached(f"Stopped after {self.batches} delete batches.")
+            chunk = refs[start:start + self.batch_size]
+            self.bucket.acquire(len(chunk))
+
+            def commit():
+                # A fresh batch per attempt; deleting a document that is already gone is not an error
+                batch = self.db.batch()
+                for ref in chunk:
+                    batch.delete(ref)
+                batch.commit()
+
+            with metrics.timer("retention_batch_seconds", collection=collection):
+                self.retry_policy.run(commit, label=f"delete {collection}")
+            self.batches += 1
+            self.deleted += len(chunk)
+            metrics.inc("retention_deleted_total", len(chunk), collection=collection)
+
+
+# --- SNAPSHOTS ---
+
+def discover_groups(db, scan_snapshots: bool = False):
+    """
+    {(country, language): pinned snapshot IDs} from the latest collection. With
+    scan_snapshots, news_summaries is also scanned (country and language only)
+    for groups that have no latest document, e.g. ones written before it existed.
+    """
+    groups = {}
+    for snapshot in db.collection(LATEST).stream():
+        data = snapshot.to_dict() or {}
+        if not data.get("country") or not data.get("language"):
+            continue
+        pinned = set((data.get("category_snapshots") or {}).values())
+        if data.get("snapshot_id"):
+            pinned.add(data["snapshot_id"])
+        groups.setdefault((data["country"], data["language"]), set()).update(pinned)
+    if scan_snapshots:
+        for snapshot in _paged(db.collection(SNAPSHOTS).select(["country", "language"])):
+            data = snapshot.to_dict() or {}
+            if data.get("country") and data.get("language"):
+                groups.setdefault((data["country"], data["language"]), set())
+    return groups
+
+
+def _referenced_snapshots(db, snapshot_id: str):
+    """IDs of the snapshots a snapshot's {"ref": ...} placeholders point at."""
+    document = db.collection(SNAPSHOTS).document(snapshot_id).get()
+    if not document.exists:
+        return set()
+    news_data = (document.to_dict() or {}).get("news_data") or {}
+    return {category_data["ref"] for category_data in news_data.values()
+            if isinstance(category_data, dict) and category_data.get("ref")}
+
+
+def plan_group(db, country: str, language: str, pinned: set, now: datetime,
+               keep_latest: int = KEEP_LATEST, keep_daily_days: int = KEEP_DAILY_DAYS):
+    """
+    (kept IDs, references of the snapshots to delete, total) for one (country, language).
+    Only the kept snapshots are read in full, to follow their references.
+    """
+    query = (db.collection(SNAPSHOTS)
+             .where("country", "==", country)
+             .where("language", "==", language)
+             .order_by("timestamp", direction=DESCENDING)
+             .select(["timestamp"]))
+    snapshots = [(snapshot.id, str((snapshot.to_dict() or {}).get("timestamp", "")), snapshot.reference)
+                 for snapshot in _paged(query)]
+
+    keep = {snapshot_id for snapshot_id, _, _ in snapshots[:keep_latest]}
+    if keep_daily_days:
+        first_day = (now - timedelta(days=keep_daily_days)).date().isoformat()
+        days_seen = set()
+        for snapshot_id, timestamp, _ in snapshots:
+            day = timestamp[:10] # ISO timestamps are UTC, so this is the UTC day
+            if day >= first_day and day not in days_seen:
+                days_seen.add(day)
+                keep.add(snapshot_id)
+
+    # One level is enough: a placeholder always names the snapshot that holds that category's
+    # content, and a snapshot kept only as a reference target is only ever read through it
+    for snapshot_id in list(keep):
+        keep |= _referenced_snapshots(db, snapshot_id)
+    keep |= pinned
+
+    to_delete = [reference for snapshot_id, _, reference in snapshots if snapshot_id not in keep]
+    return keep, to_delete, len(snapshots)
+
+
+def orphaned_translations(db, country: str, language: str, keep: set):
+    """References of the translated_news documents of a group whose snapshot is not kept."""
+    query = (db.collection(TRANSLATIONS)
+             .where("country", "==", country)
+             .where("source_language", "==", language)
+             .select(["snapshot_id"]))
+    return [translation.reference for translation in _paged(query)
+            if (translation.to_dict() or {}).get("snapshot_id") not in keep]
+
+
+# --- ERRORS ---
+
+def _next_day(day: str):
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+def error_days(db, cutoff_day: str, after_day: str = None):
+    """Yields the UTC days before cutoff_day that still have raw error records, oldest first, one read each."""
+    day = after_day
+    while True:
+        query = db.collection(ERRORS)
+        if day is not None:
+            query = query.where("timestamp", ">=", _next_day(day))
+        query = query.where("timestamp", "<", cutoff_day).order_by("timestamp").limit(1)
+        oldest = list(query.stream())
+        if not oldest:
+            return
+        day = str(oldest[0].to_dict().get("timestamp", ""))[:10]
+        yield day
+
+
+def _error_records(db, day: str):
+    query = (db.collection(ERRORS)
+             .where("timestamp", ">=", day)
+             .where("timestamp", "<", _next_day(day))
+             .order_by("timestamp")
+             .select(["country", "language", "status", "timestamp"]))
+    return list(_paged(query))
+
+
+def rollup_of(day: str, records: list):
+    """The gemini_query_error_rollups document for one day's raw records."""
+    counts = Counter()
+    for record in records:
+        data = record.to_dict() or {}
+        counts[(data.get("country", ""), data.get("language", ""), data.get("status", ""))] += 1
+    return {
+        "day": day,
+        "total": len(records),
+        "counts": [{"country": country, "language": language, "status": status, "count": count}
+                   for (country, language, status), count in sorted(counts.items())],
+        "complete": True,
+        "rolled_up_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def compact_error_day(db, day: str, deleter: BulkDeleter = None, retry_policy: RetryPolicy = None):
+    """
+    Rolls one day's raw error records up and deletes them (only counts them when
+    deleter is None). The rollup is written before any delete, and a day that
+    already has a complete rollup is not recounted, so a crash in between only
+    means the remaining records are deleted on the next run.
+    """
+    records = _error_records(db, day)
+    rollup_ref = db.collection(ERROR_ROLLUPS).document(day)
+    if deleter is not None and records:
+        existing = rollup_ref.get()
+        if not (existing.exists and (existing.to_dict() or {}).get("complete")):
+            rollup = rollup_of(day, records)
+            (retry_policy or deleter.retry_policy).run(lambda: rollup_ref.set(rollup), label=f"rollup {day}")
+            metrics.inc("retention_errors_rolled_up_total", len(records))
+        deleter.delete([record.reference for record in records], ERRORS)
+    return len(records)
+
+
+# --- JOB ---
+
+def run_retention(db, state: RetentionState, keep_latest: int = KEEP_LATEST, keep_daily_days: int = KEEP_DAILY_DAYS,
+                  error_retention_days: int = ERROR_RETENTION_DAYS, dry_run: bool = False,
+                  max_ops_per_second: float = MAX_OPS_PER_SECOND, max_batches: int = None, scan_snapshots: bool = False):
+    """
+    Runs (or, with dry_run, plans) one retention pass and returns its report.
+    report["complete"] is False when max_batches stopped it; resume with the same state.
+    """
+    now = state.now
+    deleter = None if dry_run else BulkDeleter(db, max_ops_per_second, max_batches)
+    report = {
+        "dry_run": dry_run,
+        "now": now.isoformat(),
+        "resumed": state.resumed,
+        "snapshots": {"groups": 0, "groups_skipped": 0, "total": 0, "kept": 0, "deleted": 0, "translations_deleted": 0,
+                      "by_group": {}},
+        "errors": {"cutoff_day": None, "days": 0, "days_skipped": 0, "records": 0, "by_day": {}},
+        "complete": False,
+    }
+    snapshot_report, error_report = report["snapshots"], report["errors"]
+
+    try:
+        groups = discover_groups(db, scan_snapshots)
+        for (country, language) in sorted(groups):
+            group_key = f"{country}_{language}"
+            if not dry_run and state.done("groups_done", group_key):
+                snapshot_report["groups_skipped"] += 1
+                continue
+            with metrics.timer("retention_group_seconds"):
+                keep, to_delete, total = plan_group(db, country, language, groups[(country, language)], now,
+                                                    keep_latest, keep_daily_days)
+                orphaned = orphaned_translations(db, country, language, keep)
+                if deleter is not None:
+                    deleter.delete(to_delete, SNAPSHOTS)
+                    deleter.delete(orphaned, TRANSLATIONS)
+            snapshot_report["groups"] += 1
+            snapshot_report["total"] += total
+            snapshot_report["kept"] += total - len(to_delete)
+            snapshot_report["deleted"] += len(to_delete)
+            snapshot_report["translations_deleted"] += len(orphaned)
+            if to_delete:
+                snapshot_report["by_group"][group_key] = {"total": total, "kept": total - len(to_delete), "deleted": len(to_delete)}
+            if not dry_run:
+                state.mark("groups_done", group_key)
+
+        cutoff_day = (now - timedelta(days=error_retention_days)).date().isoformat()
+        error_report["cutoff_day"] = cutoff_day
+        for day in error_days(db, cutoff_day):
+            if not dry_run and state.done("error_days_done", day):
+                error_report["days_skipped"] += 1
+                continue
+            records = compact_error_day(db, day, deleter)
+            error_report["days"] += 1
+            error_report["records"] += records
+            error_report["by_day"][day] = records
+            if not dry_run:
+                state.mark("error_days_done", day)
+        report["complete"] = True
+    except BatchLimitReached as e:
+        print(f"⏸️ {e} Continue with --resume.")
+
+    report["delete_batches"] = deleter.batches if deleter else 0
+    report["documents_deleted"] = deleter.deleted if deleter else 0
+    if report["complete"] and not dry_run:
+        state.clear()
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Trim news_summaries and roll up old gemini_query_errors records.")
+    parser.add_argument("--keep", type=int, default=KEEP_LATEST, help="Newest snapshots kept per (country, language).")
+    parser.add_argument("--keep-daily", type=int, default=KEEP_DAILY_DAYS, help="Also keep the newest snapshot of each of the last N UTC days (0 to disable).")
+    parser.add_argument("--error-days", type=int, default=ERROR_RETENTION_DAYS, help="Roll up and delete error records older than this many days.")
+    parser.add_argument("--max-ops-per-second", type=float, default=MAX_OPS_PER_SECOND)
+    parser.add_argument("--max-batches", type=int, help="Stop after this many delete batches (continue later with --resume).")
+    parser.add_argument("--scan-snapshots", action="store_true", help="Also find groups that have no latest document by scanning news_summaries.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without writing anything.")
+    parser.add_argument("--resume", action="store_true", help="Continue the interrupted run recorded in the state file.")
+    parser.add_argument("--state-file", default=STATE_FILE)
+    parser.add_argument("--report-out", help="Also write the report here as JSON.")
+    parser.add_argument("--metrics-out", help="Write metrics here: Prometheus text for .prom/.txt, a JSON report otherwise.")
+    args = parser.parse_args()
+
+    state = RetentionState(args.state_file, resume=args.resume)
+    report = run_retention(get_db(), state, keep_latest=args.keep, keep_daily_days=args.keep_daily,
+                           error_retention_days=args.error_days, dry_run=args.dry_run,
+                           max_ops_per_second=args.max_ops_per_second, max_batches=args.max_batches,
+                           scan_snapshots=args.scan_snapshots)
+
+    if args.report_out:
+        with open(args.report_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.metrics_out:
+        metrics.write_report(args.metrics_out)
+
+    print("\n\nRETENTION SUMMARY:")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
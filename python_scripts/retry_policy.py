@@ -0,0 +1,287 @@
+# retry_policy.py
+#
+# Reusable retry policy for Gemini (and other Google API) calls.
+#
+# - Errors are classified by HTTP status code instead of substring matching.
+# - Backoff is exponential with full jitter and capped per attempt.
+# - Every call is bounded by a per-call deadline and, optionally, a per-run
+#   deadline, so a single call can never sleep for days. With timed=True the
+#   callable is also told how long its attempt may take (at most
+#   attempt_timeout, never past the deadline), so it can bound a request that
+#   is already in flight; HTTP client timeouts are retried.
+# - Waits are done on a threading.Event, so a cancelled worker wakes up at once.
+# - A CircuitBreaker can be shared by every worker in a sweep: when the backend
+#   keeps failing, the breaker opens and all workers back off together instead
+#   of each one hammering the API on its own schedule.
+# - Attempts per call, errors by status and time spent backing off are
+#   recorded in the metrics registry, under the labels the caller passes.
+
+import random
+import re
+import threading
+import time
+
+import metrics
+
+# Statuses worth retrying: rate limiting and transient server-side failures.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class EmptyResponseError(Exception):
+    """Raised when the model returns no text. Treated as retryable."""
+
+
+class MalformedResponseError(Exception):
+    """Raised when a streamed response goes off-schema. Treated as retryable."""
+
+
+class StaleCacheError(Exception):
+    """Raised when a call names a context cache the API no longer has. Treated as retryable."""
+
+
+class Cancelled(Exception):
+    """Raised when the caller's cancel_event is set while retrying."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the next attempt could not start before the deadline."""
+
+
+def status_code_of(exc: Exception):
+    """
+    Extracts an HTTP status code from an SDK exception, or None.
+
+    google-genai's APIError and google-api-core exceptions carry it as `.code`,
+    HTTP client errors as `.status_code` or `.response.status_code`. As a last
+    resort the leading 'NNN STATUS' prefix of the message is used, which is how
+    google-genai formats its errors (e.g. '503 UNAVAILABLE. {...}').
+    """
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    if isinstance(value, int):
+        return value
+    match = re.match(r"\s*(\d{3})\s+[A-Z_]+", str(exc))
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def is_timeout(exc: Exception):
+    """
+    True for TimeoutError and for the HTTP client timeouts the SDKs raise when a
+    request runs out of time (httpx.TimeoutException under google-genai,
+    requests.Timeout elsewhere), matched by class name so neither is imported.
+    """
+    if isinstance(exc, TimeoutError):
+        return True
+    return any(cls.__name__ in ("TimeoutException", "Timeout") for cls in type(exc).__mro__)
+
+
+def is_retryable(exc: Exception):
+    """Classifies an exception as transient (retry) or permanent (give up)."""
+    if isinstance(exc, (EmptyResponseError, MalformedResponseError, StaleCacheError, ConnectionError)) or is_timeout(exc):
+        return True
+    return status_code_of(exc) in RETRYABLE_STATUS_CODES
+
+
+def _error_label(exc: Exception):
+    """Status code of an error for metric labels, or its class name if it has none."""
+    code = status_code_of(exc)
+    return str(code) if code is not None else type(exc).__name__
+
+
+def deadline_in(seconds: float):
+    """Returns an absolute time.monotonic() deadline `seconds` from now, for run_deadline."""
+    return time.monotonic() + seconds
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker shared by concurrent workers.
+
+    closed:    calls go through; consecutive retryable failures are counted.
+    open:      after `failure_threshold` failures in a row, nobody calls for
+               `reset_timeout` seconds (doubling on each re-open, up to
+               `max_reset_timeout`).
+    half_open: once the timeout elapses a single probe call is let through;
+               success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0, max_reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._reset_timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_owner = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Returns 0 if the caller may proceed, otherwise the seconds to wait first."""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            remaining = self._opened_at + self._reset_timeout - time.monotonic()
+            if self.state == "open" and remaining > 0:
+                return remaining
+            if self._probe_in_flight:
+                # Someone else is probing; check back shortly.
+                return min(1.0, self._reset_timeout)
+            self.state = "half_open"
+            self._probe_in_flight = True
+            self._probe_owner = threading.get_ident()
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._reset_timeout = self.base_reset_timeout
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """
+        Gives up the half-open probe slot without changing state, if the calling
+        thread holds it (its call ended in an error that says nothing about health).
+        """
+        with self._lock:
+            if self._probe_in_flight and self._probe_owner == threading.get_ident():
+                self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open":
+                self._reset_timeout = min(self._reset_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == "closed" and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        if self.state != "open":
+            print(f"🔌 Circuit breaker open: pausing all calls for {self._reset_timeout:.0f}s.")
+            metrics.inc("circuit_breaker_open_total")
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+
+class RetryPolicy:
+    """
+    Runs a callable with jittered exponential backoff.
+
+    max_attempts:  total attempts, including the first one.
+    base_delay:    backoff for the first retry; doubles each time before jitter.
+    max_delay:     cap on any single backoff.
+    call_timeout:  budget in seconds for one logical call, retries included.
+    attempt_timeout: optional cap in seconds on a single attempt (see run's timed).
+    breaker:       optional CircuitBreaker shared across workers.
+    """
+
+    def __init__(self, max_attempts: int = 8, base_delay: float = 2.0, max_delay: float = 60.0,
+                 call_timeout: float = 300.0, breaker: CircuitBreaker = None, seed=None, attempt_timeout: float = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_timeout = call_timeout
+        self.attempt_timeout = attempt_timeout
+        self.breaker = breaker
+        self._random = random.Random(seed)
+
+    def backoff(self, attempt: int):
+        """Full-jitter backoff for the given zero-based retry number."""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def run(self, fn, label: str = "", run_deadline: float = None, cancel_event: threading.Event = None, before_attempt=None,
+            labels: dict = None, timed: bool = False):
+        """
+        Calls fn() until it succeeds, fails permanently, runs out of attempts or
+        would overrun the deadline. The last error is re-raised; DeadlineExceeded
+        and Cancelled are raised (chained to the last error) when those stop it.
+        before_attempt, if given, is called before every attempt (e.g. a rate limiter).
+        labels (e.g. country/language/category) are attached to the retry metrics.
+        With timed=True, fn is called as fn(timeout): the seconds this attempt may
+        take, the smaller of attempt_timeout and the time left before the deadline.
+        """
+        labels = labels or {}
+        deadline = time.monotonic() + self.call_timeout
+        if run_deadline is not None:
+            deadline = min(deadline, run_deadline)
+        prefix = f"[{label}] " if label else ""
+        last_error = None
+        attempt = 0
+
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise Cancelled(f"{prefix}cancelled") from last_error
+
+                if self.breaker is not None:
+                    wait = self.breaker.before_call()
+                    if wait > 0:
+                        if time.monotonic() + wait > deadline:
+                            raise DeadlineExceeded(f"{prefix}circuit breaker open past the deadline") from last_error
+                        metrics.inc("retry_breaker_wait_seconds_total", wait, **labels)
+                        self._sleep(wait, cancel_event)
+                        continue
+
+                if before_attempt is not None:
+                    before_attempt()
+
+                if timed:
+                    timeout = deadline - time.monotonic()
+                    if self.attempt_timeout is not None:
+                        timeout = min(timeout, self.attempt_timeout)
+                    if timeout <= 0:
+                        if self.breaker is not None:
+                            self.breaker.release_probe()
+                        raise DeadlineExceeded(f"{prefix}no time left for attempt {attempt + 1}") from last_error
+
+                try:
+                    result = fn(timeout) if timed else fn()
+                except Exception as e:
+                    if not is_retryable(e):
+                        # Permanent errors say nothing about backend health; leave the breaker as it is,
+                        # but let another worker probe if this call was the half-open probe.
+                        if self.breaker is not None:
+                            self.breaker.release_probe()
+                        metrics.inc("retry_errors_total", status=_error_label(e), retryable="false", **labels)
+                        raise
+                    if self.breaker is not None:
+                        self.breaker.record_failure()
+                    metrics.inc("retry_errors_total", status=_error_label(e), retryable="true", **labels)
+                    last_error = e
+                else:
+                    if self.breaker is not None:
+                        self.breaker.record_success()
+                    return result
+                finally:
+                    attempt += 1
+
+                if attempt >= self.max_attempts:
+                    raise last_error
+
+                delay = self.backoff(attempt - 1)
+                if time.monotonic() + delay > deadline:
+                    raise DeadlineExceeded(f"{prefix}no time left for attempt {attempt + 1}: {last_error}") from last_error
+
+                print(f"⚠️ {prefix}Attempt {attempt}/{self.max_attempts} failed ({str(last_error)[:60]}). Retrying in {delay:.1f}s...")
+                metrics.inc("retry_backoff_seconds_total", delay, **labels)
+                self._sleep(delay, cancel_event)
+        finally:
+            if attempt:
+                metrics.observe("retry_call_attempts", attempt, **labels)
+
+    @staticmethod
+    def _sleep(seconds: float, cancel_event: threading.Event = None):
+        if cancel_event is None:
+            time.sleep(seconds)
+        else:
+            cancel_event.wait(seconds)
@@ -0,0 +1,331 @@
+# scheduler.py
+#
+# Timezone-aware scheduler for the "5AM local time, for every country" refresh.
+#
+# Each countries.txt entry is mapped to its ISO code (country_codes.py) and
+# from there to every timezone zone.tab lists for it. A country is due at
+# REFRESH_HOUR in the earliest of its zones, so its news is fresh by morning
+# everywhere in the country. Due times sit in a heap; the scheduler sleeps
+# until the next one, pops every country due by then and hands them to the
+# sweep as one small run, then pushes each country's next due time. Load is
+# spread across the day by the world's timezones instead of arriving as one
+# burst against the Gemini quota.
+#
+# The time of each country's last successful refresh is kept in a JSON state
+# file. On startup, countries whose last refresh is older than their most
+# recent due time are caught up, at most CATCH_UP_PER_MINUTE at a time, unless
+# their next regular refresh is less than CATCH_UP_MIN_LEAD_HOURS away.
+#
+# Usage: python scheduler.py --dry-run
+#        python scheduler.py --translate-from English --max-workers 16
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import threading
+import zoneinfo
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dtime, timedelta, timezone
+
+import metrics
+import sweep
+from country_codes import country_code
+
+# --- SCHEDULER CONFIGURATION ---
+REFRESH_HOUR = 5                  # local hour at which every country is refreshed
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scheduler_state.json")
+MAX_CONCURRENT_DISPATCHES = 4     # sweeps allowed to run at once (they share one quota limiter)
+CATCH_UP_PER_MINUTE = 10          # countries dispatched per minute while catching up after downtime
+CATCH_UP_MIN_LEAD_HOURS = 2       # skip a catch-up if the regular refresh is this close anyway
+MAX_SLEEP_SECONDS = 60            # re-read the clock at least this often (e.g. after a suspend)
+MIN_REFRESH_GAP_HOURS = 20        # a country's zones span less than this, so one refresh per day
+
+
+# --- TIMEZONES ---
+
+def _zone_tab_lines():
+    """Lines of zone.tab, from the system tz database or, failing that, the tzdata package."""
+    for directory in zoneinfo.TZPATH:
+        path = os.path.join(directory, "zone.tab")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read().splitlines()
+    try:
+        from importlib.resources import files
+        return files("tzdata").joinpath("zoneinfo", "zone.tab").read_text(encoding="utf-8").splitlines()
+    except (ImportError, FileNotFoundError) as e:
+        raise RuntimeError("zone.tab not found; install the tzdata package.") from e
+
+
+def load_country_timezones():
+    """{ISO code: [IANA zone names]} in zone.tab order."""
+    zones = {}
+    for line in _zone_tab_lines():
+        if not line or line.startswith("#"):
+            continue
+        code, _, name = line.split("\t")[:3]
+        zones.setdefault(code, []).append(name)
+    return zones
+
+
+def timezones_for(countries: list, zones_by_code: dict = None):
+    """
+    Maps each (country, languages) entry to its ZoneInfo objects.
+    Countries missing from zone.tab fall back to UTC, with a warning.
+    """
+    zones_by_code = zones_by_code or load_country_timezones()
+    mapping = {}
+    for country, _ in countries:
+        names = zones_by_code.get(country_code(country))
+        if not names:
+            print(f"⚠️ No timezone found for {country}; scheduling it at {REFRESH_HOUR}:00 UTC.")
+            names = ["UTC"]
+        mapping[country] = [zoneinfo.ZoneInfo(name) for name in names]
+    return mapping
+
+
+def _local_due(zone, local_date, hour: int):
+    return datetime.combine(local_date, dtime(hour), tzinfo=zone).astimezone(timezone.utc)
+
+
+def _next_local_hour(zones: list, after: datetime, hour: int):
+    """The first UTC instant strictly after `after` at which it is `hour`:00 in any of the zones."""
+    candidates = []
+    for zone in zones:
+        local_date = after.astimezone(zone).date()
+        candidates.append(next(due for due in (_local_due(zone, local_date + timedelta(days=offset), hour) for offset in (0, 1, 2))
+                               if due > after))
+    return min(candidates)
+
+
+def previous_due(zones: list, before: datetime, hour: int = REFRESH_HOUR):
+    """The country's last daily refresh time at or before `before`."""
+    due = _next_local_hour(zones, before - timedelta(days=2), hour)
+    while True:
+        # Later zones reach `hour` within the same day; the next refresh is the earliest zone's next day
+        following = _next_local_hour(zones, due + timedelta(hours=MIN_REFRESH_GAP_HOURS), hour)
+        if following > before:
+            return due
+        due = following
+
+
+def next_due(zones: list, after: datetime, hour: int = REFRESH_HOUR):
+    """The country's first daily refresh time strictly after `after`: `hour`:00 in its earliest zone."""
+    return _next_local_hour(zones, previous_due(zones, after, hour) + timedelta(hours=MIN_REFRESH_GAP_HOURS), hour)
+
+
+# --- STATE ---
+
+class SchedulerState:
+    """Last successful refresh per country, persisted as a small JSON file."""
+
+    def __init__(self, path: str = STATE_FILE):
+        self.path = path
+        self._last = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._last = {country: datetime.fromisoformat(when) for country, when in json.load(f).items()}
+
+    def last_refresh(self, country: str):
+        with self._lock:
+            return self._last.get(country)
+
+    def record(self, country: str, when: datetime):
+        with self._lock:
+            self._last[country] = when
+            if not self.path:
+                return
+            # Write-then-rename so a crash never leaves a half-written state file
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({c: t.isoformat() for c, t in sorted(self._last.items())}, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+# --- SCHEDULER ---
+
+class RefreshScheduler:
+    """
+    Dispatches each country at REFRESH_HOUR local time from a heap of due times.
+
+    `dispatch` is called with a list of (country, languages) entries that came due
+    together and returns a {"Country [Language]": result} mapping, as
+    sweep.run_sweep does. `clock` and `wait` can be replaced to drive the
+    scheduler on simulated time.
+    """
+
+    def __init__(self, countries: list, dispatch, state: SchedulerState = None, hour: int = REFRESH_HOUR,
+                 catch_up: bool = True, catch_up_per_minute: float = CATCH_UP_PER_MINUTE,
+                 max_concurrent: int = MAX_CONCURRENT_DISPATCHES, zones: dict = None, clock=None, wait=None):
+        self.languages = dict(countries)
+        self.zones = zones or timezones_for(countries)
+        self.dispatch = dispatch
+        self.state = state or SchedulerState(None)
+        self.hour = hour
+        self.catch_up = catch_up
+        self.catch_up_per_minute = catch_up_per_minute
+        self.max_concurrent = max_concurrent
+        self.stop_event = threading.Event()
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        self.wait = wait or self.stop_event.wait
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def _push(self, due: datetime, country: str, kind: str):
+        heapq.heappush(self._heap, (due, next(self._sequence), country, kind))
+
+    def missed_countries(self, now: datetime):
+        """Countries whose last refresh predates their most recent due time, oldest miss first."""
+        missed = []
+        for country, zones in self.zones.items():
+            last = self.state.last_refresh(country)
+            missed_due = previous_due(zones, now, self.hour)
+            if last is not None and last >= missed_due:
+                continue
+            if next_due(zones, now, self.hour) - now < timedelta(hours=CATCH_UP_MIN_LEAD_HOURS):
+                continue
+            missed.append((missed_due, country))
+        return [country for _, country in sorted(missed)]
+
+    def build_queue(self):
+        """Seeds the heap with every country's next regular refresh and any paced catch-ups."""
+        now = self.clock()
+        self._heap = []
+        for country, zones in self.zones.items():
+            self._push(next_due(zones, now, self.hour), country, "regular")
+        if self.catch_up:
+            missed = self.missed_countries(now)
+            for i, country in enumerate(missed):
+                self._push(now + timedelta(minutes=i / self.catch_up_per_minute), country, "catch_up")
+            if missed:
+                print(f"♻️ Catching up {len(missed)} countries missed while the scheduler was down "
+                      f"({self.catch_up_per_minute}/min).")
+        return len(self._heap)
+
+    def _pop_due(self, now: datetime):
+        due_entries = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, country, kind = heapq.heappop(self._heap)
+            due_entries.append((due, country, kind))
+            if kind == "regular":
+                self._push(next_due(self.zones[country], due, self.hour), country, "regular")
+        return due_entries
+
+    def _run_dispatch(self, due_entries: list):
+        started = self.clock()
+        countries = list(dict.fromkeys(country for _, country, _ in due_entries))
+        for due, country, kind in due_entries:
+            metrics.inc("scheduler_dispatch_total", kind=kind)
+            metrics.observe("scheduler_lag_seconds", (started - due).total_seconds(), kind=kind)
+        print(f"⏰ {started:%Y-%m-%d %H:%M} UTC: refreshing {len(countries)} countries: {', '.join(countries)}")
+        try:
+            results = self.dispatch([(country, self.languages[country]) for country in countries])
+        except Exception as e:
+            print(f"❌ Dispatch for {', '.join(countries)} failed: {e}")
+            return
+        for country in countries:
+            if all(results.get(f"{country} [{lang}]", {}).get("status") == "success" for lang in self.languages[country]):
+                self.state.record(country, started)
+            else:
+                metrics.inc("scheduler_refresh_failures_total", country=country)
+
+    def run(self, until: datetime = None):
+        """Dispatches countries as they come due until stop() is called (or `until` passes)."""
+        self.build_queue()
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="scheduler") as executor:
+            while self._heap and not self.stop_event.is_set():
+                now = self.clock()
+                if until and now >= until:
+                    break
+                due_entries = self._pop_due(now)
+                if due_entries:
+                    executor.submit(self._run_dispatch, due_entries)
+                    continue
+                sleep_for = (self._heap[0][0] - now).total_seconds()
+                if until:
+                    sleep_for = min(sleep_for, (until - now).total_seconds())
+                self.wait(min(sleep_for, MAX_SLEEP_SECONDS))
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# --- DRY RUN ---
+
+def load_curve(countries: list, zones: dict, day: datetime, hour: int = REFRESH_HOUR, translate_from: str = None):
+    """Per UTC hour of `day`: countries due, documents written and Gemini requests made."""
+    start = datetime.combine(day.date(), dtime(0), tzinfo=timezone.utc)
+    curve = [{"hour": h, "countries": 0, "documents": 0, "requests": 0} for h in range(24)]
+    for entry in countries:
+        country, languages = entry
+        due = next_due(zones[country], start - timedelta(microseconds=1), hour)
+        if due >= start + timedelta(days=1):
+            continue
+        bucket = curve[int((due - start).total_seconds() // 3600)]
+        bucket["countries"] += 1
+        bucket["documents"] += len(languages)
+        bucket["requests"] += len(sweep.expand_work_units([entry], translate_from))
+    return curve
+
+
+def print_load_curve(curve: list, day: datetime):
+    peak = max(bucket["requests"] for bucket in curve) or 1
+    total = sum(bucket["requests"] for bucket in curve)
+    print(f"Load curve for {day:%Y-%m-%d} (UTC hours):")
+    print(" hour | countries | documents | requests")
+    for bucket in curve:
+        bar = "█" * round(40 * bucket["requests"] / peak)
+        print(f"{bucket['hour']:>3}:00 | {bucket['countries']:>9} | {bucket['documents']:>9} | {bucket['requests']:>8} {bar}")
+    print(f"Peak hour: {peak} requests ({round(100 * peak / total) if total else 0}% of {total}); "
+          f"running everything at once would send all {total} in one burst.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Refresh every country at 5AM local time.")
+    parser.add_argument("--countries-file", default=sweep.COUNTRIES_FILE)
+    parser.add_argument("--only", nargs="*", help="Restrict the schedule to these country names.")
+    parser.add_argument("--hour", type=int, default=REFRESH_HOUR, help="Local hour of the daily refresh.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the per-hour load curve and pending catch-ups, then exit.")
+    parser.add_argument("--date", help="Day for --dry-run (YYYY-MM-DD, default today UTC).")
+    parser.add_argument("--state-file", default=STATE_FILE)
+    parser.add_argument("--no-catch-up", action="store_true", help="Do not refresh countries missed while the scheduler was down.")
+    parser.add_argument("--catch-up-per-minute", type=float, default=CATCH_UP_PER_MINUTE)
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT_DISPATCHES)
+    parser.add_argument("--max-workers", type=int, default=sweep.DEFAULT_MAX_WORKERS)
+    parser.add_argument("--rpm", type=int, default=sweep.GEMINI_RPM, help="Gemini requests-per-minute quota.")
+    parser.add_argument("--tpm", type=int, default=sweep.GEMINI_TPM, help="Gemini tokens-per-minute quota.")
+    parser.add_argument("--translate-from", help="Fetch once in this language (e.g. English) and machine-translate the rest.")
+    args = parser.parse_args()
+
+    countries = sweep.load_countries(args.countries_file)
+    if args.only:
+        countries = [entry for entry in countries if entry[0] in args.only]
+    zones = timezones_for(countries)
+    state = SchedulerState(args.state_file)
+
+    if args.dry_run:
+        day = datetime.fromisoformat(args.date).replace(tzinfo=timezone.utc) if args.date else datetime.now(timezone.utc)
+        print_load_curve(load_curve(countries, zones, day, args.hour, args.translate_from), day)
+        if not args.no_catch_up:
+            scheduler = RefreshScheduler(countries, dispatch=None, state=state, hour=args.hour, zones=zones)
+            missed = scheduler.missed_countries(datetime.now(timezone.utc))
+            shown = ", ".join(missed[:10]) + (f" and {len(missed) - 10} more" if len(missed) > 10 else "")
+            print(f"Catch-up on start: {len(missed)} countries" + (f" ({shown})" if missed else ""))
+    else:
+        limiter = sweep.QuotaLimiter(args.rpm, args.tpm)
+
+        def dispatch(entries):
+            results, _ = sweep.run_sweep(entries, max_workers=args.max_workers, limiter=limiter,
+                                         translate_from=args.translate_from)
+            return results
+
+        scheduler = RefreshScheduler(countries, dispatch, state=state, hour=args.hour, catch_up=not args.no_catch_up,
+                                     catch_up_per_minute=args.catch_up_per_minute, max_concurrent=args.max_concurrent,
+                                     zones=zones)
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            scheduler.stop()
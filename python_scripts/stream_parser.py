@@ -0,0 +1,150 @@
+# stream_parser.py
+#
+# Incremental extraction of news items from a streamed Gemini response.
+#
+# NewsItemStreamParser is fed the response text chunk by chunk. It finds the
+# "news_items" array (inside a ```json fence or not, after any preamble),
+# then returns every array element as soon as its closing brace arrives,
+# validated against the shape the app expects. Output that goes off-schema
+# raises MalformedResponseError at the chunk where it happens, so the caller
+# can abort the stream and retry instead of paying for the rest of a bad
+# generation:
+#
+#   no "news_items" array within KEY_SEARCH_LIMIT characters (prose, refusals)
+#   an array element that is not an object, or an object that fails validation
+#   an element that grows past MAX_ITEM_CHARS without closing (runaway output)
+#   the stream ending before the array is closed (truncation)
+#
+#     parser = NewsItemStreamParser()
+#     for chunk in stream:
+#         for item in parser.feed(chunk.text or ""):
+#             ...
+#         if parser.done:
+#             break
+#     parser.close()
+
+import json
+import re
+
+from retry_policy import MalformedResponseError
+
+KEY_SEARCH_LIMIT = 2000   # characters of preamble allowed before the news_items array
+MAX_ITEM_CHARS = 20000    # a single news item is a few hundred characters
+
+NEWS_ITEMS_ARRAY = re.compile(r'"news_items"\s*:\s*\[')
+
+
+def validate_news_item(item):
+    """Returns None if item has the shape the app renders, otherwise what is wrong with it."""
+    if not isinstance(item, dict):
+        return f"item is a {type(item).__name__}, not an object"
+    for field in ("title", "summary"):
+        if not isinstance(item.get(field), str) or not item[field].strip():
+            return f"item is missing a '{field}' string"
+    sources = item.get("sources", [])
+    if not isinstance(sources, list) or not all(isinstance(source, dict) for source in sources):
+        return "'sources' is not a list of objects"
+    return None
+
+
+class NewsItemStreamParser:
+    """Finds the news_items array in streamed text and yields its elements as they complete."""
+
+    def __init__(self, key_search_limit: int = KEY_SEARCH_LIMIT, max_item_chars: int = MAX_ITEM_CHARS):
+        self.key_search_limit = key_search_limit
+        self.max_item_chars = max_item_chars
+        self.items = []
+        self.chars_seen = 0
+        self.done = False
+        self._buffer = ""
+        self._in_array = False
+        # Scanner state for the element being read; it survives across chunks
+        self._item_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._scan = 0
+
+    def feed(self, text: str):
+        """Consumes one chunk and returns the items it completed (possibly none)."""
+        if self.done or not text:
+            return []
+        self.chars_seen += len(text)
+        self._buffer += text
+
+        if not self._in_array:
+            match = NEWS_ITEMS_ARRAY.search(self._buffer)
+            if not match:
+                if len(self._buffer) > self.key_search_limit:
+                    raise MalformedResponseError(f"No news_items array in the first {self.key_search_limit} characters.")
+                return []
+            self._in_array = True
+            self._buffer = self._buffer[match.end():]
+            self._scan = 0
+
+        completed = []
+        while not self.done:
+            item_text = self._next_element()
+            if item_text is None:
+                break
+            try:
+                item = json.loads(item_text)
+            except json.JSONDecodeError as e:
+                raise MalformedResponseError(f"Item {len(self.items) + 1} is not valid JSON: {e}") from e
+            problem = validate_news_item(item)
+            if problem:
+                raise MalformedResponseError(f"Item {len(self.items) + 1} is off-schema: {problem}.")
+            self.items.append(item)
+            completed.append(item)
+        return completed
+
+    def _next_element(self):
+        """Returns the text of the next complete array element, or None if more input is needed."""
+        buffer = self._buffer
+        i = self._scan
+        if self._item_start is None:
+            # Between elements: skip separators until an object starts or the array ends
+            while i < len(buffer) and (buffer[i].isspace() or buffer[i] == ","):
+                i += 1
+            if i == len(buffer):
+                self._buffer, self._scan = "", 0
+                return None
+            if buffer[i] == "]":
+                self.done = True
+                return None
+            if buffer[i] != "{":
+                raise MalformedResponseError(f"Expected an object in news_items, got {buffer[i]!r}.")
+            self._item_start, self._depth, self._in_string, self._escaped = i, 0, False, False
+
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{" or char == "[":
+                self._depth += 1
+            elif char == "}" or char == "]":
+                self._depth -= 1
+                if self._depth == 0:
+                    item_text = buffer[self._item_start:i + 1]
+                    self._buffer, self._scan, self._item_start = buffer[i + 1:], 0, None
+                    return item_text
+            i += 1
+
+        if i - self._item_start > self.max_item_chars:
+            raise MalformedResponseError(f"Item {len(self.items) + 1} exceeded {self.max_item_chars} characters.")
+        self._scan = i
+        return None
+
+    def close(self):
+        """Call once the stream ends; raises if the news_items array never closed."""
+        if not self.done:
+            where = "before the news_items array" if not self._in_array else f"after {len(self.items)} items, mid-array"
+            raise MalformedResponseError(f"Stream ended {where}.")
+        return self.items
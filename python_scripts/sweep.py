@@ -0,0 +1,409 @@
+# sweep.py
+#
+# Whole-world sweep driver. Reads countries.txt, expands it into
+# (country, language, category) work units and runs them through a bounded
+# worker pool that shares one token-bucket limiter sized to the Gemini
+# RPM/TPM quota. Once every category for a (country, language) has come back,
+# the consolidated document is written through
+# gemini_journalist_with_categories.store_consolidated_news.
+#
+# Usage: python sweep.py --max-workers 64 --rpm 1000 --tpm 1000000
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import gemini_journalist_with_categories as journalist
+import materialized_translations
+import metrics
+from checkpoints import DEFAULT_CHECKPOINT_FILE, CheckpointStore, new_run_id
+from retry_policy import deadline_in
+
+# --- SWEEP CONFIGURATION ---
+COUNTRIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "countries.txt")
+DEFAULT_MAX_WORKERS = 64
+GEMINI_RPM = 1000             # Requests per minute allowed by our Gemini quota
+GEMINI_TPM = 1_000_000        # Tokens per minute allowed by our Gemini quota
+ESTIMATED_TOKENS_PER_REQUEST = 4000  # Prompt + grounded response, used to charge the TPM bucket
+PROGRESS_INTERVAL = 10        # seconds between progress reports
+RUN_DEADLINE_MINUTES = 90     # no retry may start after this much of the sweep has elapsed
+
+WorkUnit = namedtuple("WorkUnit", ["country", "language", "category", "query"])
+
+
+def load_countries(path: str = COUNTRIES_FILE):
+    """
+    Parses countries.txt ('Country;Lang1; Lang2' per line) into a list of
+    (country, [languages]) tuples, in file order.
+    """
+    countries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = [part.strip() for part in line.split(";")]
+            languages = [lang for lang in parts[1:] if lang]
+            countries.append((parts[0], languages))
+    return countries
+
+
+def expand_work_units(countries: list, translate_from: str = None):
+    """
+    Expands (country, [languages]) entries into one WorkUnit per category.
+    With translate_from set, each country is only fetched in that language.
+    """
+    units = []
+    for country, languages in countries:
+        categories_to_fetch = journalist.build_category_queries(country)
+        for lang in ([translate_from] if translate_from else languages):
+            for category, query in categories_to_fetch.items():
+                units.append(WorkUnit(country, lang, category, query))
+    return units
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at `rate` per second up
+    to `capacity`; acquire() blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, amount: float = 1.0):
+        """Takes `amount` tokens if available; otherwise returns the seconds to wait."""
+        with self._lock:
+            self._refill()
+            # Requests bigger than the bucket would never fit, so cap them at capacity.
+            amount = min(amount, self.capacity)
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount: float = 1.0):
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class QuotaLimiter:
+    """Combines a requests-per-minute and a tokens-per-minute bucket."""
+
+    def __init__(self, rpm: int = GEMINI_RPM, tpm: int = GEMINI_TPM, tokens_per_request: int = ESTIMATED_TOKENS_PER_REQUEST):
+        # Allow bursts of up to one second's worth of quota.
+        self.requests = TokenBucket(rpm / 60.0, max(1.0, rpm / 60.0))
+        self.tokens = TokenBucket(tpm / 60.0, max(float(tokens_per_request), tpm / 60.0))
+        self.tokens_per_request = tokens_per_request
+
+    def acquire(self):
+        with metrics.timer("rate_limiter_wait_seconds"):
+            self.requests.acquire(1)
+            self.tokens.acquire(self.tokens_per_request)
+
+
+class SweepStats:
+    """Counters shared by the workers and the progress reporter."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.start_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def increment(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.start_time
+            finished = self.completed + self.failed + self.skipped
+            return {
+                "elapsed_s": round(elapsed, 1),
+                "finished": finished,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "in_flight": self.started - finished,
+                "queue_depth": self.total - self.started,
+                "units_per_min": round(finished / elapsed * 60, 1) if elapsed > 0 else 0.0,
+            }
+
+
+class _CountryLanguageGroup:
+    """
+    Collects category results for one (country, language) until it can be written.
+    In pipeline mode `targets` lists the languages to translate the result into.
+    """
+
+    def __init__(self, country: str, lang: str, categories: list, targets: list = None):
+        self.country = country
+        self.lang = lang
+        self.categories = categories
+        self.targets = targets
+        self.results = {}
+        self.failed = False
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+
+def _build_groups(units: list, countries: list, translate_from: str = None):
+    """One _CountryLanguageGroup per (country, language), listing its categories in unit order."""
+    languages_by_country = dict(countries)
+    groups = {}
+    for unit in units:
+        key = (unit.country, unit.language)
+        if key not in groups:
+            targets = languages_by_country[unit.country] if translate_from else None
+            groups[key] = _CountryLanguageGroup(unit.country, unit.language, [], targets)
+        groups[key].categories.append(unit.category)
+    return groups
+
+
+def _report_progress(stats: SweepStats, stop_event: threading.Event, interval: float):
+    while not stop_event.wait(interval):
+        snap = stats.snapshot()
+        print(f"📊 [{snap['elapsed_s']}s] {snap['finished']}/{snap['total']} units "
+              f"({snap['units_per_min']}/min) | in flight: {snap['in_flight']} | queued: {snap['queue_depth']} | failed: {snap['failed']}")
+
+
+def _run_unit(unit: WorkUnit, group: _CountryLanguageGroup, limiter: QuotaLimiter, stats: SweepStats, results: dict,
+              run_deadline: float, checkpoint: CheckpointStore = None, run_id: str = None):
+    stats.increment("started")
+
+    if group.failed:
+        stats.increment("skipped")
+        return
+
+    # Every attempt, retries included, takes a token so retries count against the quota too.
+    news_items, error_msg = journalist._fetch_category_data(
+        unit.category, unit.query, journalist.system_instruction_for(unit.category, unit.language),
+        unit.country, unit.language, group.cancel_event, run_deadline, limiter.acquire
+    )
+
+    if checkpoint and not error_msg:
+        checkpoint.record_category(run_id, unit.country, unit.language, unit.category, news_items)
+
+    with group.lock:
+        if group.failed:
+            stats.increment("skipped")
+            return
+        if error_msg:
+            group.failed = True
+            group.cancel_event.set()
+            stats.increment("failed")
+        else:
+            group.results[unit.category] = news_items
+        done = len(group.results) == len(group.categories)
+
+    if error_msg:
+        _report_failure(unit, group, results, error_msg)
+        return
+    if done:
+        _finish_group(group, results, checkpoint, run_id)
+    # Counted after the write, so a unit whose write raises is counted as failed instead
+    stats.increment("completed")
+
+
+def _run_units(executor, units: list, groups: dict, limiter: QuotaLimiter, stats: SweepStats, results: dict,
+               run_deadline: float, checkpoint: CheckpointStore = None, run_id: str = None):
+    """
+    Runs every unit through executor and waits for all of them. A unit that raises
+    (e.g. a checkpoint write or the store step failing) is counted as failed and
+    fails its group the way a failed category does, so the group still gets its
+    results entries and error log.
+    """
+    futures = {executor.submit(_run_unit, unit, groups[(unit.country, unit.language)], limiter, stats, results,
+                               run_deadline, checkpoint, run_id): unit for unit in units}
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except Exception as e:
+            unit = futures[future]
+            group = groups[(unit.country, unit.language)]
+            stats.increment("failed")
+            with group.lock:
+                first_failure = not group.failed
+                group.failed = True
+                group.cancel_event.set()
+            if first_failure:
+                _report_failure(unit, group, results, f"Unexpected {type(e).__name__}: {e}")
+
+
+def _report_failure(unit: WorkUnit, group: _CountryLanguageGroup, results: dict, error_msg: str):
+    """Logs a failed category and marks every document of its group as failed."""
+    print(f"❌ {unit.country} [{unit.language}] category '{unit.category}' failed: {error_msg}")
+    journalist.log_query_error_to_firestore(unit.country, unit.language, f"Category [{unit.category}] failed: {error_msg}")
+    for lang in (group.targets or [unit.language]):
+        results[f"{unit.country} [{lang}]"] = {"status": "error", "message": "One or more categories failed to gather completely."}
+
+
+def _finish_group(group: _CountryLanguageGroup, results: dict, checkpoint: CheckpointStore = None, run_id: str = None):
+    """Writes the consolidated document (or its translations) once every category is in."""
+    # Keep the fixed category order in the stored document
+    consolidated_news_data = {category: group.results[category] for category in group.categories}
+    if group.targets:
+        stored = journalist.store_translated_news(group.country, group.targets, group.lang, consolidated_news_data, checkpoint, run_id)
+        for lang, result in stored.items():
+            results[f"{group.country} [{lang}]"] = result
+    else:
+        result = journalist.store_consolidated_news(group.country, group.lang, journalist.dedupe_categories(consolidated_news_data),
+                                                    on_written=journalist.checkpoint_on_written(checkpoint, run_id, group.country, group.lang))
+        results[f"{group.country} [{group.lang}]"] = result
+
+
+def _apply_checkpoint(units: list, groups: dict, results: dict, checkpoint: CheckpointStore, run_id: str):
+    """
+    Seeds groups with categories already fetched under run_id and returns only the
+    units that still need fetching. Groups that are already complete are written now.
+    """
+    remaining = []
+    resumed_units = 0
+    for unit in units:
+        group = groups[(unit.country, unit.language)]
+        written_languages = group.targets or [group.lang]
+        if all(checkpoint.written_doc_id(run_id, group.country, lang) for lang in written_languages):
+            for lang in written_languages:
+                results[f"{group.country} [{lang}]"] = {"status": "success", "doc_id": checkpoint.written_doc_id(run_id, group.country, lang), "resumed": True}
+            resumed_units += 1
+            continue
+
+        done = checkpoint.completed_categories(run_id, unit.country, unit.language)
+        if unit.category in done:
+            group.results[unit.category] = done[unit.category]
+            resumed_units += 1
+        else:
+            remaining.append(unit)
+
+    for group in groups.values():
+        if not group.results or len(group.results) != len(group.categories):
+            continue
+        if any(f"{group.country} [{lang}]" in results for lang in (group.targets or [group.lang])):
+            continue
+        _finish_group(group, results, checkpoint, run_id)
+
+    print(f"♻️ Resuming run {run_id}: {resumed_units} units restored from checkpoint, {len(remaining)} left to fetch.")
+    return remaining
+
+
+def run_sweep(countries: list, max_workers: int = DEFAULT_MAX_WORKERS, limiter: QuotaLimiter = None,
+              progress_interval: float = PROGRESS_INTERVAL, deadline_minutes: float = RUN_DEADLINE_MINUTES,
+              translate_from: str = None, checkpoint: CheckpointStore = None, run_id: str = None):
+    """
+    Runs every (country, language, category) unit through a bounded worker pool.
+    Retries share the journalist's circuit breaker and stop once deadline_minutes have passed.
+    With translate_from set, each country is fetched once in that language and
+    translated into its countries.txt languages (see store_translated_news).
+    With a checkpoint store, units already fetched under run_id are not fetched again
+    and documents already written under run_id are skipped.
+    Returns a {"Country [Language]": result} mapping plus a final stats snapshot.
+    """
+    limiter = limiter or QuotaLimiter()
+    run_deadline = deadline_in(deadline_minutes * 60)
+    units = expand_work_units(countries, translate_from)
+    results = {}
+    groups = _build_groups(units, countries, translate_from)
+
+    if checkpoint:
+        units = _apply_checkpoint(units, groups, results, checkpoint, run_id)
+
+    stats = SweepStats(len(units))
+
+    print(f"Sweeping {len(countries)} countries as {len(units)} work units with {max_workers} workers...")
+
+    stop_event = threading.Event()
+    reporter = threading.Thread(target=_report_progress, args=(stats, stop_event, progress_interval), daemon=True)
+    reporter.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sweep") as executor:
+            _run_units(executor, units, groups, limiter, stats, results, run_deadline, checkpoint, run_id)
+    finally:
+        stop_event.set()
+        reporter.join()
+        # Documents and error logs are committed in the background; wait for them
+        journalist.firestore_writer.flush()
+
+    journalist.firestore_writer.mark_failed_writes(results)
+    summary = stats.snapshot()
+    summary["firestore"] = journalist.firestore_writer.stats()
+    return results, summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fetch and store news for every country in countries.txt.")
+    parser.add_argument("--countries-file", default=COUNTRIES_FILE)
+    parser.add_argument("--only", nargs="*", help="Restrict the sweep to these country names.")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("--rpm", type=int, default=GEMINI_RPM, help="Gemini requests-per-minute quota.")
+    parser.add_argument("--tpm", type=int, default=GEMINI_TPM, help="Gemini tokens-per-minute quota.")
+    parser.add_argument("--tokens-per-request", type=int, default=ESTIMATED_TOKENS_PER_REQUEST)
+    parser.add_argument("--deadline-minutes", type=float, default=RUN_DEADLINE_MINUTES, help="Stop retrying after this long.")
+    parser.add_argument("--translate-from", help="Fetch once in this language (e.g. English) and machine-translate the rest.")
+    parser.add_argument("--resume", action="store_true", help="Continue a previous run, re-fetching only missing units.")
+    parser.add_argument("--run-id", help="Run to resume (defaults to the last run in the checkpoint file).")
+    parser.add_argument("--checkpoint-file", default=DEFAULT_CHECKPOINT_FILE)
+    parser.add_argument("--metrics-out", help="Write sweep metrics here: Prometheus text for .prom/.txt, a JSON report otherwise.")
+    parser.add_argument("--stream", action="store_true", help="Stream responses and parse news items as they arrive.")
+    parser.add_argument("--context-cache", action="store_true", help="Send the shared system instructions through Gemini context caches.")
+    parser.add_argument("--grounded-sources", action="store_true", help="Take sources from search grounding metadata instead of the model's output.")
+    parser.add_argument("--compact-documents", action="store_true", help="Store documents in the compact format_version 2 encoding.")
+    parser.add_argument("--materialize-translations", type=int, metavar="K", default=0,
+                        help="After the sweep, pre-translate the English news into the K most requested languages.")
+    args = parser.parse_args()
+    journalist.STREAM_RESPONSES = args.stream
+    journalist.CONTEXT_CACHING = args.context_cache
+    journalist.GROUNDED_SOURCES = args.grounded_sources
+    journalist.COMPACT_DOCUMENTS = args.compact_documents
+
+    checkpoint = CheckpointStore(args.checkpoint_file)
+    run_id = (args.run_id or checkpoint.last_run_id()) if args.resume else new_run_id()
+    if not run_id:
+        run_id = new_run_id()
+
+    countries = load_countries(args.countries_file)
+    if args.only:
+        countries = [entry for entry in countries if entry[0] in args.only]
+
+    sweep_results, final_stats = run_sweep(
+        countries,
+        max_workers=args.max_workers,
+        limiter=QuotaLimiter(args.rpm, args.tpm, args.tokens_per_request),
+        deadline_minutes=args.deadline_minutes,
+        translate_from=args.translate_from,
+        checkpoint=checkpoint,
+        run_id=run_id,
+    )
+    journalist.context_cache.close()
+
+    if args.materialize_translations:
+        final_stats["materialized_translations"] = materialized_translations.run_stage(
+            journalist.get_db(), top_k=args.materialize_translations, compact=journalist.COMPACT_DOCUMENTS)
+
+    if args.metrics_out:
+        metrics.write_report(args.metrics_out)
+
+    print("\n\nSWEEP SUMMARY:")
+    print(json.dumps(final_stats, indent=2))
+    print(json.dumps(sweep_results, indent=2, ensure_ascii=False))
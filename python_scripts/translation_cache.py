@@ -0,0 +1,197 @@
+# translation_cache.py
+#
+# Two-tier, content-addressed cache for Translate API results.
+#
+# Entries are keyed on (sha256 of the source text, source language, target
+# language), so the same string is only ever paid for once per language pair,
+# no matter which news_summaries document or request it came from.
+#
+#   tier 1: LRUCache, in-process, evicts least recently used entries by size
+#   tier 2: a pluggable persistent store shared across instances
+#           (FirestoreStore in production, SQLiteStore or DictStore locally)
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_MEMORY_BYTES = 32 * 1024 * 1024
+FIRESTORE_CACHE_COLLECTION = "translation_cache"
+
+
+def cache_key(text: str, source_language: str, target_language: str):
+    """Content-addressed key for one translation. Safe to use as a Firestore document ID."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{digest}_{source_language}_{target_language}"
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache bounded by the total UTF-8 size of its entries."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(key: str, value: str):
+        return len(key) + len(value.encode("utf-8"))
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._size(key, self._entries.pop(key))
+            self._entries[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.current_bytes -= self._size(old_key, old_value)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DictStore:
+    """Plain dict persistent tier, for tests and local runs."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get_many(self, keys):
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set_many(self, entries: dict):
+        self.data.update(entries)
+
+
+class SQLiteStore:
+    """SQLite-backed persistent tier for local runs that should survive restarts."""
+
+    def __init__(self, path: str = "translation_cache.sqlite3"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = self._conn.execute(f"SELECT key, value FROM translations WHERE key IN ({placeholders})", chunk)
+                found.update(rows.fetchall())
+        return found
+
+    def set_many(self, entries: dict):
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO translations (key, value) VALUES (?, ?)", entries.items())
+            self._conn.commit()
+
+
+class FirestoreStore:
+    """Firestore-backed persistent tier: one document per cached translation."""
+
+    # Firestore caps a write batch at 500 operations
+    BATCH_SIZE = 500
+
+    def __init__(self, db, collection: str = FIRESTORE_CACHE_COLLECTION):
+        self.db = db
+        self.collection = collection
+
+    def get_many(self, keys):
+        refs = [self.db.collection(self.collection).document(key) for key in keys]
+        if not refs:
+            return {}
+        found = {}
+        for snapshot in self.db.get_all(refs):
+            if snapshot.exists:
+                found[snapshot.id] = snapshot.to_dict().get("translated_text", "")
+        return found
+
+    def set_many(self, entries: dict):
+        items = list(entries.items())
+        for start in range(0, len(items), self.BATCH_SIZE):
+            batch = self.db.batch()
+            for key, value in items[start:start + self.BATCH_SIZE]:
+                batch.set(self.db.collection(self.collection).document(key), {"translated_text": value})
+            batch.commit()
+
+
+class TranslationCache:
+    """
+    Looks translations up in memory first, then in the persistent store.
+    Persistent hits are promoted into memory. Counters are exposed through stats().
+    """
+
+    def __init__(self, memory: LRUCache = None, store=None):
+        self.memory = memory if memory is not None else LRUCache()
+        self.store = store
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Returns {key: translation} for every key found in either tier."""
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is None:
+                remaining.append(key)
+            else:
+                found[key] = value
+        memory_hits = len(found)
+
+        store_found = {}
+        if remaining and self.store is not None:
+            try:
+                store_found = self.store.get_many(remaining)
+            except Exception as e:
+                # A broken persistent tier only costs us cache hits, never the request
+                logging.warning(f"Translation cache store lookup failed: {e}")
+            for key, value in store_found.items():
+                self.memory.set(key, value)
+            found.update(store_found)
+
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.store_hits += len(store_found)
+            self.misses += len(remaining) - len(store_found)
+        return found
+
+    def set_many(self, entries: dict):
+        for key, value in entries.items():
+            self.memory.set(key, value)
+        if entries and self.store is not None:
+            try:
+                self.store.set_many(entries)
+            except Exception as e:
+                logging.warning(f"Translation cache store write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.store_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.store_hits) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory.current_bytes,
+            }
@@ -0,0 +1,524 @@
+# work_queue.py
+#
+# Lease-based work queue for running one sweep across several worker
+# processes or machines.
+#
+# A coordinator enqueues every (country, language, category) unit of a run.
+# Workers claim units under a time-limited lease, fetch them through the
+# journalist's _fetch_category_data and complete them with the result. If a
+# worker crashes its leases expire, and the units are claimed again by whoever
+# asks next. Completion is first-wins, so a late completion from a worker
+# whose lease already expired is harmless.
+#
+# Once every category of a (country, language) is done, a "write" unit is
+# added for it and claimed like any other; only the worker holding that lease
+# writes the document (sweep._finish_group). If it dies mid-write the write
+# unit is re-claimed, and store_consolidated_news's change detection turns the
+# repeated write into a no-op instead of a second snapshot.
+#
+#   MemoryLeaseStore: threads in one process (tests, benchmarks)
+#   SQLiteLeaseStore: several processes on one host sharing a database file
+#   FirestoreLeaseStore: workers on any number of machines, claims in transactions
+#
+# Each worker has its own QuotaLimiter, so give every worker --rpm/--tpm of
+# (quota / number of workers).
+#
+# Usage: python work_queue.py enqueue --backend sqlite --run-id 2025-01-31
+#        python work_queue.py work --backend sqlite --run-id 2025-01-31   (on every worker)
+#        python work_queue.py status --backend sqlite --run-id 2025-01-31
+
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import gemini_journalist_with_categories as journalist
+import metrics
+import sweep
+from checkpoints import new_run_id
+
+# --- QUEUE CONFIGURATION ---
+LEASE_SECONDS = 2 * journalist.CALL_DEADLINE   # longer than one category fetch, retries included
+MAX_UNIT_ATTEMPTS = 3                          # leases per unit before it is marked failed
+CLAIM_BATCH_SIZE = 1                           # units claimed per round trip
+IDLE_POLL_SECONDS = 5                          # wait between claims while other workers hold the remaining leases
+SQLITE_QUEUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "work_queue.sqlite3")
+FIRESTORE_QUEUE_COLLECTION = "work_queue"
+KEY_SEPARATOR = "|"
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+
+def _new_record(key: str, now: float, seq: int):
+    return {"key": key, "status": PENDING, "owner": None, "token": None, "available_at": now, "seq": seq,
+            "attempts": 0, "result": None, "error": None}
+
+
+# --- LEASE STORES ---
+
+class MemoryLeaseStore:
+    """Dict-backed lease table for workers that are threads of one process."""
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def add(self, run_id: str, keys, now: float):
+        with self._lock:
+            records = self._runs.setdefault(run_id, {})
+            added = 0
+            for key in keys:
+                if key not in records:
+                    records[key] = _new_record(key, now, len(records))
+                    added += 1
+            return added
+
+    def claim(self, run_id: str, worker_id: str, now: float, lease_seconds: float, limit: int, keys=None):
+        with self._lock:
+            records = self._runs.get(run_id, {})
+            candidates = [records[key] for key in keys if key in records] if keys is not None else list(records.values())
+            claimable = sorted((r for r in candidates if r["status"] in (PENDING, LEASED) and r["available_at"] <= now),
+                               key=lambda r: (r["available_at"], r["seq"]))[:limit]
+            claimed = []
+            for record in claimable:
+                reclaimed = record["status"] == LEASED
+                record.update(status=LEASED, owner=worker_id, token=uuid.uuid4().hex, available_at=now + lease_seconds,
+                              attempts=record["attempts"] + 1)
+                claimed.append((dict(record), reclaimed))
+            return claimed
+
+    def complete(self, run_id: str, key: str, token: str, result):
+        with self._lock:
+            record = self._runs.get(run_id, {}).get(key)
+            if record is None or record["status"] in (DONE, FAILED):
+                return False
+            record.update(status=DONE, result=result, token=token, available_at=float("inf"))
+            return True
+
+    def release(self, run_id: str, key: str, token: str, error: str, now: float, max_attempts: int):
+        with self._lock:
+            record = self._runs.get(run_id, {}).get(key)
+            if record is None or record["token"] != token or record["status"] != LEASED:
+                return None
+            failed = record["attempts"] >= max_attempts
+            record.update(status=FAILED if failed else PENDING, error=error, owner=None,
+                          available_at=float("inf") if failed else now)
+            return record["status"]
+
+    def get(self, run_id: str, keys):
+        with self._lock:
+            records = self._runs.get(run_id, {})
+            return {key: dict(records[key]) for key in keys if key in records}
+
+    def counts(self, run_id: str):
+        with self._lock:
+            totals = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+            for record in self._runs.get(run_id, {}).values():
+                totals[record["status"]] += 1
+            return totals
+
+
+class SQLiteLeaseStore:
+    """SQLite-backed lease table shared by worker processes on one host."""
+
+    def __init__(self, path: str = SQLITE_QUEUE_PATH):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (run_id TEXT, key TEXT, status TEXT, owner TEXT, token TEXT, "
+            "available_at REAL, seq INTEGER, attempts INTEGER, result TEXT, error TEXT, PRIMARY KEY (run_id, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS leases_available ON leases (run_id, available_at, seq)")
+        self._lock = threading.Lock()
+
+    def _transaction(self, work):
+        # BEGIN IMMEDIATE takes the write lock up front, so two processes never claim the same row
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _row(row):
+        keys = ("key", "status", "owner", "token", "available_at", "seq", "attempts", "result", "error")
+        record = dict(zip(keys, row))
+        record["result"] = json.loads(record["result"]) if record["result"] is not None else None
+        return record
+
+    def add(self, run_id: str, keys, now: float):
+        def work(conn):
+            start = conn.execute("SELECT COUNT(*) FROM leases WHERE run_id = ?", (run_id,)).fetchone()[0]
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO leases VALUES (?, ?, ?, NULL, NULL, ?, ?, 0, NULL, NULL)",
+                             [(run_id, key, PENDING, now, start + i) for i, key in enumerate(keys)])
+            return conn.total_changes - before
+        return self._transaction(work)
+
+    def claim(self, run_id: str, worker_id: str, now: float, lease_seconds: float, limit: int, keys=None):
+        def work(conn):
+            query = ("SELECT key, status, owner, token, available_at, seq, attempts, result, error FROM leases "
+                     "WHERE run_id = ? AND status IN (?, ?) AND available_at <= ?")
+            params = [run_id, PENDING, LEASED, now]
+            if keys is not None:
+                query += f" AND key IN ({','.join('?' for _ in keys)})"
+                params += list(keys)
+            rows = conn.execute(query + " ORDER BY available_at, seq LIMIT ?", params + [limit]).fetchall()
+            claimed = []
+            for row in rows:
+                record = self._row(row)
+                reclaimed = record["status"] == LEASED
+                record.update(status=LEASED, owner=worker_id, token=uuid.uuid4().hex, available_at=now + lease_seconds,
+                              attempts=record["attempts"] + 1)
+                conn.execute("UPDATE leases SET status = ?, owner = ?, token = ?, available_at = ?, attempts = ? "
+                             "WHERE run_id = ? AND key = ?",
+                             (LEASED, worker_id, record["token"], record["available_at"], record["attempts"], run_id, record["key"]))
+                claimed.append((record, reclaimed))
+            return claimed
+        return self._transaction(work)
+
+    def complete(self, run_id: str, key: str, token: str, result):
+        def work(conn):
+            cursor = conn.execute("UPDATE leases SET status = ?, result = ?, token = ?, available_at = ? "
+                                  "WHERE run_id = ? AND key = ? AND status NOT IN (?, ?)",
+                                  (DONE, json.dumps(result, ensure_ascii=False), token, float("inf"), run_id, key, DONE, FAILED))
+            return cursor.rowcount == 1
+        return self._transaction(work)
+
+    def release(self, run_id: str, key: str, token: str, error: str, now: float, max_attempts: int):
+        def work(conn):
+            row = conn.execute("SELECT attempts FROM leases WHERE run_id = ? AND key = ? AND token = ? AND status = ?",
+                               (run_id, key, token, LEASED)).fetchone()
+            if row is None:
+                return None
+            status = FAILED if row[0] >= max_attempts else PENDING
+            conn.execute("UPDATE leases SET status = ?, error = ?, owner = NULL, available_at = ? WHERE run_id = ? AND key = ?",
+                         (status, error, float("inf") if status == FAILED else now, run_id, key))
+            return status
+        return self._transaction(work)
+
+    def get(self, run_id: str, keys):
+        keys = list(keys)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, status, owner, token, available_at, seq, attempts, result, error FROM leases "
+                f"WHERE run_id = ? AND key IN ({','.join('?' for _ in keys)})", [run_id] + keys).fetchall() if keys else []
+        return {row[0]: self._row(row) for row in rows}
+
+    def counts(self, run_id: str):
+        totals = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            for status, count in self._conn.execute("SELECT status, COUNT(*) FROM leases WHERE run_id = ? GROUP BY status", (run_id,)):
+                totals[status] = count
+        return totals
+
+
+class FirestoreLeaseStore:
+    """
+    Firestore-backed lease table: work_queue/{run_id}/units/{key}.
+    Claims, completions and releases run in transactions; available_at is a plain
+    float so "claimable now" is a single-field range query.
+    """
+
+    # Firestore caps a write batch at 500 operations
+    BATCH_SIZE = 500
+    # Claims read a few more candidates than they need and pick among them at random,
+    # so concurrent workers rarely contend for the same documents
+    CANDIDATE_FACTOR = 4
+    DONE_AT = 1e18  # Firestore has no infinity literal worth querying on
+
+    def __init__(self, db, collection: str = FIRESTORE_QUEUE_COLLECTION):
+        self.db = db
+        self.collection = collection
+
+    def _units(self, run_id: str):
+        return self.db.collection(self.collection).document(run_id).collection("units")
+
+    @staticmethod
+    def _doc_id(key: str):
+        return key.replace("/", "_")
+
+    def _run_transaction(self, work):
+        from google.cloud import firestore
+        return firestore.transactional(work)(self.db.transaction())
+
+    def add(self, run_id: str, keys, now: float):
+        keys = list(keys)
+        units = self._units(run_id)
+        added = 0
+        for start in range(0, len(keys), self.BATCH_SIZE):
+            chunk = keys[start:start + self.BATCH_SIZE]
+
+            def work(transaction, chunk=chunk, start=start):
+                refs = [units.document(self._doc_id(key)) for key in chunk]
+                existing = {snapshot.id for snapshot in self.db.get_all(refs, transaction=transaction) if snapshot.exists}
+                missing = [(ref, key, start + i) for i, (ref, key) in enumerate(zip(refs, chunk)) if ref.id not in existing]
+                for ref, key, seq in missing:
+                    transaction.set(ref, _new_record(key, now, seq))
+                return len(missing)
+            added += self._run_transaction(work)
+        return added
+
+    def claim(self, run_id: str, worker_id: str, now: float, lease_seconds: float, limit: int, keys=None):
+        units = self._units(run_id)
+
+        def work(transaction):
+            if keys is not None:
+                snapshots = [s for s in self.db.get_all([units.document(self._doc_id(key)) for key in keys], transaction=transaction)
+                             if s.exists]
+            else:
+                query = units.where("available_at", "<=", now).order_by("available_at").limit(limit * self.CANDIDATE_FACTOR)
+                snapshots = list(query.stream(transaction=transaction))
+                random.shuffle(snapshots)
+            claimed = []
+            for snapshot in snapshots:
+                record = snapshot.to_dict()
+                if record["status"] not in (PENDING, LEASED) or record["available_at"] > now:
+                    continue
+                reclaimed = record["status"] == LEASED
+                record.update(status=LEASED, owner=worker_id, token=uuid.uuid4().hex, available_at=now + lease_seconds,
+                              attempts=record["attempts"] + 1)
+                transaction.update(snapshot.reference, {field: record[field] for field in ("status", "owner", "token", "available_at", "attempts")})
+                claimed.append((record, reclaimed))
+                if len(claimed) == limit:
+                    break
+            return claimed
+        return self._run_transaction(work)
+
+    def complete(self, run_id: str, key: str, token: str, result):
+        ref = self._units(run_id).document(self._doc_id(key))
+
+        def work(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get("status") in (DONE, FAILED):
+                return False
+            transaction.update(ref, {"status": DONE, "result": result, "token": token, "available_at": self.DONE_AT})
+            return True
+        return self._run_transaction(work)
+
+    def release(self, run_id: str, key: str, token: str, error: str, now: float, max_attempts: int):
+        ref = self._units(run_id).document(self._doc_id(key))
+
+        def work(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get("token") != token or snapshot.get("status") != LEASED:
+                return None
+            status = FAILED if snapshot.get("attempts") >= max_attempts else PENDING
+            transaction.update(ref, {"status": status, "error": error, "owner": None,
+                                     "available_at": self.DONE_AT if status == FAILED else now})
+            return status
+        return self._run_transaction(work)
+
+    def get(self, run_id: str, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        units = self._units(run_id)
+        snapshots = self.db.get_all([units.document(self._doc_id(key)) for key in keys])
+        return {record["key"]: record for record in (s.to_dict() for s in snapshots if s.exists)}
+
+    def counts(self, run_id: str):
+        totals = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for snapshot in self._units(run_id).select(["status"]).stream():
+            totals[snapshot.get("status")] += 1
+        return totals
+
+
+def build_lease_store(backend: str, path: str = SQLITE_QUEUE_PATH):
+    """'memory', 'sqlite' (at path) or 'firestore' (the journalist's Firestore client)."""
+    if backend == "memory":
+        return MemoryLeaseStore()
+    if backend == "sqlite":
+        return SQLiteLeaseStore(path)
+    if backend == "firestore":
+        return FirestoreLeaseStore(journalist.get_db())
+    raise ValueError(f"Unknown work queue backend: {backend}")
+
+
+# --- WORK QUEUE ---
+
+def category_key(country: str, lang: str, category: str):
+    return KEY_SEPARATOR.join(("category", country, lang, category))
+
+
+def write_key(country: str, lang: str):
+    return KEY_SEPARATOR.join(("write", country, lang))
+
+
+class WorkQueue:
+    """
+    The sweep's units on top of a lease store. Every worker builds one from the
+    same countries list and translate_from setting as the coordinator.
+    """
+
+    def __init__(self, store, run_id: str, countries: list, translate_from: str = None,
+                 lease_seconds: float = LEASE_SECONDS, max_attempts: int = MAX_UNIT_ATTEMPTS):
+        self.store = store
+        self.run_id = run_id
+        self.translate_from = translate_from
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.units = {category_key(u.country, u.language, u.category): u
+                      for u in sweep.expand_work_units(countries, translate_from)}
+        self.groups = sweep._build_groups(list(self.units.values()), countries, translate_from)
+
+    def enqueue(self):
+        """Adds every unit of the run; units already in the queue are left as they are."""
+        added = self.store.add(self.run_id, list(self.units), time.time())
+        print(f"📥 Enqueued {added} of {len(self.units)} units for run {self.run_id}.")
+        return added
+
+    def claim(self, worker_id: str, limit: int = CLAIM_BATCH_SIZE, keys=None):
+        claimed = self.store.claim(self.run_id, worker_id, time.time(), self.lease_seconds, limit, keys)
+        for record, reclaimed in claimed:
+            metrics.inc("queue_claims_total", kind=record["key"].split(KEY_SEPARATOR)[0], reclaimed=reclaimed)
+            if reclaimed:
+                print(f"♻️ Re-claimed {record['key']} from an expired lease (attempt {record['attempts']}).")
+        return [record for record, _ in claimed]
+
+    def finished(self):
+        counts = self.store.counts(self.run_id)
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def status(self):
+        return self.store.counts(self.run_id)
+
+    # --- Unit handlers ---
+
+    def _handle_category(self, record: dict, worker_id: str, limiter, results: dict):
+        unit = self.units[record["key"]]
+        labels = {"country": unit.country, "language": unit.language, "category": unit.category}
+        news_items, error_msg = journalist._fetch_category_data(
+            unit.category, unit.query, journalist.system_instruction_for(unit.category, unit.language),
+            unit.country, unit.language, run_deadline=record["available_at"] - time.time() + time.monotonic(),
+            before_attempt=limiter.acquire
+        )
+        if error_msg:
+            status = self.store.release(self.run_id, record["key"], record["token"], error_msg, time.time(), self.max_attempts)
+            # None: the lease expired and another worker holds the unit now
+            outcome = {PENDING: "released", FAILED: "failed"}.get(status, "stale")
+            metrics.inc("queue_completions_total", outcome=outcome, **labels)
+            if status == FAILED:
+                sweep._report_failure(unit, self.groups[(unit.country, unit.language)], results, error_msg)
+            return
+        accepted = self.store.complete(self.run_id, record["key"], record["token"], news_items)
+        metrics.inc("queue_completions_total", outcome="done" if accepted else "duplicate", **labels)
+        if accepted:
+            self._maybe_write(unit.country, unit.language, worker_id, results)
+
+    def _maybe_write(self, country: str, lang: str, worker_id: str, results: dict):
+        """Adds and claims the group's write unit once every one of its categories is done."""
+        group = self.groups[(country, lang)]
+        records = self.store.get(self.run_id, [category_key(country, lang, category) for category in group.categories])
+        if len(records) < len(group.categories) or any(r["status"] != DONE for r in records.values()):
+            return
+        key = write_key(country, lang)
+        self.store.add(self.run_id, [key], time.time())
+        for record in self.claim(worker_id, keys=[key]):
+            self._handle_write(record, results)
+
+    def _add_ready_writes(self):
+        """Adds write units for complete groups that lack one, e.g. because a worker died in between."""
+        all_keys = list(self.units) + [write_key(country, lang) for country, lang in self.groups]
+        records = self.store.get(self.run_id, all_keys)
+        ready = [write_key(country, lang) for (country, lang), group in self.groups.items()
+                 if write_key(country, lang) not in records
+                 and all(records.get(category_key(country, lang, c), {}).get("status") == DONE for c in group.categories)]
+        return self.store.add(self.run_id, ready, time.time()) if ready else 0
+
+    def _handle_write(self, record: dict, results: dict):
+        _, country, lang = record["key"].split(KEY_SEPARATOR)
+        group = self.groups[(country, lang)]
+        records = self.store.get(self.run_id, [category_key(country, lang, category) for category in group.categories])
+        written = sweep._CountryLanguageGroup(country, lang, group.categories, group.targets)
+        written.results = {category: records[category_key(country, lang, category)]["result"] for category in group.categories}
+        group_results = {}
+        sweep._finish_group(written, group_results)
+        # The document must be committed before the write unit is marked done
+        journalist.firestore_writer.flush()
+        journalist.firestore_writer.mark_failed_writes(group_results)
+        results.update(group_results)
+        ok = all(result.get("status") == "success" for result in group_results.values())
+        if ok:
+            self.store.complete(self.run_id, record["key"], record["token"],
+                                {label: result.get("doc_id") for label, result in group_results.items()})
+        else:
+            self.store.release(self.run_id, record["key"], record["token"], json.dumps(group_results, ensure_ascii=False),
+                               time.time(), self.max_attempts)
+        metrics.inc("queue_writes_total", outcome="done" if ok else "error")
+
+    def work(self, worker_id: str = None, limiter: sweep.QuotaLimiter = None, claim_size: int = CLAIM_BATCH_SIZE,
+             idle_poll: float = IDLE_POLL_SECONDS, stop_event: threading.Event = None):
+        """
+        Claims and processes units until the run has nothing pending or leased.
+        Returns the {"Country [Language]": result} entries this worker produced.
+        """
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+        limiter = limiter or sweep.QuotaLimiter()
+        stop_event = stop_event or threading.Event()
+        results = {}
+        while not stop_event.is_set():
+            records = self.claim(worker_id, claim_size)
+            if not records:
+                if self.finished() and not self._add_ready_writes():
+                    break
+                # Other workers hold the remaining leases; one may crash and leave them to us
+                stop_event.wait(idle_poll)
+                continue
+            for record in records:
+                if record["key"].startswith("write" + KEY_SEPARATOR):
+                    self._handle_write(record, results)
+                else:
+                    self._handle_category(record, worker_id, limiter, results)
+        journalist.firestore_writer.flush()
+        return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a sweep across several workers through a lease-based queue.")
+    parser.add_argument("command", choices=["enqueue", "work", "status"])
+    parser.add_argument("--backend", choices=["sqlite", "firestore"], default="sqlite")
+    parser.add_argument("--sqlite-path", default=SQLITE_QUEUE_PATH)
+    parser.add_argument("--run-id", help="Run to enqueue or work on (enqueue defaults to a new id).")
+    parser.add_argument("--countries-file", default=sweep.COUNTRIES_FILE)
+    parser.add_argument("--only", nargs="*", help="Restrict the run to these country names.")
+    parser.add_argument("--translate-from", help="Fetch once in this language (e.g. English) and machine-translate the rest.")
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    parser.add_argument("--threads", type=int, default=1, help="Worker threads in this process.")
+    parser.add_argument("--rpm", type=int, default=sweep.GEMINI_RPM, help="This worker's share of the requests-per-minute quota.")
+    parser.add_argument("--tpm", type=int, default=sweep.GEMINI_TPM, help="This worker's share of the tokens-per-minute quota.")
+    parser.add_argument("--metrics-out", help="Write metrics here: Prometheus text for .prom/.txt, a JSON report otherwise.")
+    args = parser.parse_args()
+
+    run_id = args.run_id or (new_run_id() if args.command == "enqueue" else None)
+    if not run_id:
+        parser.error("--run-id is required for work and status")
+
+    countries = sweep.load_countries(args.countries_file)
+    if args.only:
+        countries = [entry for entry in countries if entry[0] in args.only]
+    queue = WorkQueue(build_lease_store(args.backend, args.sqlite_path), run_id, countries, args.translate_from,
+                      lease_seconds=args.lease_seconds)
+
+    if args.command == "enqueue":
+        queue.enqueue()
+    elif args.command == "work":
+        limiter = sweep.QuotaLimiter(args.rpm, args.tpm)
+        worker_results = {}
+        threads = [threading.Thread(target=lambda: worker_results.update(queue.work(limiter=limiter))) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(json.dumps(worker_results, indent=2, ensure_ascii=False))
+        if args.metrics_out:
+            metrics.write_report(args.metrics_out)
+    print(f"📊 Run {run_id}: {json.dumps(queue.status())}")